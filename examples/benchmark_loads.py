@@ -0,0 +1,53 @@
+"""Benchmark of the cache hit path: loading small json responses.
+
+Compares the serializers loading responses directly from their cached state
+(default) with building them with httpx.Response/httpx.Headers.
+
+Run with: python examples/benchmark_loads.py
+"""
+import json
+import timeit
+from unittest import mock
+
+import httpx
+
+import httpx_cache
+
+NUMBER = 20_000
+
+response = httpx.Response(
+    200,
+    headers={
+        "content-type": "application/json",
+        "date": "Mon, 01 Jan 2024 00:00:00 GMT",
+        "cache-control": "max-age=60",
+        "etag": '"33a64df551425fcc55e4d42a148795d9f25f89d4"',
+        "server": "nginx",
+        "vary": "Accept-Encoding",
+        "x-content-type-options": "nosniff",
+        "x-request-id": "f058ebd6-02f7-4d3f-942e-904344e8cde5",
+    },
+    content=json.dumps({"id": 1, "name": "httpx-cache", "tags": ["a", "b"]}).encode(),
+)
+
+for serializer in (
+    httpx_cache.DictSerializer(),
+    httpx_cache.MsgPackSerializer(),
+    httpx_cache.BinarySerializer(),
+):
+    dumped = serializer.dumps(response=response)
+
+    def load() -> None:
+        serializer.loads(cached=dumped).json()  # noqa: B023
+
+    fast = min(timeit.repeat(load, number=NUMBER, repeat=5))
+    with mock.patch("httpx_cache.serializer.common.FAST_RESPONSE", False), mock.patch(
+        "httpx_cache.serializer.headers.FAST_HEADERS", False
+    ):
+        slow = min(timeit.repeat(load, number=NUMBER, repeat=5))
+    print(
+        f"{type(serializer).__name__:<20} "
+        f"httpx.Response: {slow / NUMBER * 1e6:6.2f}us  "
+        f"fast path: {fast / NUMBER * 1e6:6.2f}us  "
+        f"speedup: x{slow / fast:.2f}"
+    )
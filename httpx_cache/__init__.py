@@ -1,10 +1,26 @@
-from httpx_cache.cache import BaseCache, DictCache, FileCache
+from httpx_cache.cache import (
+    BaseCache,
+    CacheWriter,
+    DictCache,
+    EvictionPolicy,
+    FileCache,
+    SQLiteCache,
+    TieredCache,
+    LFUPolicy,
+    LRUPolicy,
+    TinyLFUPolicy,
+)
 from httpx_cache.cache_control import CacheControl
+from httpx_cache.cache_key import CacheKey
 from httpx_cache.client import AsyncClient, Client
+from httpx_cache.metrics import CacheMetrics, CacheStats
 from httpx_cache.serializer import (
     BaseSerializer,
+    BinarySerializer,
     BytesJsonSerializer,
+    CompressingSerializer,
     DictSerializer,
+    LoadError,
     MsgPackSerializer,
     StringJsonSerializer,
 )
@@ -14,14 +30,27 @@ from httpx_cache.utils import ByteStreamWrapper
 
 __all__ = [
     "BaseCache",
+    "CacheWriter",
     "DictCache",
     "FileCache",
+    "SQLiteCache",
+    "TieredCache",
+    "EvictionPolicy",
+    "LRUPolicy",
+    "LFUPolicy",
+    "TinyLFUPolicy",
     "CacheControl",
+    "CacheKey",
     "Client",
     "AsyncClient",
+    "CacheMetrics",
+    "CacheStats",
     "BaseSerializer",
+    "BinarySerializer",
     "BytesJsonSerializer",
+    "CompressingSerializer",
     "DictSerializer",
+    "LoadError",
     "MsgPackSerializer",
     "StringJsonSerializer",
     "CacheControlTransport",
@@ -1,9 +1,24 @@
-from httpx_cache.cache.base import BaseCache
+from httpx_cache.cache.base import BaseCache, CacheWriter
+from httpx_cache.cache.eviction import (
+    EvictionPolicy,
+    LFUPolicy,
+    LRUPolicy,
+    TinyLFUPolicy,
+)
 from httpx_cache.cache.file import FileCache
 from httpx_cache.cache.memory import DictCache
+from httpx_cache.cache.sqlite import SQLiteCache
+from httpx_cache.cache.tiered import TieredCache
 
 __all__ = [
     "BaseCache",
+    "CacheWriter",
     "DictCache",
     "FileCache",
+    "SQLiteCache",
+    "TieredCache",
+    "EvictionPolicy",
+    "LRUPolicy",
+    "LFUPolicy",
+    "TinyLFUPolicy",
 ]
@@ -1,10 +1,127 @@
 import typing as tp
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 
 import httpx
 
+from httpx_cache.cache_control import is_response_unusable
+from httpx_cache.utils import CacheMetadata, get_cache_key, get_vary_headers
+
+# prefix of the entries stored under a primary key when the response varies
+VARY_MARKER = b"httpx-cache:vary:"
+
+
+class CacheWriter:
+    """Writer storing the streamed content of a response in a cache, chunk by chunk.
+
+    Chunks are buffered until 'flush_size' bytes are pending, then flushed to the
+    backend of the cache. The response is stored on 'commit' (once its stream is
+    consumed), or discarded on 'abort' (its stream was closed before the end).
+
+    The default writer never flushes: the chunks are kept in memory and stored
+    with 'set_chunks'/'aset_chunks' on commit.
+
+    Args:
+        cache: cache to store the response in
+        request: httpx.Request
+        response: httpx.Response, to cache
+    """
+
+    # number of pending bytes written at once to the backend, None to never flush
+    flush_size: tp.Optional[int] = None
+
+    def __init__(
+        self, cache: "BaseCache", request: httpx.Request, response: httpx.Response
+    ) -> None:
+        self.cache = cache
+        self.request = request
+        self.response = response
+        # size of the content written so far
+        self.size = 0
+        self.closed = False
+        self._pending: tp.List[bytes] = []
+        self._pending_size = 0
+
+    def _buffer(self, chunk: bytes) -> bool:
+        # buffer a chunk, returns whether the pending chunks should be flushed
+        self._pending.append(chunk)
+        self._pending_size += len(chunk)
+        self.size += len(chunk)
+        return self.flush_size is not None and self._pending_size >= self.flush_size
+
+    def _take(self) -> tp.List[bytes]:
+        pending, self._pending = self._pending, []
+        self._pending_size = 0
+        return pending
+
+    def _flush(self, chunks: tp.List[bytes]) -> None:
+        """Write pending chunks to the backend of the cache."""
+
+    async def _aflush(self, chunks: tp.List[bytes]) -> None:
+        """(Async) Write pending chunks to the backend of the cache."""
+        self._flush(chunks)
+
+    def write(self, chunk: bytes) -> None:
+        """Write the next chunk of the content.
+
+        Args:
+            chunk: raw content chunk, as received
+        """
+        if not self.closed and self._buffer(chunk):
+            self._flush(self._take())
+
+    async def awrite(self, chunk: bytes) -> None:
+        """(Async) Write the next chunk of the content.
+
+        Args:
+            chunk: raw content chunk, as received
+        """
+        if not self.closed and self._buffer(chunk):
+            await self._aflush(self._take())
+
+    def commit(self) -> None:
+        """Store the response, once all its content was written."""
+        if self.closed:
+            return
+        self.closed = True
+        self.cache.set_chunks(
+            request=self.request, response=self.response, chunks=self._take()
+        )
+
+    async def acommit(self) -> None:
+        """(Async) Store the response, once all its content was written."""
+        if self.closed:
+            return
+        self.closed = True
+        await self.cache.aset_chunks(
+            request=self.request, response=self.response, chunks=self._take()
+        )
+
+    def abort(self) -> None:
+        """Discard the content written so far, does nothing once committed."""
+        self.closed = True
+        self._take()
+
+    async def aabort(self) -> None:
+        """(Async) Discard the content written so far, does nothing once committed."""
+        self.abort()
+
 
 class BaseCache(ABC):
+    """Base class for all caches.
+
+    Responses with a 'Vary' header are stored under a secondary key (url + digest
+    of the request headers the response varies on), and a small vary marker listing
+    these headers is stored under the primary key (url). Caches keep an in-memory
+    index of the marker so that lookups usually take a single round-trip.
+    """
+
+    # max number of urls kept in the in-memory vary index
+    max_vary_index_size = 10_000
+    _vary_index: tp.Optional["OrderedDict[str, tp.Tuple[str, ...]]"] = None
+    # number of entries evicted to keep the cache under its limits
+    evictions = 0
+
     @abstractmethod
     def get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
         """Get cached response from Cache.
@@ -71,6 +188,63 @@ class BaseCache(ABC):
                 response that not have yet content.
         """
 
+    def set_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        """Set new response entry in cache from the chunks of its streamed content.
+
+        Called by the default writer (see 'open_writer') once the stream ends.
+        Caches can override it to store the chunks without joining them, defaults
+        to calling 'set' with the joined content.
+
+        Args:
+            request: httpx.Request
+            response: httpx.Response, to cache
+            chunks: list of the response content chunks.
+        """
+        self.set(request=request, response=response, content=b"".join(chunks))
+
+    async def aset_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        """(Async) Set new response entry in cache from the chunks of its content.
+
+        Caches can override it to store the chunks without joining them, defaults
+        to calling 'aset' with the joined content.
+
+        Args:
+            request: httpx.Request
+            response: httpx.Response, to cache
+            chunks: list of the response content chunks.
+        """
+        await self.aset(request=request, response=response, content=b"".join(chunks))
+
+    def open_writer(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> CacheWriter:
+        """Open a writer to store a response while its content is streamed.
+
+        Caches can override it to write the chunks to their backend as they
+        arrive, defaults to a writer calling 'set_chunks'/'aset_chunks' once the
+        stream ends.
+
+        Args:
+            request: httpx.Request
+            response: httpx.Response, to cache (its content not read yet)
+
+        Returns:
+            CacheWriter
+        """
+        return CacheWriter(self, request, response)
+
     @abstractmethod
     def delete(self, request: httpx.Request) -> None:
         """Delete an entry from cache.
@@ -87,6 +261,188 @@ class BaseCache(ABC):
             request: httpx.Request
         """
 
+    def get_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        """Get the cached responses of several requests.
+
+        Caches can override it to batch the lookups, defaults to calling 'get'
+        for each request.
+
+        Args:
+            requests: sequence of httpx.Request
+
+        Returns:
+            list of the cached responses (None if not found), in the same order as
+            the requests.
+        """
+        return [self.get(request) for request in requests]
+
+    async def aget_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        """(Async) Get the cached responses of several requests.
+
+        Caches can override it to batch the lookups, defaults to calling 'aget'
+        for each request.
+
+        Args:
+            requests: sequence of httpx.Request
+
+        Returns:
+            list of the cached responses (None if not found), in the same order as
+            the requests.
+        """
+        return [await self.aget(request) for request in requests]
+
+    def set_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        """Set several response entries in cache.
+
+        Responses should already be read (have a '_content' property). Caches can
+        override it to batch the writes, defaults to calling 'set' for each item.
+
+        Args:
+            items: sequence of (httpx.Request, httpx.Response) to cache
+        """
+        for request, response in items:
+            self.set(request=request, response=response)
+
+    async def aset_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        """(Async) Set several response entries in cache.
+
+        Responses should already be read (have a '_content' property). Caches can
+        override it to batch the writes, defaults to calling 'aset' for each item.
+
+        Args:
+            items: sequence of (httpx.Request, httpx.Response) to cache
+        """
+        for request, response in items:
+            await self.aset(request=request, response=response)
+
+    def delete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        """Delete several entries from cache.
+
+        Caches can override it to batch the deletes, defaults to calling 'delete'
+        for each request.
+
+        Args:
+            requests: sequence of httpx.Request
+        """
+        for request in requests:
+            self.delete(request)
+
+    async def adelete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        """(Async) Delete several entries from cache.
+
+        Caches can override it to batch the deletes, defaults to calling 'adelete'
+        for each request.
+
+        Args:
+            requests: sequence of httpx.Request
+        """
+        for request in requests:
+            await self.adelete(request)
+
+    @property
+    def vary_index(self) -> "OrderedDict[str, tp.Tuple[str, ...]]":
+        """In-memory index of the header names cached responses vary on by url."""
+        if self._vary_index is None:
+            self._vary_index = OrderedDict()
+        return self._vary_index
+
+    def _remember_vary(self, key: str, vary: tp.Tuple[str, ...]) -> bool:
+        """Save vary header names for a primary key, returns True if they changed."""
+        if self.vary_index.get(key) == vary:
+            return False
+        self.vary_index[key] = vary
+        if len(self.vary_index) > self.max_vary_index_size:
+            self.vary_index.popitem(last=False)
+        return True
+
+    def get_lookup_key(self, request: httpx.Request) -> str:
+        """Get the key to look up a request in cache.
+
+        The secondary key if the response to this url is known to vary on some
+        request headers, else the primary key.
+
+        Args:
+            request: httpx.Request
+
+        Returns:
+            str, cache key
+        """
+        key = get_cache_key(request)
+        vary = self.vary_index.get(key)
+        return get_cache_key(request, vary=vary) if vary else key
+
+    def get_store_key(
+        self, request: httpx.Request, response: httpx.Response
+    ) -> tp.Tuple[str, tp.Optional[bytes]]:
+        """Get the key to store a response in cache.
+
+        Args:
+            request: httpx.Request
+            response: httpx.Response, to cache
+
+        Returns:
+            Tuple of the cache key and of the vary marker that should be stored
+            under the primary key (None if the marker is already known to be stored
+            or if the response does not vary).
+        """
+        key = get_cache_key(request)
+        vary = get_vary_headers(response.headers)
+        if not vary:
+            self.vary_index.pop(key, None)
+            return key, None
+        marker = None
+        if self._remember_vary(key, vary):
+            marker = VARY_MARKER + ",".join(vary).encode()
+        return get_cache_key(request, vary=vary), marker
+
+    def resolve_vary_marker(
+        self, request: httpx.Request, cached: tp.Any
+    ) -> tp.Optional[str]:
+        """Resolve the secondary key of a request if cached data is a vary marker.
+
+        Args:
+            request: httpx.Request
+            cached: data found in cache for the request lookup key
+
+        Returns:
+            the secondary key to look up, or None if cached data is not a marker.
+        """
+        if not isinstance(cached, bytes) or not cached.startswith(VARY_MARKER):
+            return None
+        vary = tuple(cached[len(VARY_MARKER) :].decode().split(","))
+        self._remember_vary(get_cache_key(request), vary)
+        return get_cache_key(request, vary=vary)
+
+    def is_unusable(
+        self, request: httpx.Request, metadata: tp.Optional[CacheMetadata]
+    ) -> bool:
+        """Checks if a cached response can no longer be used, from its metadata.
+
+        Caches call it with the metadata loaded by 'serializer.loads_metadata'
+        before deserializing a cached response: unusable responses (stale, without
+        validators and out of their stale windows) are rejected without being
+        deserialized and treated as cache misses. The metadata of usable responses
+        is passed to 'serializer.loads', so that it's decoded only once.
+
+        Args:
+            request: httpx.Request
+            metadata: cache metadata of the cached response, None if unknown
+
+        Returns:
+            True if the cached response can't be used.
+        """
+        if metadata is None:
+            return False
+        return is_response_unusable(request=request, metadata=metadata)
+
     def close(self) -> None:
         """Close cache."""
 
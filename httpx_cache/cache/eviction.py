@@ -0,0 +1,318 @@
+import typing as tp
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+__all__ = ["EvictionPolicy", "LRUPolicy", "LFUPolicy", "TinyLFUPolicy"]
+
+
+class EvictionPolicy(ABC):
+    """Bookkeeping of cache keys used to choose which entry to evict next.
+
+    A policy only tracks keys, the cache itself owns the stored values and decides
+    when it is over its limits. Every method is expected to run in O(1).
+    """
+
+    @abstractmethod
+    def add(self, key: str) -> None:
+        """Register a new key in the policy."""
+
+    @abstractmethod
+    def touch(self, key: str) -> None:
+        """Register an access (cache hit) for an already known key."""
+
+    @abstractmethod
+    def discard(self, key: str) -> None:
+        """Forget about a key (deleted from cache), no-op if key is unknown."""
+
+    @abstractmethod
+    def pop(self) -> tp.Optional[str]:
+        """Remove and return the next key to evict, None if policy is empty."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of keys tracked by the policy."""
+
+    @abstractmethod
+    def __contains__(self, key: object) -> bool:
+        """Whether the key is tracked by the policy."""
+
+
+class LRUPolicy(EvictionPolicy):
+    """Least-Recently-Used eviction policy."""
+
+    def __init__(self) -> None:
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+
+    def add(self, key: str) -> None:
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+
+    def touch(self, key: str) -> None:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+
+    def discard(self, key: str) -> None:
+        self._keys.pop(key, None)
+
+    def pop(self) -> tp.Optional[str]:
+        if not self._keys:
+            return None
+        return self._keys.popitem(last=False)[0]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+
+class LFUPolicy(EvictionPolicy):
+    """Least-Frequently-Used eviction policy.
+
+    Keys are grouped in buckets by access frequency, ties inside a bucket are
+    broken by recency (oldest first). Non-empty buckets are linked in increasing
+    frequency order, so that the lowest frequency is always known (no scan).
+    """
+
+    def __init__(self) -> None:
+        self._freqs: tp.Dict[str, int] = {}
+        self._buckets: tp.Dict[int, "OrderedDict[str, None]"] = {}
+        # links between frequencies of the buckets, 0 is the head of the list
+        self._next: tp.Dict[int, int] = {0: 0}
+        self._prev: tp.Dict[int, int] = {0: 0}
+
+    @property
+    def _min_freq(self) -> int:
+        # lowest frequency, 0 when empty
+        return self._next[0]
+
+    def _insert_bucket(self, freq: int, after: int) -> None:
+        # new bucket for 'freq', linked right after the 'after' frequency
+        following = self._next[after]
+        self._next[after] = self._prev[following] = freq
+        self._prev[freq], self._next[freq] = after, following
+        self._buckets[freq] = OrderedDict()
+
+    def _remove_bucket(self, freq: int) -> None:
+        previous, following = self._prev.pop(freq), self._next.pop(freq)
+        self._next[previous], self._prev[following] = following, previous
+        del self._buckets[freq]
+
+    def _unlink(self, key: str) -> int:
+        freq = self._freqs.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            self._remove_bucket(freq)
+        return freq
+
+    def add(self, key: str) -> None:
+        if key in self._freqs:
+            self.touch(key)
+            return
+        if 1 not in self._buckets:
+            self._insert_bucket(1, after=0)
+        self._buckets[1][key] = None
+        self._freqs[key] = 1
+
+    def touch(self, key: str) -> None:
+        freq = self._freqs.get(key)
+        if freq is None:
+            return
+        if freq + 1 not in self._buckets:
+            # linked before the bucket of 'freq' is (maybe) removed
+            self._insert_bucket(freq + 1, after=freq)
+        self._unlink(key)
+        self._buckets[freq + 1][key] = None
+        self._freqs[key] = freq + 1
+
+    def discard(self, key: str) -> None:
+        if key in self._freqs:
+            self._unlink(key)
+
+    def pop(self) -> tp.Optional[str]:
+        if not self._freqs:
+            return None
+        key = next(iter(self._buckets[self._min_freq]))
+        self._unlink(key)
+        return key
+
+    def __len__(self) -> int:
+        return len(self._freqs)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._freqs
+
+
+class CountMinSketch:
+    """Approximate frequency counter with periodic aging (used by TinyLFU).
+
+    Counters are saturated at 15 (4 bits) and halved every 'sample_size'
+    increments so that old popularity fades away.
+
+    Args:
+        capacity: expected number of entries in the cache.
+        depth: number of hash rows.
+    """
+
+    max_count = 15
+
+    def __init__(self, capacity: int, depth: int = 4) -> None:
+        width = 1
+        while width < max(capacity, 16):
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(depth)]
+        self._seeds = [0x9E3779B9 * (i + 1) for i in range(depth)]
+        self._sample_size = 10 * max(capacity, 16)
+        self._additions = 0
+
+    def _indexes(self, key: str) -> tp.Iterator[int]:
+        hashed = hash(key)
+        for seed in self._seeds:
+            yield ((hashed ^ seed) * 0x01000193 >> 7) & self._mask
+
+    def increment(self, key: str) -> None:
+        incremented = False
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.max_count:
+                row[index] += 1
+                incremented = True
+        if incremented:
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._reset()
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _reset(self) -> None:
+        for row in self._rows:
+            for index, value in enumerate(row):
+                if value:
+                    row[index] = value >> 1
+        self._additions //= 2
+
+
+class TinyLFUPolicy(EvictionPolicy):
+    """W-TinyLFU eviction policy.
+
+    New keys enter a small LRU 'window' (~1% of the entries), keys leaving the
+    window move to a segmented LRU main region (probation/protected). When an
+    entry has to be evicted, the oldest window entry (or the newest main entry if
+    the window is empty) competes with the oldest probation entry and the one with
+    the lowest estimated frequency is evicted.
+
+    Args:
+        capacity: expected number of entries, used to size the frequency sketch.
+    """
+
+    window_ratio = 0.01
+    protected_ratio = 0.8
+
+    def __init__(self, capacity: int = 10_000) -> None:
+        self.sketch = CountMinSketch(capacity)
+        self._window: "OrderedDict[str, None]" = OrderedDict()
+        self._probation: "OrderedDict[str, None]" = OrderedDict()
+        self._protected: "OrderedDict[str, None]" = OrderedDict()
+
+    def _window_capacity(self) -> int:
+        return max(1, int(len(self) * self.window_ratio))
+
+    def _protected_capacity(self) -> int:
+        main = len(self._probation) + len(self._protected)
+        return max(1, int(main * self.protected_ratio))
+
+    def add(self, key: str) -> None:
+        if key in self:
+            self.touch(key)
+            return
+        self.sketch.increment(key)
+        self._window[key] = None
+        if len(self._window) > self._window_capacity():
+            moved, _ = self._window.popitem(last=False)
+            self._probation[moved] = None
+
+    def touch(self, key: str) -> None:
+        self.sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._probation:
+            del self._probation[key]
+            self._protected[key] = None
+            if len(self._protected) > self._protected_capacity():
+                demoted, _ = self._protected.popitem(last=False)
+                self._probation[demoted] = None
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+
+    def discard(self, key: str) -> None:
+        self._window.pop(key, None)
+        self._probation.pop(key, None)
+        self._protected.pop(key, None)
+
+    def pop(self) -> tp.Optional[str]:
+        main = self._probation or self._protected
+        if not main:
+            return self._window.popitem(last=False)[0] if self._window else None
+        victim = next(iter(main))
+        if self._window:
+            candidate = next(iter(self._window))
+        else:
+            # window is empty, the last key that left it competes for admission
+            candidate = next(reversed(main))
+        if candidate == victim:
+            self.discard(victim)
+            return victim
+        if self.sketch.estimate(candidate) > self.sketch.estimate(victim):
+            # candidate is admitted to the main region, victim is evicted
+            self.discard(candidate)
+            self.discard(victim)
+            self._probation[candidate] = None
+            return victim
+        self.discard(candidate)
+        return candidate
+
+    def __len__(self) -> int:
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._window or key in self._probation or key in self._protected
+
+
+_POLICIES: tp.Dict[str, tp.Callable[[tp.Optional[int]], EvictionPolicy]] = {
+    "lru": lambda capacity: LRUPolicy(),
+    "lfu": lambda capacity: LFUPolicy(),
+    "tinylfu": lambda capacity: TinyLFUPolicy(capacity or 10_000),
+}
+
+
+def get_eviction_policy(
+    policy: tp.Union[str, EvictionPolicy], capacity: tp.Optional[int] = None
+) -> EvictionPolicy:
+    """Get an eviction policy instance from its name ('lru', 'lfu', 'tinylfu').
+
+    Args:
+        policy: name of the policy or an already created EvictionPolicy
+        capacity: optional expected number of entries in the cache
+
+    Raises:
+        ValueError: if the policy name is unknown
+        TypeError: if policy is neither a str nor an EvictionPolicy
+
+    Returns:
+        EvictionPolicy
+    """
+    if isinstance(policy, EvictionPolicy):
+        return policy
+    if not isinstance(policy, str):
+        raise TypeError(
+            "Expected policy of type 'str' or 'httpx_cache.EvictionPolicy', "
+            f"got {type(policy)}"
+        )
+    try:
+        return _POLICIES[policy.lower()](capacity)
+    except KeyError:
+        raise ValueError(
+            f"Unknown eviction policy '{policy}', expected one of {list(_POLICIES)}"
+        ) from None
@@ -1,35 +1,210 @@
+import contextlib
+import logging
+import os
+import pathlib
+import struct
+import tempfile
+import threading
 import typing as tp
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from anyio import to_thread
 from fasteners import ReaderWriterLock as RWLock
-from aiorwlock import RWLock as AsyncRWLock
 import httpx
 
-from httpx_cache.cache.base import BaseCache
-from httpx_cache.serializer.base import BaseSerializer
-from httpx_cache.serializer.common import MsgPackSerializer
-from httpx_cache.utils import get_cache_filepath
+from httpx_cache.cache.base import BaseCache, CacheWriter
+from httpx_cache.cache.eviction import EvictionPolicy, get_eviction_policy
+from httpx_cache.serializer.base import BaseSerializer, LoadError
+from httpx_cache.serializer.common import ContentType, MsgPackSerializer
+from httpx_cache.utils import (
+    FileByteStream,
+    get_cache_filepath,
+    get_cache_key,
+    get_sharded_filepath,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # not available on windows
+    fcntl = None  # type: ignore
+
+# cache files written with a MsgPackSerializer start with a magic, followed by the
+# size of a header section (the response without its content) and the raw content
+FILE_MAGIC = b"HXC\x01"
+_PREFIX = struct.Struct(">4sI")
+
+# cache files are named after a sha224 hex digest
+_FILENAME_SIZE = 56
+_HEX_DIGITS = frozenset("0123456789abcdef")
+_GC_MODES = ("inline", "thread", "manual")
+
+
+def _is_cache_filename(name: str) -> bool:
+    return len(name) == _FILENAME_SIZE and _HEX_DIGITS.issuperset(name)
+
+
+# a cache file, read as a single blob or as a (header section, content) pair
+_Cached = tp.Union[bytes, tp.Tuple[bytes, tp.Union[bytes, FileByteStream]]]
+_T = tp.TypeVar("_T")
+_R = tp.TypeVar("_R")
+
+
+class _FileWriter(CacheWriter):
+    # content chunks are appended to a temporary file as they arrive, the file is
+    # moved in place on commit (readers never see a partial file)
+
+    flush_size = 1024 * 1024
+    cache: "FileCache"
+
+    def __init__(
+        self, cache: "FileCache", request: httpx.Request, response: httpx.Response
+    ) -> None:
+        super().__init__(cache, request, response)
+        self._file: tp.Optional[tp.BinaryIO] = None
+        self._tmp_path = ""
+
+    def _open(self) -> tp.BinaryIO:
+        if self._file is None:
+            assert isinstance(self.cache.serializer, MsgPackSerializer)
+            head, _ = self.cache.serializer.dumps_parts(
+                response=self.response, content=[]
+            )
+            fd, self._tmp_path = tempfile.mkstemp(
+                dir=self.cache.cache_dir, suffix=".tmp"
+            )
+            self._file = os.fdopen(fd, "wb")
+            self._file.write(_PREFIX.pack(FILE_MAGIC, len(head)) + head)
+        return self._file
+
+    def _flush(self, chunks: tp.List[bytes]) -> None:
+        try:
+            file = self._open()
+            file.writelines(chunks)
+            file.flush()
+        except BaseException:
+            self._discard()
+            raise
+
+    async def _aflush(self, chunks: tp.List[bytes]) -> None:
+        try:
+            await to_thread.run_sync(self._flush, chunks)
+        except Exception:
+            # the response is not cached, its stream goes on
+            return None
+
+    def _discard(self) -> None:
+        self.closed = True
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self._tmp_path)
+            self._file = None
+
+    def commit(self) -> None:
+        if self.closed:
+            return
+        self._flush(self._take())
+        self.closed = True
+        assert self._file is not None
+        file_size = self._file.tell()
+        self._file.close()
+        self._file = None
+        self.cache._store_file(self.request, self.response, self._tmp_path, file_size)
+
+    async def acommit(self) -> None:
+        try:
+            await to_thread.run_sync(self.commit)
+        except Exception:
+            return None
+
+    def abort(self) -> None:
+        if self.closed:
+            return
+        self._take()
+        self._discard()
+
+    async def aabort(self) -> None:
+        await to_thread.run_sync(self.abort)
 
 
 class FileCache(BaseCache):
     """File cache that stores cached responses in files on disk.
 
-    Uses a lock/async_lock to make sure each get/set/delete operation is safe.
+    Each cache file is guarded by one of 'lock_stripes' read/write locks (chosen
+    from the file name), so that operations on different urls rarely wait for each
+    other. Cache files are never modified in place (they are replaced by a new
+    file), so a reader always sees a complete file.
+
+    When the same cache_dir is shared by several processes, set 'process_locks'
+    to also take 'fcntl' advisory locks (one lock file per stripe in
+    'cache_dir/.locks').
+
+    When using a MsgPackSerializer (default), the content of a cached response is
+    stored raw after a small header section. Content bigger than 'mmap_threshold'
+    is not read on cache hits: the response stream is memory-mapped from the
+    cache file, and read lazily when the response is read/streamed.
+
+    With many cached responses, set 'shards' to spread the cache files in
+    sub-directories ('cache_dir/ab/cd/abcd...' with 2 levels) instead of a single
+    flat directory, and call 'migrate' to move files of an existing cache_dir to
+    the new layout.
+
+    The cache_dir is unbounded by default, when 'max_size' is set an index of the
+    cache files (size and accesses) is kept in memory, built by scanning the
+    cache_dir once, and cache files are removed using the given eviction policy
+    when the cache_dir is over budget. The garbage collection runs:
+
+    - 'inline': in the call to set that goes over budget (amortized, the cache_dir
+        is cleaned up to 90% of 'max_size')
+    - 'thread': in a background thread, every 'gc_interval' seconds or when the
+        cache_dir goes over budget
+    - 'manual': only when calling 'gc'/'agc' (e.g. periodically from an anyio task)
+
+    Batch operations (get_many/set_many/delete_many) process the cache files
+    concurrently, with up to 'batch_workers' threads.
 
     Args:
         cache_dir: Optional custom cache_dir where to store cache files, defaults to
             ~/.cache/httpx-cache
         serializer: Optional serializer for the data to cache, defaults to:
             httpx_cache.MsgPackSerializer
+        mmap_threshold: size in bytes above which the cached content is lazily
+            loaded, defaults to 64KiB
+        shards: number of sub-directory levels of the cache_dir, defaults to 0
+            (flat cache_dir)
+        lock_stripes: number of locks shared by the cache files, defaults to 64
+        process_locks: whether to use inter-process 'fcntl' locks, defaults to
+            False
+        max_size: Optional maximum size (in bytes) of the cache files, defaults to
+            None
+        policy: eviction policy used to remove cache files, one of 'lru', 'lfu',
+            'tinylfu' or an instance of httpx_cache.EvictionPolicy, defaults to
+            'lru' (the index is initialized in last access time order)
+        gc_mode: when to run the garbage collection, one of 'inline', 'thread',
+            'manual', defaults to 'inline'
+        gc_interval: interval in seconds between two garbage collections in 'thread'
+            mode, defaults to 60
     """
 
-    lock = RWLock()
+    gc_low_watermark = 0.9
+    # max number of threads used by batch operations
+    batch_workers = 8
 
     def __init__(
         self,
         cache_dir: tp.Union[None, str, Path] = None,
         serializer: tp.Optional[BaseSerializer] = None,
+        mmap_threshold: int = 64 * 1024,
+        shards: int = 0,
+        lock_stripes: int = 64,
+        process_locks: bool = False,
+        max_size: tp.Optional[int] = None,
+        policy: tp.Union[str, EvictionPolicy] = "lru",
+        gc_mode: str = "inline",
+        gc_interval: float = 60.0,
     ) -> None:
         self.serializer = serializer or MsgPackSerializer()
         if not isinstance(self.serializer, BaseSerializer):
@@ -38,6 +213,16 @@ class FileCache(BaseCache):
                 f"got {type(self.serializer)}"
             )
         self._extra = str(type(self.serializer).__name__)
+        self.mmap_threshold = mmap_threshold
+        if not 0 <= shards <= _FILENAME_SIZE // 2:
+            raise ValueError(
+                f"Expected 'shards' to be between 0 and {_FILENAME_SIZE // 2}, "
+                f"got {shards}"
+            )
+        self.shards = shards
+        if lock_stripes <= 0:
+            raise ValueError(f"Expected 'lock_stripes' to be > 0, got {lock_stripes}")
+        self.locks = [RWLock() for _ in range(lock_stripes)]
 
         if cache_dir is None:
             cache_dir = Path.home() / ".cache/httpx-cache"
@@ -47,38 +232,284 @@ class FileCache(BaseCache):
 
         self.cache_dir = cache_dir
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # temporary files and memory-mapping are only used on local filesystems
+        self._is_local = isinstance(cache_dir, (pathlib.PosixPath, pathlib.WindowsPath))
+
+        self._lock_dir: tp.Optional[Path] = None
+        if process_locks:
+            if fcntl is None or not self._is_local:
+                raise ValueError("'process_locks' needs 'fcntl' and a local cache_dir")
+            self._lock_dir = self.cache_dir / ".locks"
+            self._lock_dir.mkdir(exist_ok=True)
 
-        self._async_lock: tp.Optional[AsyncRWLock] = None
+        if max_size is not None and max_size <= 0:
+            raise ValueError(f"Expected 'max_size' to be > 0, got {max_size}")
+        if gc_mode not in _GC_MODES:
+            raise ValueError(
+                f"Expected 'gc_mode' to be one of {_GC_MODES}, got {gc_mode}"
+            )
+        self.max_size = max_size
+        self.policy = get_eviction_policy(policy)
+        self.gc_mode = gc_mode
+        self.gc_interval = gc_interval
+        self.sizes: tp.Dict[str, int] = {}
+        self.total_bytes = 0
+        self.evictions = 0
+        self._index_loaded = False
+        self._index_lock = threading.Lock()
+        self._gc_lock = threading.Lock()
+        self._gc_event = threading.Event()
+        self._gc_thread: tp.Optional[threading.Thread] = None
+        self._closed = False
+        if self.bounded and gc_mode == "thread":
+            self._gc_thread = threading.Thread(
+                target=self._gc_loop, name="httpx-cache-gc", daemon=True
+            )
+            self._gc_thread.start()
 
     @property
-    def async_lock(self) -> AsyncRWLock:
-        if self._async_lock is None:
-            self._async_lock = AsyncRWLock()
-        return self._async_lock
+    def bounded(self) -> bool:
+        return self.max_size is not None
+
+    @contextlib.contextmanager
+    def _locked(self, filepath: Path, exclusive: bool) -> tp.Iterator[None]:
+        # cache file names are hex digests, uniformly spread over the stripes
+        index = int(filepath.name[:8], 16) % len(self.locks)
+        lock = self.locks[index]
+        with lock.write_lock() if exclusive else lock.read_lock():
+            if self._lock_dir is None:
+                yield
+                return
+            fd = os.open(self._lock_dir / str(index), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                yield
+            finally:
+                # closing the file releases the lock
+                os.close(fd)
+
+    def _get_filepath(self, request: httpx.Request, key: str) -> Path:
+        return get_cache_filepath(
+            self.cache_dir, request, extra=self._extra, key=key, shards=self.shards
+        )
+
+    def _read(self, filepath: Path) -> tp.Optional[_Cached]:
+        if not filepath.is_file():
+            return None
+        with self._locked(filepath, exclusive=False):
+            cached = self._read_file(filepath)
+        if cached is not None and self.bounded:
+            with self._index_lock:
+                self.policy.touch(filepath.name)
+        return cached
+
+    def _read_file(self, filepath: Path) -> tp.Optional[_Cached]:
+        if not self._is_local:
+            data = filepath.read_bytes()
+            if not data.startswith(FILE_MAGIC) or len(data) < _PREFIX.size:
+                return data
+            _, head_size = _PREFIX.unpack_from(data)
+            offset = _PREFIX.size + head_size
+            return data[_PREFIX.size : offset], data[offset:]
+        try:
+            f = filepath.open("rb")
+        except FileNotFoundError:
+            return None
+        lazy = False
+        try:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size or not prefix.startswith(FILE_MAGIC):
+                # vary marker, or response serialized as a single blob
+                return prefix + f.read()
+            _, head_size = _PREFIX.unpack(prefix)
+            head = f.read(head_size)
+            offset = _PREFIX.size + head_size
+            size = os.fstat(f.fileno()).st_size - offset
+            if size <= self.mmap_threshold:
+                return head, f.read()
+            lazy = True
+        finally:
+            # when lazy, the file is owned (and closed) by the stream
+            if not lazy:
+                f.close()
+        return head, FileByteStream(f, offset=offset, size=size)
+
+    def _loads(
+        self, request: httpx.Request, cached: _Cached
+    ) -> tp.Optional[httpx.Response]:
+        # the metadata is read from the header section only
+        head = cached[0] if isinstance(cached, tuple) else cached
+        metadata = self.serializer.loads_metadata(cached=head)
+        if self.is_unusable(request, metadata):
+            if isinstance(cached, tuple) and isinstance(cached[1], FileByteStream):
+                cached[1].close()
+            return None
+        if isinstance(cached, tuple):
+            assert isinstance(self.serializer, MsgPackSerializer)
+            head, body = cached
+            return self.serializer.loads_parts(
+                head=head, body=body, request=request, metadata=metadata
+            )
+        try:
+            return self.serializer.loads(
+                request=request, cached=cached, metadata=metadata
+            )
+        except LoadError as error:
+            logger.debug(f"Can't load cached response for {request}: {error}")
+            return None
 
     def get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
-        filepath = get_cache_filepath(self.cache_dir, request, extra=self._extra)
-        if filepath.is_file():
-            with self.lock.read_lock():
-                cached = filepath.read_bytes()
-            return self.serializer.loads(request=request, cached=cached)
+        filepath = self._get_filepath(request, self.get_lookup_key(request))
+        cached = self._read(filepath)
+        secondary_key = self.resolve_vary_marker(request, cached)
+        if secondary_key is not None:
+            cached = self._read(self._get_filepath(request, secondary_key))
+        if cached is not None:
+            return self._loads(request, cached)
         return None
 
     async def aget(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
-        filepath = get_cache_filepath(self.cache_dir, request, extra=self._extra)
+        filepath = self._get_filepath(request, self.get_lookup_key(request))
 
-        async with self.async_lock.reader:
-            if await to_thread.run_sync(filepath.is_file, cancellable=True):
-                try:
-                    cached = await to_thread.run_sync(
-                        filepath.read_bytes,
-                        cancellable=True,
-                    )
-                    return self.serializer.loads(request=request, cached=cached)
-                except Exception:
-                    return None
+        try:
+            cached = await to_thread.run_sync(self._read, filepath, cancellable=True)
+            secondary_key = self.resolve_vary_marker(request, cached)
+            if secondary_key is not None:
+                cached = await to_thread.run_sync(
+                    self._read,
+                    self._get_filepath(request, secondary_key),
+                    cancellable=True,
+                )
+            if cached is not None:
+                return self._loads(request, cached)
+        except Exception:
+            return None
         return None
 
+    def _map(self, func: tp.Callable[[_T], _R], items: tp.Sequence[_T]) -> tp.List[_R]:
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        workers = min(self.batch_workers, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def get_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        return self._map(self.get, requests)
+
+    async def aget_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        try:
+            return await to_thread.run_sync(self.get_many, requests, cancellable=True)
+        except Exception:
+            return [None] * len(requests)
+
+    def _dumps(
+        self, response: httpx.Response, content: tp.Optional[ContentType]
+    ) -> tp.List[bytes]:
+        if isinstance(self.serializer, MsgPackSerializer):
+            head, body = self.serializer.dumps_parts(response=response, content=content)
+            return [_PREFIX.pack(FILE_MAGIC, len(head)), head, *body]
+        if content is not None and not isinstance(content, bytes):
+            content = b"".join(content)
+        return [self.serializer.dumps(response=response, content=content)]
+
+    def _write_chunks(self, filepath: Path, chunks: tp.Sequence[bytes]) -> None:
+        # chunks are written one by one to a temporary file, then moved in place,
+        # so that readers (and memory-mapped contents) never see a partial file
+        if self.shards:
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked(filepath, exclusive=True):
+            self._write_file(filepath, chunks)
+        if self.bounded:
+            # outside of the file lock, the garbage collection takes other locks
+            self._track(filepath.name, sum(len(chunk) for chunk in chunks))
+
+    def _move_file(self, tmp_path: str, filepath: Path, size: int) -> None:
+        # move a complete temporary file in place
+        if self.shards:
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with self._locked(filepath, exclusive=True):
+                os.replace(tmp_path, filepath)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.bounded:
+            self._track(filepath.name, size)
+
+    def _write_file(self, filepath: Path, chunks: tp.Sequence[bytes]) -> None:
+        if not self._is_local:
+            filepath.write_bytes(b"".join(chunks))
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.writelines(chunks)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _store(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        content: tp.Optional[ContentType],
+    ) -> None:
+        key, vary_marker = self.get_store_key(request, response)
+        filepath = self._get_filepath(request, key)
+        to_cache = self._dumps(response, content)
+        if vary_marker is not None:
+            self._write_chunks(
+                self._get_filepath(request, get_cache_key(request)), [vary_marker]
+            )
+        self._write_chunks(filepath, to_cache)
+
+    def _store_file(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        tmp_path: str,
+        size: int,
+    ) -> None:
+        # store a response already written to a temporary file
+        try:
+            key, vary_marker = self.get_store_key(request, response)
+            if vary_marker is not None:
+                self._write_chunks(
+                    self._get_filepath(request, get_cache_key(request)), [vary_marker]
+                )
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._move_file(tmp_path, self._get_filepath(request, key), size)
+
+    async def _astore(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        content: tp.Optional[ContentType],
+    ) -> None:
+        key, vary_marker = self.get_store_key(request, response)
+        filepath = self._get_filepath(request, key)
+        to_cache = self._dumps(response, content)
+        try:
+            if vary_marker is not None:
+                await to_thread.run_sync(
+                    self._write_chunks,
+                    self._get_filepath(request, get_cache_key(request)),
+                    [vary_marker],
+                    cancellable=True,
+                )
+            await to_thread.run_sync(
+                self._write_chunks, filepath, to_cache, cancellable=True
+            )
+        except Exception:
+            return None
+
     def set(
         self,
         *,
@@ -86,10 +517,7 @@ class FileCache(BaseCache):
         response: httpx.Response,
         content: tp.Optional[bytes] = None,
     ) -> None:
-        filepath = get_cache_filepath(self.cache_dir, request, extra=self._extra)
-        to_cache = self.serializer.dumps(response=response, content=content)
-        with self.lock.write_lock():
-            filepath.write_bytes(to_cache)
+        self._store(request, response, content)
 
     async def aset(
         self,
@@ -98,25 +526,201 @@ class FileCache(BaseCache):
         response: httpx.Response,
         content: tp.Optional[bytes] = None,
     ) -> None:
-        filepath = get_cache_filepath(self.cache_dir, request, extra=self._extra)
-        async with self.async_lock.writer:
-            to_cache = self.serializer.dumps(response=response, content=content)
-            try:
-                await to_thread.run_sync(
-                    filepath.write_bytes,
-                    to_cache,
-                    cancellable=True,
-                )
-            except Exception:
-                return None
+        await self._astore(request, response, content)
+
+    def set_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        self._store(request, response, chunks)
+
+    async def aset_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        await self._astore(request, response, chunks)
+
+    def open_writer(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> CacheWriter:
+        if not self._is_local or not isinstance(self.serializer, MsgPackSerializer):
+            # the content is written at once with 'set_chunks'
+            return super().open_writer(request=request, response=response)
+        return _FileWriter(self, request, response)
+
+    def _store_item(self, item: tp.Tuple[httpx.Request, httpx.Response]) -> None:
+        request, response = item
+        self._store(request, response, None)
+
+    def set_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        self._map(self._store_item, items)
+
+    async def aset_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        try:
+            await to_thread.run_sync(self.set_many, items, cancellable=True)
+        except Exception:
+            return None
 
     def delete(self, request: httpx.Request) -> None:
-        filepath = get_cache_filepath(self.cache_dir, request, extra=self._extra)
+        filepath = self._get_filepath(request, self.get_lookup_key(request))
         if filepath.is_file():
-            with self.lock.write_lock():
-                filepath.unlink()
+            self._unlink(filepath)
 
     async def adelete(self, request: httpx.Request) -> None:
-        filepath = get_cache_filepath(self.cache_dir, request, extra=self._extra)
-        async with self.async_lock.writer:
-            await to_thread.run_sync(filepath.unlink, True, cancellable=True)
+        filepath = self._get_filepath(request, self.get_lookup_key(request))
+        await to_thread.run_sync(self._unlink, filepath, cancellable=True)
+
+    def delete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        self._map(self.delete, requests)
+
+    async def adelete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        await to_thread.run_sync(self.delete_many, requests, cancellable=True)
+
+    def _unlink(self, filepath: Path) -> None:
+        with self._locked(filepath, exclusive=True):
+            filepath.unlink(missing_ok=True)
+        if self.bounded:
+            with self._index_lock:
+                self.total_bytes -= self.sizes.pop(filepath.name, 0)
+                self.policy.discard(filepath.name)
+
+    def _load_index(self) -> None:
+        # called with the index lock held, the cache_dir is scanned only once
+        if self._index_loaded:
+            return
+        self._index_loaded = True
+        entries = []
+        for path in self.cache_dir.rglob("*"):
+            if not _is_cache_filename(path.name):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, path.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self.total_bytes += size - self.sizes.get(name, 0)
+            self.sizes[name] = size
+            self.policy.add(name)
+
+    def _track(self, name: str, size: int) -> None:
+        assert self.max_size is not None
+        with self._index_lock:
+            self._load_index()
+            self.total_bytes += size - self.sizes.get(name, 0)
+            self.sizes[name] = size
+            self.policy.add(name)
+            over_budget = self.total_bytes > self.max_size
+        if over_budget:
+            if self.gc_mode == "inline":
+                self.gc()
+            elif self.gc_mode == "thread":
+                self._gc_event.set()
+
+    def gc(self) -> int:
+        """Remove cache files until the cache_dir is back under budget.
+
+        The cache_dir is cleaned up to 'gc_low_watermark' (90%) of 'max_size', it
+        does nothing if the cache is unbounded or a collection is already running.
+
+        Returns:
+            number of removed cache files
+        """
+        if self.max_size is None or not self._gc_lock.acquire(blocking=False):
+            return 0
+        removed = 0
+        try:
+            target = self.max_size * self.gc_low_watermark
+            while True:
+                with self._index_lock:
+                    self._load_index()
+                    if self.total_bytes <= target:
+                        break
+                    name = self.policy.pop()
+                    if name is None:
+                        break
+                    self.total_bytes -= self.sizes.pop(name, 0)
+                filepath = get_sharded_filepath(self.cache_dir, name, self.shards)
+                with self._locked(filepath, exclusive=True):
+                    filepath.unlink(missing_ok=True)
+                removed += 1
+        finally:
+            self._gc_lock.release()
+        self.evictions += removed
+        if removed:
+            logger.debug(f"Removed {removed} files from cache_dir: {self.cache_dir}")
+        return removed
+
+    async def agc(self) -> int:
+        """(Async) Remove cache files until the cache_dir is back under budget."""
+        return await to_thread.run_sync(self.gc, cancellable=True)
+
+    def _gc_loop(self) -> None:
+        while not self._closed:
+            self._gc_event.wait(self.gc_interval)
+            self._gc_event.clear()
+            if self._closed:
+                break
+            try:
+                self.gc()
+            except Exception:
+                logger.exception("Garbage collection of the FileCache failed")
+
+    def close(self) -> None:
+        self._closed = True
+        if self._gc_thread is not None:
+            self._gc_event.set()
+            self._gc_thread.join()
+            self._gc_thread = None
+
+    async def aclose(self) -> None:
+        await to_thread.run_sync(self.close)
+
+    def migrate(self) -> int:
+        """Move the cache files to the current 'shards' layout of the cache_dir.
+
+        Used to shard an existing flat cache_dir (or to change its number of
+        shard levels), empty shard directories left behind are removed.
+
+        It should not run while other processes use the cache_dir.
+
+        Returns:
+            number of moved cache files
+        """
+        moved = 0
+        directories = []
+        with contextlib.ExitStack() as stack:
+            for lock in self.locks:
+                stack.enter_context(lock.write_lock())
+            for path in list(self.cache_dir.rglob("*")):
+                if path.is_dir():
+                    if len(path.name) == 2 and _HEX_DIGITS.issuperset(path.name):
+                        directories.append(path)
+                    continue
+                name = path.name
+                if not _is_cache_filename(name):
+                    # temporary (or foreign) file
+                    continue
+                filepath = get_sharded_filepath(self.cache_dir, name, self.shards)
+                if path != filepath:
+                    filepath.parent.mkdir(parents=True, exist_ok=True)
+                    path.replace(filepath)
+                    moved += 1
+            # deepest directories first
+            for directory in sorted(directories, key=lambda d: -len(d.parts)):
+                try:
+                    directory.rmdir()
+                except OSError:
+                    # not empty
+                    pass
+        return moved
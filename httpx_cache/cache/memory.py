@@ -1,3 +1,4 @@
+import sys
 import threading
 import typing as tp
 
@@ -5,9 +6,39 @@ import anyio
 import httpx
 
 from httpx_cache.cache.base import BaseCache
-from httpx_cache.serializer.base import BaseSerializer
-from httpx_cache.serializer.common import MsgPackSerializer
-from httpx_cache.utils import get_cache_key
+from httpx_cache.cache.eviction import EvictionPolicy, get_eviction_policy
+from httpx_cache.serializer.base import BaseSerializer, LoadError
+from httpx_cache.serializer.common import DictSerializer, MsgPackSerializer
+from httpx_cache.utils import CacheMetadata, get_cache_key
+
+
+def get_cached_size(cached: tp.Any) -> int:
+    """Get the size in bytes of a serialized response.
+
+    For bytes/str (msgpack or json serializers) it's the length of the serialized
+    data, for dicts (DictSerializer) it's the size of the content plus headers.
+
+    Args:
+        cached: serialized response
+
+    Returns:
+        int, size in bytes
+    """
+    if isinstance(cached, (bytes, bytearray, memoryview, str)):
+        return len(cached)
+    if isinstance(cached, dict):
+        size = 0
+        for key in ("_content", "stream_content"):
+            content = cached.get(key)
+            if isinstance(content, list):
+                size += sum(len(chunk) for chunk in content)
+            elif content is not None:
+                size += len(content)
+        for token in cached.get("headers", ()):
+            # encoded headers: literal names/values, or table indexes
+            size += len(token) if isinstance(token, str) else 1
+        return size
+    return sys.getsizeof(cached)
 
 
 class DictCache(BaseCache):
@@ -15,10 +46,20 @@ class DictCache(BaseCache):
 
     Uses a lock/async_lock to make sure each get/set/delete operation is safe.
 
+    The cache is unbounded by default, when 'max_entries' and/or 'max_bytes' is set,
+    entries are evicted using the given eviction policy until the cache fits
+    its limits again.
+
     Args:
         data: Optional initial data for the cache {str: Any}, default to {}
         serializer: Optional serializer for the data to cache, defaults to:
             httpx_cache.MsgPackSerializer
+        max_entries: Optional maximum number of cached responses, defaults to None
+        max_bytes: Optional maximum size (in bytes) of all cached responses,
+            defaults to None
+        policy: eviction policy to use when the cache is full, one of 'lru',
+            'lfu', 'tinylfu' or an instance of httpx_cache.EvictionPolicy,
+            defaults to 'lru'
     """
 
     lock = threading.Lock()
@@ -28,6 +69,9 @@ class DictCache(BaseCache):
         self,
         data: tp.Optional[tp.Dict[str, tp.Any]] = None,
         serializer: tp.Optional[BaseSerializer] = None,
+        max_entries: tp.Optional[int] = None,
+        max_bytes: tp.Optional[int] = None,
+        policy: tp.Union[str, EvictionPolicy] = "lru",
     ) -> None:
         self.data: tp.Dict[str, tp.Any] = data or {}
         self.serializer = serializer or MsgPackSerializer()
@@ -39,20 +83,166 @@ class DictCache(BaseCache):
                 "Excpected serializer of type 'httpx_cache.BaseSerializer', "
                 f"got {type(self.serializer)}"
             )
+        for name, limit in (("max_entries", max_entries), ("max_bytes", max_bytes)):
+            if limit is not None and limit <= 0:
+                raise ValueError(f"Expected '{name}' to be > 0, got {limit}")
 
-    def _get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
-        key = get_cache_key(request)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = get_eviction_policy(policy, capacity=max_entries)
+        self.sizes: tp.Dict[str, int] = {}
+        self.total_bytes = 0
+        self.evictions = 0
+
+        if self.bounded:
+            for key, cached in self.data.items():
+                self._track(key, cached)
+            self._evict()
+
+    @property
+    def bounded(self) -> bool:
+        return self.max_entries is not None or self.max_bytes is not None
+
+    def _is_full(self) -> bool:
+        if self.max_entries is not None and len(self.data) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def _track(self, key: str, cached: tp.Any) -> None:
+        size = get_cached_size(cached)
+        self.total_bytes += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+        self.policy.add(key)
+
+    def _untrack(self, key: str) -> None:
+        self.total_bytes -= self.sizes.pop(key, 0)
+        self.policy.discard(key)
+
+    def _evict(self) -> None:
+        while self._is_full():
+            key = self.policy.pop()
+            if key is None:
+                break
+            self.data.pop(key, None)
+            self.total_bytes -= self.sizes.pop(key, 0)
+            self.evictions += 1
+
+    def _lookup(
+        self, request: httpx.Request
+    ) -> tp.Tuple[str, tp.Any, tp.Optional[CacheMetadata]]:
+        key = self.get_lookup_key(request)
         cached = self.data.get(key)
+        secondary_key = self.resolve_vary_marker(request, cached)
+        if secondary_key is not None:
+            key = secondary_key
+            cached = self.data.get(key)
+        if cached is None:
+            return key, None, None
+        metadata = self.serializer.loads_metadata(cached=cached)
+        if self.is_unusable(request, metadata):
+            # removed from the cache
+            with self.lock:
+                self._delete(key)
+            return key, None, None
+        return key, cached, metadata
+
+    def _loads(
+        self,
+        request: httpx.Request,
+        key: str,
+        cached: tp.Any,
+        metadata: tp.Optional[CacheMetadata],
+    ) -> tp.Optional[httpx.Response]:
+        try:
+            return self.serializer.loads(
+                cached=cached, request=request, metadata=metadata
+            )
+        except LoadError:
+            # removed from the cache
+            with self.lock:
+                self._delete(key)
+            return None
+
+    def _get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        key, cached, metadata = self._lookup(request)
         if cached is not None:
-            return self.serializer.loads(cached=cached, request=request)
+            if self.bounded:
+                with self.lock:
+                    self.policy.touch(key)
+            return self._loads(request, key, cached, metadata)
         return None
 
+    def _get_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        found = [self._lookup(request) for request in requests]
+        if self.bounded:
+            # accesses of the whole batch are recorded with a single lock
+            with self.lock:
+                for key, cached, _ in found:
+                    if cached is not None:
+                        self.policy.touch(key)
+        return [
+            None if cached is None else self._loads(request, key, cached, metadata)
+            for request, (key, cached, metadata) in zip(requests, found)
+        ]
+
+    def _set(self, key: str, cached: tp.Any) -> None:
+        if not self.bounded:
+            self.data.update({key: cached})
+            return
+        if self.max_bytes is not None and get_cached_size(cached) > self.max_bytes:
+            # would evict everything else and still not fit
+            self.data.pop(key, None)
+            self._untrack(key)
+            return
+        self.data.update({key: cached})
+        self._track(key, cached)
+        self._evict()
+
+    def _delete(self, key: str) -> None:
+        self.data.pop(key, None)
+        if self.bounded:
+            self._untrack(key)
+
     def get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
         return self._get(request)
 
     async def aget(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
         return self._get(request)
 
+    def get_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        return self._get_many(requests)
+
+    async def aget_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        return self._get_many(requests)
+
+    def _store(
+        self, request: httpx.Request, response: httpx.Response, to_cache: tp.Any
+    ) -> None:
+        key, vary_marker = self.get_store_key(request, response)
+        with self.lock:
+            if vary_marker is not None:
+                self._set(get_cache_key(request), vary_marker)
+            self._set(key, to_cache)
+
+    def _store_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        entries = []
+        for request, response in items:
+            key, vary_marker = self.get_store_key(request, response)
+            if vary_marker is not None:
+                entries.append((get_cache_key(request), vary_marker))
+            entries.append((key, self.serializer.dumps(response=response)))
+        with self.lock:
+            for key, to_cache in entries:
+                self._set(key, to_cache)
+
     def set(
         self,
         *,
@@ -61,8 +251,7 @@ class DictCache(BaseCache):
         content: tp.Optional[bytes] = None,
     ) -> None:
         to_cache = self.serializer.dumps(response=response, content=content)
-        with self.lock:
-            self.data.update({get_cache_key(request): to_cache})
+        self._store(request, response, to_cache)
 
     async def aset(
         self,
@@ -73,14 +262,64 @@ class DictCache(BaseCache):
     ) -> None:
         to_cache = self.serializer.dumps(response=response, content=content)
         async with self.async_lock:
-            self.data.update({get_cache_key(request): to_cache})
+            self._store(request, response, to_cache)
+
+    def set_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        if not isinstance(self.serializer, DictSerializer):
+            return super().set_chunks(request=request, response=response, chunks=chunks)
+        # builtin serializers accept the chunks, DictSerializer keeps them as is
+        to_cache = self.serializer.dumps(response=response, content=chunks)
+        self._store(request, response, to_cache)
+
+    async def aset_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        if not isinstance(self.serializer, DictSerializer):
+            return await super().aset_chunks(
+                request=request, response=response, chunks=chunks
+            )
+        to_cache = self.serializer.dumps(response=response, content=chunks)
+        async with self.async_lock:
+            self._store(request, response, to_cache)
+
+    def set_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        self._store_many(items)
+
+    async def aset_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        async with self.async_lock:
+            self._store_many(items)
 
     def delete(self, request: httpx.Request) -> None:
-        key = get_cache_key(request)
+        key = self.get_lookup_key(request)
         with self.lock:
-            self.data.pop(key, None)
+            self._delete(key)
 
     async def adelete(self, request: httpx.Request) -> None:
-        key = get_cache_key(request)
+        key = self.get_lookup_key(request)
         async with self.async_lock:
-            self.data.pop(key, None)
+            with self.lock:
+                self._delete(key)
+
+    def delete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        keys = [self.get_lookup_key(request) for request in requests]
+        with self.lock:
+            for key in keys:
+                self._delete(key)
+
+    async def adelete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        async with self.async_lock:
+            self.delete_many(requests)
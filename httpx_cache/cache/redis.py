@@ -1,28 +1,144 @@
+import logging
+import struct
 import typing as tp
+import uuid
 from datetime import timedelta
 
 import httpx
-from aiorwlock import RWLock as AsyncRWLock
-from fasteners import ReaderWriterLock as RWLock
 from redis import Redis
 from redis.asyncio import Redis as AsyncRedis
 
-from httpx_cache.cache.base import BaseCache
-from httpx_cache.serializer.base import BaseSerializer
+from httpx_cache.cache.base import BaseCache, CacheWriter
+from httpx_cache.serializer.base import BaseSerializer, LoadError
 from httpx_cache.serializer.common import MsgPackSerializer
-from httpx_cache.utils import get_cache_key
+from httpx_cache.utils import get_cache_key, get_cache_metadata
 
 __all__ = ["RedisCache"]
 
+logger = logging.getLogger(__name__)
+
+
+class _RedisWriter(CacheWriter):
+    # the serialized response is appended to a temporary key as its content
+    # arrives, the key is renamed to the cache key of the response on commit
+
+    flush_size = 1024 * 1024
+    cache: "RedisCache"
+
+    def __init__(
+        self, cache: "RedisCache", request: httpx.Request, response: httpx.Response
+    ) -> None:
+        super().__init__(cache, request, response)
+        assert isinstance(cache.serializer, MsgPackSerializer)
+        head, self._size_offset = cache.serializer.dumps_head(response=response)
+        self._pending = [head]
+        self._pending_size = len(head)
+        self._tmp_key = cache._namespaced(
+            f"{get_cache_key(request)}:partial:{uuid.uuid4().hex}"
+        )
+        self._flushed = False
+
+    def _queue_flush(self, pipeline: tp.Any, chunks: tp.List[bytes]) -> None:
+        pipeline.append(self._tmp_key, b"".join(chunks))
+        if not self._flushed:
+            # left to expire if the writer is never committed/aborted
+            pipeline.expire(self._tmp_key, self.cache.partial_ttl)
+            self._flushed = True
+
+    def _queue_commit(self, pipeline: tp.Any) -> None:
+        ttl = self.cache.get_ttl(self.response)
+        if ttl is not None and ttl.total_seconds() < 1:
+            logger.debug(f"Response already expired, not caching it: {self.request}")
+            self._take()
+            if self._flushed:
+                pipeline.delete(self._tmp_key)
+            return
+        self._queue_flush(pipeline, self._take())
+        if self._size_offset is not None:
+            pipeline.setrange(
+                self._tmp_key, self._size_offset, struct.pack(">I", self.size)
+            )
+        key, vary_marker = self.cache.get_store_key(self.request, self.response)
+        key = self.cache._namespaced(key)
+        pipeline.rename(self._tmp_key, key)
+        if ttl is None:
+            pipeline.persist(key)
+        else:
+            pipeline.expire(key, ttl)
+        if vary_marker is not None:
+            pipeline.set(
+                self.cache._get_namespaced_cache_key(self.request),
+                vary_marker,
+                ex=self.cache.default_ttl,
+            )
+
+    def _flush(self, chunks: tp.List[bytes]) -> None:
+        pipeline = self.cache.redis.pipeline(transaction=False)
+        self._queue_flush(pipeline, chunks)
+        pipeline.execute()
+
+    async def _aflush(self, chunks: tp.List[bytes]) -> None:
+        pipeline = self.cache.aredis.pipeline(transaction=False)
+        self._queue_flush(pipeline, chunks)
+        await pipeline.execute()
+
+    def commit(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        # last chunks, size of the content, and rename in a single transaction
+        pipeline = self.cache.redis.pipeline(transaction=True)
+        self._queue_commit(pipeline)
+        pipeline.execute()
+
+    async def acommit(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        pipeline = self.cache.aredis.pipeline(transaction=True)
+        self._queue_commit(pipeline)
+        await pipeline.execute()
+
+    def abort(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._take()
+        if self._flushed:
+            self.cache.redis.delete(self._tmp_key)
+
+    async def aabort(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._take()
+        if self._flushed:
+            await self.cache.aredis.delete(self._tmp_key)
+
 
 class RedisCache(BaseCache):
     """Redis cache that stores cached responses in Redis.
 
-    Uses a lock/async_lock to make sure each get/set/delete operation is safe.
+    No lock is used: redis commands are atomic, and a response and its Vary marker
+    are written together in a MULTI/EXEC transaction.
 
     You can either provide an instance of 'Redis'/'AsyncRedis' or a redis url to
     have RedisCache create the connection for you.
 
+    Cached responses expire (server-side) when they can no longer be used: at the
+    end of their freshness lifetime ('max-age' or 'Expires', or 's-maxage' when
+    'shared', minus their current age), plus their
+    'stale-while-revalidate'/'stale-if-error' grace period (none under
+    'must-revalidate'), plus
+    'revalidation_ttl' if they can be revalidated (they have an 'ETag' or a
+    'Last-Modified' header). Responses without an explicit expiration use
+    'default_ttl'.
+
+    With a MsgPackSerializer (default), the content of a streamed response is
+    appended to a temporary key while it is read (flushed every MiB), and the key
+    is renamed once the stream ends (deleted if it is closed before its end).
+    Temporary keys left behind expire after 'partial_ttl'.
+
     Args:
         serializer: Optional serializer for the data to cache, defaults to:
             httpx_cache.MsgPackSerializer
@@ -30,10 +146,17 @@ class RedisCache(BaseCache):
         redis_url: Optional redis url, defaults to empty string
         redis: Optional redis instance, defaults to None
         aredis: Optional async redis instance, defaults to None
-        default_ttl: Optional default ttl for cached responses, defaults to None
+        default_ttl: Optional default ttl for cached responses without an explicit
+            expiration, defaults to None
+        revalidation_ttl: how long to keep stale responses that can be
+            revalidated, defaults to 1 day
+        shared: whether the cache is used by a shared cache controller (same as
+            the 'shared' option of the transports), the 's-maxage' directive is
+            then used for the ttl, defaults to False
     """
 
-    lock = RWLock()
+    # expiration of the temporary keys of the streamed responses being written
+    partial_ttl = timedelta(hours=1)
 
     def __init__(
         self,
@@ -43,6 +166,8 @@ class RedisCache(BaseCache):
         redis: tp.Optional["Redis[bytes]"] = None,
         aredis: tp.Optional["AsyncRedis[bytes]"] = None,
         default_ttl: tp.Optional[timedelta] = None,
+        revalidation_ttl: timedelta = timedelta(days=1),
+        shared: bool = False,
     ) -> None:
         self.namespace = namespace
         # redis connection is lazy loaded
@@ -50,41 +175,183 @@ class RedisCache(BaseCache):
         self.aredis = aredis or AsyncRedis.from_url(redis_url)
         self.serializer = serializer or MsgPackSerializer()
         self.default_ttl = default_ttl
+        self.revalidation_ttl = revalidation_ttl
+        self.shared = shared
         if not isinstance(self.serializer, BaseSerializer):
             raise TypeError(
                 "Expected serializer of type 'httpx_cache.BaseSerializer', "
                 f"got {type(self.serializer)}"
             )
 
-        self._async_lock: tp.Optional[AsyncRWLock] = None
-
-    @property
-    def async_lock(self) -> AsyncRWLock:
-        if self._async_lock is None:
-            self._async_lock = AsyncRWLock()
-        return self._async_lock
-
-    def _get_namespaced_cache_key(self, request: httpx.Request) -> str:
-        key = get_cache_key(request)
+    def _namespaced(self, key: str) -> str:
         if self.namespace:
             key = f"{self.namespace}:{key}"
         return key
 
+    def _get_namespaced_cache_key(self, request: httpx.Request) -> str:
+        return self._namespaced(get_cache_key(request))
+
+    def _loads(
+        self, request: httpx.Request, cached: tp.Optional[bytes]
+    ) -> tp.Optional[httpx.Response]:
+        if cached is None:
+            return None
+        metadata = self.serializer.loads_metadata(cached=cached)
+        if self.is_unusable(request, metadata):
+            # left to expire in redis
+            return None
+        try:
+            return self.serializer.loads(
+                cached=cached, request=request, metadata=metadata
+            )
+        except LoadError as error:
+            # replaced by the next response stored
+            logger.debug(f"Can't load cached response for {request}: {error}")
+            return None
+
     def get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
-        key = self._get_namespaced_cache_key(request)
-        with self.lock.read_lock():
-            cached = self.redis.get(key)
-        if cached is not None:
-            return self.serializer.loads(cached=cached, request=request)
-        return None
+        key = self._namespaced(self.get_lookup_key(request))
+        cached = self.redis.get(key)
+        secondary_key = self.resolve_vary_marker(request, cached)
+        if secondary_key is not None:
+            cached = self.redis.get(self._namespaced(secondary_key))
+        return self._loads(request, cached)
 
     async def aget(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
-        key = self._get_namespaced_cache_key(request)
-        async with self.async_lock.reader:
-            cached_data = await self.aredis.get(key)
-        if cached_data is not None:
-            return self.serializer.loads(cached=cached_data, request=request)
-        return None
+        key = self._namespaced(self.get_lookup_key(request))
+        cached_data = await self.aredis.get(key)
+        secondary_key = self.resolve_vary_marker(request, cached_data)
+        if secondary_key is not None:
+            cached_data = await self.aredis.get(self._namespaced(secondary_key))
+        return self._loads(request, cached_data)
+
+    def _loads_many(
+        self,
+        requests: tp.Sequence[httpx.Request],
+        values: tp.Sequence[tp.Optional[bytes]],
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        return [
+            self._loads(request, cached) for request, cached in zip(requests, values)
+        ]
+
+    def _resolve_many(
+        self,
+        requests: tp.Sequence[httpx.Request],
+        values: tp.Sequence[tp.Optional[bytes]],
+    ) -> tp.Dict[int, str]:
+        # index of the requests whose value is a vary marker -> secondary key
+        secondary_keys = {}
+        for index, (request, cached) in enumerate(zip(requests, values)):
+            secondary_key = self.resolve_vary_marker(request, cached)
+            if secondary_key is not None:
+                secondary_keys[index] = self._namespaced(secondary_key)
+        return secondary_keys
+
+    def get_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        if not requests:
+            return []
+        keys = [self._namespaced(self.get_lookup_key(request)) for request in requests]
+        values = list(self.redis.mget(keys))
+        secondary_keys = self._resolve_many(requests, values)
+        if secondary_keys:
+            secondary_values = self.redis.mget(list(secondary_keys.values()))
+            for index, cached in zip(secondary_keys, secondary_values):
+                values[index] = cached
+        return self._loads_many(requests, values)
+
+    async def aget_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        if not requests:
+            return []
+        keys = [self._namespaced(self.get_lookup_key(request)) for request in requests]
+        values = list(await self.aredis.mget(keys))
+        secondary_keys = self._resolve_many(requests, values)
+        if secondary_keys:
+            secondary_values = await self.aredis.mget(list(secondary_keys.values()))
+            for index, cached in zip(secondary_keys, secondary_values):
+                values[index] = cached
+        return self._loads_many(requests, values)
+
+    def get_ttl(self, response: httpx.Response) -> tp.Optional[timedelta]:
+        """Get for how long a response should be kept in redis.
+
+        Args:
+            response: httpx.Response to cache
+
+        Returns:
+            Optional[timedelta], negative if the response is already unusable, None
+            to keep it forever.
+        """
+        metadata = get_cache_metadata(response)
+        usable_ttl = metadata.get_usable_ttl(shared=self.shared)
+        if usable_ttl is None:
+            return self.default_ttl
+        ttl = timedelta(seconds=usable_ttl)
+        if metadata.has_validators:
+            ttl += self.revalidation_ttl
+        return ttl
+
+    def _get_entries(
+        self, request: httpx.Request, response: httpx.Response, to_cache: bytes
+    ) -> tp.List[tp.Tuple[str, bytes, tp.Optional[timedelta]]]:
+        # (key, value, ttl) of the entries to set in redis
+        ttl = self.get_ttl(response)
+        if ttl is not None and ttl.total_seconds() < 1:
+            logger.debug(f"Response already expired, not caching it: {request}")
+            return []
+        key, vary_marker = self.get_store_key(request, response)
+        entries = [(self._namespaced(key), to_cache, ttl)]
+        if vary_marker is not None:
+            entries.append(
+                (self._get_namespaced_cache_key(request), vary_marker, self.default_ttl)
+            )
+        return entries
+
+    def _get_many_entries(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> tp.List[tp.Tuple[str, bytes, tp.Optional[timedelta]]]:
+        entries = []
+        for request, response in items:
+            to_cache = self.serializer.dumps(response=response)
+            entries.extend(self._get_entries(request, response, to_cache))
+        return entries
+
+    def _dumps_chunks(self, response: httpx.Response, chunks: tp.List[bytes]) -> bytes:
+        # the serialized response is built with a single copy of the content
+        if isinstance(self.serializer, MsgPackSerializer):
+            return b"".join(
+                self.serializer.dumps_chunks(response=response, content=chunks)
+            )
+        to_cache: bytes = self.serializer.dumps(
+            response=response, content=b"".join(chunks)
+        )
+        return to_cache
+
+    def _store(
+        self, request: httpx.Request, response: httpx.Response, to_cache: bytes
+    ) -> None:
+        entries = self._get_entries(request, response, to_cache)
+        if not entries:
+            return
+        # response and vary marker are set in a single round trip, atomically
+        pipeline = self.redis.pipeline(transaction=len(entries) > 1)
+        for key, value, ttl in entries:
+            pipeline.set(key, value, ex=ttl)
+        pipeline.execute()
+
+    async def _astore(
+        self, request: httpx.Request, response: httpx.Response, to_cache: bytes
+    ) -> None:
+        entries = self._get_entries(request, response, to_cache)
+        if not entries:
+            return
+        pipeline = self.aredis.pipeline(transaction=len(entries) > 1)
+        for key, value, ttl in entries:
+            pipeline.set(key, value, ex=ttl)
+        await pipeline.execute()
 
     def set(
         self,
@@ -93,13 +360,8 @@ class RedisCache(BaseCache):
         response: httpx.Response,
         content: tp.Optional[bytes] = None,
     ) -> None:
-        key = self._get_namespaced_cache_key(request)
         to_cache = self.serializer.dumps(response=response, content=content)
-        with self.lock.write_lock():
-            if self.default_ttl:
-                self.redis.setex(key, self.default_ttl, to_cache)
-            else:
-                self.redis.set(key, to_cache)
+        self._store(request, response, to_cache)
 
     async def aset(
         self,
@@ -109,22 +371,81 @@ class RedisCache(BaseCache):
         content: tp.Optional[bytes] = None,
     ) -> None:
         to_cache = self.serializer.dumps(response=response, content=content)
-        key = self._get_namespaced_cache_key(request)
-        async with self.async_lock.writer:
-            if self.default_ttl:
-                await self.aredis.setex(key, self.default_ttl, to_cache)
-            else:
-                await self.aredis.set(key, to_cache)
+        await self._astore(request, response, to_cache)
+
+    def set_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        self._store(request, response, self._dumps_chunks(response, chunks))
+
+    async def aset_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        await self._astore(request, response, self._dumps_chunks(response, chunks))
+
+    def open_writer(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> CacheWriter:
+        if not isinstance(self.serializer, MsgPackSerializer):
+            # the content is sent at once with 'set_chunks'
+            return super().open_writer(request=request, response=response)
+        return _RedisWriter(self, request, response)
+
+    def set_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        entries = self._get_many_entries(items)
+        if not entries:
+            return
+        pipeline = self.redis.pipeline(transaction=len(entries) > len(items))
+        for key, value, ttl in entries:
+            pipeline.set(key, value, ex=ttl)
+        pipeline.execute()
+
+    async def aset_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        entries = self._get_many_entries(items)
+        if not entries:
+            return
+        pipeline = self.aredis.pipeline(transaction=len(entries) > len(items))
+        for key, value, ttl in entries:
+            pipeline.set(key, value, ex=ttl)
+        await pipeline.execute()
 
     def delete(self, request: httpx.Request) -> None:
-        key = self._get_namespaced_cache_key(request)
-        with self.lock.write_lock():
-            self.redis.delete(key)
+        key = self._namespaced(self.get_lookup_key(request))
+        self.redis.delete(key)
 
     async def adelete(self, request: httpx.Request) -> None:
-        key = self._get_namespaced_cache_key(request)
-        async with self.async_lock.writer:
-            await self.aredis.delete(key)
+        key = self._namespaced(self.get_lookup_key(request))
+        await self.aredis.delete(key)
+
+    def delete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        if requests:
+            self.redis.delete(
+                *(
+                    self._namespaced(self.get_lookup_key(request))
+                    for request in requests
+                )
+            )
+
+    async def adelete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        if requests:
+            await self.aredis.delete(
+                *(
+                    self._namespaced(self.get_lookup_key(request))
+                    for request in requests
+                )
+            )
 
     def close(self) -> None:
         self.redis.close()
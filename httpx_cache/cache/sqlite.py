@@ -0,0 +1,469 @@
+import sqlite3
+import threading
+import time
+import typing as tp
+import weakref
+from datetime import timedelta
+from pathlib import Path
+
+import httpx
+from anyio import to_thread
+
+from httpx_cache.cache.base import BaseCache
+from httpx_cache.serializer.base import BaseSerializer, LoadError
+from httpx_cache.serializer.common import MsgPackSerializer
+from httpx_cache.utils import get_cache_key, get_cache_metadata
+
+__all__ = ["SQLiteCache"]
+
+# 'stats' has a single row, kept up to date by triggers, so that the total size of
+# the cached responses is known without scanning the table
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY, total_size INTEGER);
+INSERT OR IGNORE INTO stats VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+    UPDATE stats SET total_size = total_size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses BEGIN
+    UPDATE stats SET total_size = total_size + new.size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+    UPDATE stats SET total_size = total_size - old.size;
+END;
+"""
+
+# max number of keys per 'IN (...)' query (sqlite limits the number of variables)
+_BATCH_SIZE = 500
+
+_UPSERT = """
+INSERT INTO responses (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    size = excluded.size,
+    accessed = excluded.accessed
+"""
+
+# keep the most recently accessed responses that fit in the target size
+_EVICT = """
+DELETE FROM responses WHERE key IN (
+    SELECT key FROM (
+        SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS cumulated_size
+        FROM responses
+    ) WHERE cumulated_size > ?
+)
+"""
+
+
+class _ThreadConnection:
+    # holds the connection of a thread in a thread-local, it's finalized (and the
+    # connection closed) when the thread ends, e.g. pruned anyio worker threads
+    __slots__ = ("connection", "__weakref__")
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+
+def _close_connection(
+    connections: tp.Set[sqlite3.Connection],
+    lock: threading.Lock,
+    connection: sqlite3.Connection,
+) -> None:
+    with lock:
+        connections.discard(connection)
+    connection.close()
+
+
+class SQLiteCache(BaseCache):
+    """SQLite cache that stores cached responses in a single database file.
+
+    Each cached response is stored with its expiration date (when it can no
+    longer be used without revalidation: end of its 'max-age'/'Expires' freshness
+    lifetime, or 's-maxage' when 'shared', plus its stale grace period), its size
+    and its last access time, all indexed. The database uses the WAL journal mode
+    so that readers do not wait for writers, each thread uses its own connection
+    (closed when the thread ends) and async operations run in worker threads.
+
+    When 'max_size' is set, the least recently accessed responses are deleted
+    (in a single statement) when a new response goes over budget. Expired responses
+    are kept (they can still be revalidated) until 'delete_expired' is called.
+
+    Args:
+        path: Optional path of the database file, defaults to
+            ~/.cache/httpx-cache/cache.sqlite
+        serializer: Optional serializer for the data to cache, defaults to:
+            httpx_cache.MsgPackSerializer
+        max_size: Optional maximum size (in bytes) of the cached responses,
+            defaults to None
+        timeout: how long (in seconds) to wait for the database lock of another
+            writer, defaults to 5
+        shared: whether the cache is used by a shared cache controller (same as
+            the 'shared' option of the transports), the 's-maxage' directive is
+            then used for the expiration dates, defaults to False
+    """
+
+    gc_low_watermark = 0.9
+    # last access times are only updated when older than this (in seconds)
+    access_resolution = 1.0
+
+    def __init__(
+        self,
+        path: tp.Union[None, str, Path] = None,
+        serializer: tp.Optional[BaseSerializer] = None,
+        max_size: tp.Optional[int] = None,
+        timeout: float = 5.0,
+        shared: bool = False,
+    ) -> None:
+        self.serializer = serializer or MsgPackSerializer()
+        if not isinstance(self.serializer, BaseSerializer):
+            raise TypeError(
+                "Expected serializer of type 'httpx_cache.BaseSerializer', "
+                f"got {type(self.serializer)}"
+            )
+        if max_size is not None and max_size <= 0:
+            raise ValueError(f"Expected 'max_size' to be > 0, got {max_size}")
+
+        if path is None:
+            path = Path.home() / ".cache/httpx-cache/cache.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.shared = shared
+        self.evictions = 0
+
+        self._local = threading.local()
+        self._connections: tp.Set[sqlite3.Connection] = set()
+        self._connections_lock = threading.Lock()
+        self.connection.executescript(_SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Database connection of the current thread."""
+        local: tp.Optional[_ThreadConnection] = getattr(self._local, "connection", None)
+        if local is not None:
+            return local.connection
+        # autocommit mode, each statement is its own transaction
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        local = _ThreadConnection(connection)
+        weakref.finalize(
+            local,
+            _close_connection,
+            self._connections,
+            self._connections_lock,
+            connection,
+        )
+        self._local.connection = local
+        with self._connections_lock:
+            self._connections.add(connection)
+        return connection
+
+    @property
+    def total_size(self) -> int:
+        """Size in bytes of all the cached responses."""
+        (total_size,) = self.connection.execute(
+            "SELECT total_size FROM stats"
+        ).fetchone()
+        return int(total_size)
+
+    def _get_value(self, key: str) -> tp.Optional[bytes]:
+        row = self.connection.execute(
+            "SELECT value, accessed FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, accessed = row
+        now = time.time()
+        if now - accessed > self.access_resolution:
+            self.connection.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return tp.cast(bytes, value)
+
+    def _loads(
+        self, request: httpx.Request, key: str, cached: tp.Optional[bytes]
+    ) -> tp.Optional[httpx.Response]:
+        if cached is None:
+            return None
+        metadata = self.serializer.loads_metadata(cached=cached)
+        if self.is_unusable(request, metadata):
+            # removed from the cache
+            self._delete(key)
+            return None
+        try:
+            return self.serializer.loads(
+                cached=cached, request=request, metadata=metadata
+            )
+        except LoadError:
+            self._delete(key)
+            return None
+
+    def _get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        key = self.get_lookup_key(request)
+        cached = self._get_value(key)
+        secondary_key = self.resolve_vary_marker(request, cached)
+        if secondary_key is not None:
+            key = secondary_key
+            cached = self._get_value(key)
+        return self._loads(request, key, cached)
+
+    def _executemany(self, sql: str, rows: tp.Sequence[tp.Tuple[tp.Any, ...]]) -> None:
+        # a single transaction (and commit) for the whole batch
+        self.connection.execute("BEGIN")
+        try:
+            self.connection.executemany(sql, rows)
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def _get_values(self, keys: tp.Sequence[str]) -> tp.Dict[str, bytes]:
+        values: tp.Dict[str, bytes] = {}
+        touched = []
+        now = time.time()
+        for start in range(0, len(keys), _BATCH_SIZE):
+            batch = keys[start : start + _BATCH_SIZE]
+            rows = self.connection.execute(
+                "SELECT key, value, accessed FROM responses "
+                f"WHERE key IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for key, value, accessed in rows:
+                values[key] = value
+                if now - accessed > self.access_resolution:
+                    touched.append((now, key))
+        if touched:
+            self._executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?", touched
+            )
+        return values
+
+    def get_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        keys = [self.get_lookup_key(request) for request in requests]
+        values = self._get_values(keys)
+        cached = [values.get(key) for key in keys]
+        secondary_keys = {}
+        for index, request in enumerate(requests):
+            secondary_key = self.resolve_vary_marker(request, cached[index])
+            if secondary_key is not None:
+                secondary_keys[index] = secondary_key
+        if secondary_keys:
+            values = self._get_values(list(secondary_keys.values()))
+            for index, secondary_key in secondary_keys.items():
+                keys[index] = secondary_key
+                cached[index] = values.get(secondary_key)
+        return [
+            self._loads(request, key, value)
+            for request, key, value in zip(requests, keys, cached)
+        ]
+
+    async def aget_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        return await to_thread.run_sync(self.get_many, requests, cancellable=True)
+
+    def get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        return self._get(request)
+
+    async def aget(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        return await to_thread.run_sync(self._get, request, cancellable=True)
+
+    def get_expires(self, response: httpx.Response) -> tp.Optional[float]:
+        """Get the timestamp when a response can no longer be used.
+
+        Args:
+            response: httpx.Response to cache
+
+        Returns:
+            Optional[float], None if the response has no explicit expiration
+        """
+        now = time.time()
+        usable_ttl = get_cache_metadata(response).get_usable_ttl(
+            now, shared=self.shared
+        )
+        if usable_ttl is None:
+            return None
+        return now + usable_ttl
+
+    def _set(self, key: str, value: tp.Any, expires: tp.Optional[float]) -> None:
+        self.connection.execute(_UPSERT, (key, value, expires, len(value), time.time()))
+
+    def _store(
+        self, request: httpx.Request, response: httpx.Response, to_cache: tp.Any
+    ) -> None:
+        key, vary_marker = self.get_store_key(request, response)
+        expires = self.get_expires(response)
+        if vary_marker is not None:
+            self._set(get_cache_key(request), vary_marker, None)
+        self._set(key, to_cache, expires)
+        if self.max_size is not None and self.total_size > self.max_size:
+            self.evict()
+
+    def _store_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        now = time.time()
+        rows: tp.List[tp.Tuple[str, tp.Any, tp.Optional[float], int, float]] = []
+        for request, response in items:
+            key, vary_marker = self.get_store_key(request, response)
+            expires = self.get_expires(response)
+            if vary_marker is not None:
+                rows.append(
+                    (get_cache_key(request), vary_marker, None, len(vary_marker), now)
+                )
+            to_cache = self.serializer.dumps(response=response)
+            rows.append((key, to_cache, expires, len(to_cache), now))
+        if not rows:
+            return
+        self._executemany(_UPSERT, rows)
+        if self.max_size is not None and self.total_size > self.max_size:
+            self.evict()
+
+    def _dumps_chunks(self, response: httpx.Response, chunks: tp.List[bytes]) -> tp.Any:
+        # the serialized response is built with a single copy of the content
+        if isinstance(self.serializer, MsgPackSerializer):
+            return b"".join(
+                self.serializer.dumps_chunks(response=response, content=chunks)
+            )
+        return self.serializer.dumps(response=response, content=b"".join(chunks))
+
+    def set(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        content: tp.Optional[bytes] = None,
+    ) -> None:
+        to_cache = self.serializer.dumps(response=response, content=content)
+        self._store(request, response, to_cache)
+
+    async def aset(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        content: tp.Optional[bytes] = None,
+    ) -> None:
+        to_cache = self.serializer.dumps(response=response, content=content)
+        await to_thread.run_sync(
+            self._store, request, response, to_cache, cancellable=True
+        )
+
+    def set_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        self._store(request, response, self._dumps_chunks(response, chunks))
+
+    async def aset_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        to_cache = self._dumps_chunks(response, chunks)
+        await to_thread.run_sync(
+            self._store, request, response, to_cache, cancellable=True
+        )
+
+    def set_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        self._store_many(items)
+
+    async def aset_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        await to_thread.run_sync(self._store_many, items, cancellable=True)
+
+    def _delete(self, key: str) -> None:
+        self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def delete(self, request: httpx.Request) -> None:
+        self._delete(self.get_lookup_key(request))
+
+    async def adelete(self, request: httpx.Request) -> None:
+        await to_thread.run_sync(
+            self._delete, self.get_lookup_key(request), cancellable=True
+        )
+
+    def _delete_many(self, keys: tp.Sequence[str]) -> None:
+        if keys:
+            self._executemany(
+                "DELETE FROM responses WHERE key = ?", [(key,) for key in keys]
+            )
+
+    def delete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        self._delete_many([self.get_lookup_key(request) for request in requests])
+
+    async def adelete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        keys = [self.get_lookup_key(request) for request in requests]
+        await to_thread.run_sync(self._delete_many, keys, cancellable=True)
+
+    def evict(self) -> int:
+        """Delete the least recently accessed responses until under budget.
+
+        The cache is cleaned up to 'gc_low_watermark' (90%) of 'max_size'.
+
+        Returns:
+            number of deleted responses
+        """
+        if self.max_size is None:
+            return 0
+        cursor = self.connection.execute(
+            _EVICT, (int(self.max_size * self.gc_low_watermark),)
+        )
+        self.evictions += cursor.rowcount
+        return cursor.rowcount
+
+    def delete_expired(self, grace: timedelta = timedelta(0)) -> int:
+        """Delete the responses that expired more than 'grace' ago.
+
+        Args:
+            grace: how long to keep expired responses (e.g. to revalidate them)
+
+        Returns:
+            number of deleted responses
+        """
+        cursor = self.connection.execute(
+            "DELETE FROM responses WHERE expires < ?",
+            (time.time() - grace.total_seconds(),),
+        )
+        return cursor.rowcount
+
+    async def adelete_expired(self, grace: timedelta = timedelta(0)) -> int:
+        """(Async) Delete the responses that expired more than 'grace' ago."""
+        return await to_thread.run_sync(self.delete_expired, grace, cancellable=True)
+
+    def close(self) -> None:
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    async def aclose(self) -> None:
+        self.close()
@@ -0,0 +1,270 @@
+import threading
+import time
+import typing as tp
+from collections import OrderedDict
+
+import httpx
+
+from httpx_cache.cache.base import BaseCache
+from httpx_cache.cache.memory import DictCache
+from httpx_cache.serializer.common import DictSerializer
+from httpx_cache.utils import get_cache_key
+
+__all__ = ["TieredCache"]
+
+
+def _in_memory(response: httpx.Response) -> bool:
+    # content not loaded lazily by the L2 cache
+    return hasattr(response, "_content") or isinstance(
+        response.stream, httpx.ByteStream
+    )
+
+
+class TieredCache(BaseCache):
+    """Two-tier cache, a small in-process L1 cache in front of a shared L2 cache.
+
+    Lookups are served by the L1 cache when possible, L2 hits are promoted to the
+    L1 cache and writes/deletes go through both caches.
+
+    Responses whose content is loaded lazily by the L2 cache (e.g. big FileCache
+    responses) are not promoted, to avoid holding them in memory, responses whose
+    content is in memory (read, or raw encoded content) are.
+
+    When 'negative_ttl' is set, L2 misses are remembered for that many seconds,
+    so that urls that are never cached (e.g. 'no-store' responses) do not cost a
+    L2 lookup on every request. A negative entry is dropped as soon as a response
+    is cached for its url.
+
+    L1 entries are not invalidated when another process updates the L2 cache,
+    they are refreshed the next time the response is revalidated or replaced.
+
+    Args:
+        l2: the shared cache (e.g. RedisCache, FileCache)
+        l1: Optional in-process cache, defaults to a DictCache with 'l1_max_entries'
+            entries and a DictSerializer (no serialization on L1 hits)
+        l1_max_entries: max number of entries of the default L1 cache,
+            defaults to 1024
+        negative_ttl: Optional number of seconds L2 misses are remembered,
+            defaults to None (disabled)
+        max_negative_entries: max number of remembered L2 misses, defaults to 10_000
+    """
+
+    def __init__(
+        self,
+        l2: BaseCache,
+        l1: tp.Optional[BaseCache] = None,
+        l1_max_entries: int = 1024,
+        negative_ttl: tp.Optional[float] = None,
+        max_negative_entries: int = 10_000,
+    ) -> None:
+        if l1 is None:
+            l1 = DictCache(serializer=DictSerializer(), max_entries=l1_max_entries)
+        for name, cache in (("l1", l1), ("l2", l2)):
+            if not isinstance(cache, BaseCache):
+                raise TypeError(
+                    f"Expected {name} of type 'httpx_cache.BaseCache', "
+                    f"got {type(cache)}"
+                )
+        if negative_ttl is not None and negative_ttl <= 0:
+            raise ValueError(f"Expected 'negative_ttl' to be > 0, got {negative_ttl}")
+
+        self.l1 = l1
+        self.l2 = l2
+        self.negative_ttl = negative_ttl
+        self.max_negative_entries = max_negative_entries
+        # primary cache key -> monotonic time until which the L2 miss is remembered
+        self.negative: "OrderedDict[str, float]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def evictions(self) -> int:  # type: ignore[override]
+        return self.l1.evictions + self.l2.evictions
+
+    def _is_negative(self, request: httpx.Request) -> bool:
+        if self.negative_ttl is None:
+            return False
+        key = get_cache_key(request)
+        with self.lock:
+            until = self.negative.get(key)
+            if until is None:
+                return False
+            if until > time.monotonic():
+                return True
+            del self.negative[key]
+        return False
+
+    def _add_negative(self, request: httpx.Request) -> None:
+        if self.negative_ttl is None:
+            return
+        key = get_cache_key(request)
+        with self.lock:
+            self.negative[key] = time.monotonic() + self.negative_ttl
+            self.negative.move_to_end(key)
+            while len(self.negative) > self.max_negative_entries:
+                self.negative.popitem(last=False)
+
+    def _discard_negative(self, request: httpx.Request) -> None:
+        if self.negative:
+            with self.lock:
+                self.negative.pop(get_cache_key(request), None)
+
+    def get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        response = self.l1.get(request)
+        if response is not None or self._is_negative(request):
+            return response
+        response = self.l2.get(request)
+        if response is None:
+            self._add_negative(request)
+        elif _in_memory(response):
+            self.l1.set(request=request, response=response)
+        return response
+
+    async def aget(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        response = await self.l1.aget(request)
+        if response is not None or self._is_negative(request):
+            return response
+        response = await self.l2.aget(request)
+        if response is None:
+            self._add_negative(request)
+        elif _in_memory(response):
+            await self.l1.aset(request=request, response=response)
+        return response
+
+    def _misses(
+        self,
+        requests: tp.Sequence[httpx.Request],
+        responses: tp.Sequence[tp.Optional[httpx.Response]],
+    ) -> tp.List[int]:
+        # index of the requests to look up in the L2 cache
+        return [
+            index
+            for index, (request, response) in enumerate(zip(requests, responses))
+            if response is None and not self._is_negative(request)
+        ]
+
+    def _promote_many(
+        self,
+        requests: tp.List[httpx.Request],
+        found: tp.Sequence[tp.Optional[httpx.Response]],
+    ) -> tp.List[tp.Tuple[httpx.Request, httpx.Response]]:
+        items = []
+        for request, response in zip(requests, found):
+            if response is None:
+                self._add_negative(request)
+            elif _in_memory(response):
+                items.append((request, response))
+        return items
+
+    def get_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        responses = self.l1.get_many(requests)
+        misses = self._misses(requests, responses)
+        if misses:
+            l2_requests = [requests[index] for index in misses]
+            found = self.l2.get_many(l2_requests)
+            for index, response in zip(misses, found):
+                responses[index] = response
+            items = self._promote_many(l2_requests, found)
+            if items:
+                self.l1.set_many(items)
+        return responses
+
+    async def aget_many(
+        self, requests: tp.Sequence[httpx.Request]
+    ) -> tp.List[tp.Optional[httpx.Response]]:
+        responses = await self.l1.aget_many(requests)
+        misses = self._misses(requests, responses)
+        if misses:
+            l2_requests = [requests[index] for index in misses]
+            found = await self.l2.aget_many(l2_requests)
+            for index, response in zip(misses, found):
+                responses[index] = response
+            items = self._promote_many(l2_requests, found)
+            if items:
+                await self.l1.aset_many(items)
+        return responses
+
+    def set(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        content: tp.Optional[bytes] = None,
+    ) -> None:
+        self._discard_negative(request)
+        self.l2.set(request=request, response=response, content=content)
+        self.l1.set(request=request, response=response, content=content)
+
+    async def aset(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        content: tp.Optional[bytes] = None,
+    ) -> None:
+        self._discard_negative(request)
+        await self.l2.aset(request=request, response=response, content=content)
+        await self.l1.aset(request=request, response=response, content=content)
+
+    def set_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        self._discard_negative(request)
+        self.l2.set_chunks(request=request, response=response, chunks=chunks)
+        self.l1.set_chunks(request=request, response=response, chunks=chunks)
+
+    async def aset_chunks(
+        self,
+        *,
+        request: httpx.Request,
+        response: httpx.Response,
+        chunks: tp.List[bytes],
+    ) -> None:
+        self._discard_negative(request)
+        await self.l2.aset_chunks(request=request, response=response, chunks=chunks)
+        await self.l1.aset_chunks(request=request, response=response, chunks=chunks)
+
+    def set_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        for request, _ in items:
+            self._discard_negative(request)
+        self.l2.set_many(items)
+        self.l1.set_many(items)
+
+    async def aset_many(
+        self, items: tp.Sequence[tp.Tuple[httpx.Request, httpx.Response]]
+    ) -> None:
+        for request, _ in items:
+            self._discard_negative(request)
+        await self.l2.aset_many(items)
+        await self.l1.aset_many(items)
+
+    def delete(self, request: httpx.Request) -> None:
+        self.l1.delete(request)
+        self.l2.delete(request)
+
+    async def adelete(self, request: httpx.Request) -> None:
+        await self.l1.adelete(request)
+        await self.l2.adelete(request)
+
+    def delete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        self.l1.delete_many(requests)
+        self.l2.delete_many(requests)
+
+    async def adelete_many(self, requests: tp.Sequence[httpx.Request]) -> None:
+        await self.l1.adelete_many(requests)
+        await self.l2.adelete_many(requests)
+
+    def close(self) -> None:
+        self.l1.close()
+        self.l2.close()
+
+    async def aclose(self) -> None:
+        await self.l1.aclose()
+        await self.l2.aclose()
@@ -1,14 +1,64 @@
 import logging
+import time
 import typing as tp
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 
 import httpx
 
-from httpx_cache.utils import parse_cache_control_headers, parse_headers_date
+from httpx_cache.utils import (
+    CacheMetadata,
+    get_cache_control,
+    get_cache_metadata,
+    get_vary_headers,
+)
 
 logger = logging.getLogger(__name__)
 
 _PERMANENT_REDIRECT_STATUSES = (301, 308)
+# request directives that can make a stale response usable
+_STALE_REQUEST_DIRECTIVES = ("max-age", "max-stale", "stale-if-error")
+# response directives allowing a shared cache to store a response to an authorized
+# request (RFC 9111 section 3.5)
+_AUTHORIZED_SHAREABLE_DIRECTIVES = ("public", "must-revalidate", "s-maxage")
+
+
+def is_response_unusable(*, request: httpx.Request, metadata: CacheMetadata) -> bool:
+    """Checks, from its metadata only, if a cached response can no longer be used.
+
+    A cached response is unusable when it's stale, it can't be revalidated (no
+    'ETag'/'Last-Modified' validators) and it's out of its
+    'stale-while-revalidate'/'stale-if-error' windows. Caches use it to treat
+    such responses as misses without deserializing them.
+
+    Args:
+        request: httpx.Request
+        metadata: CacheMetadata of the cached response
+
+    Returns:
+        True if the cached response can't be used, False if it may be used.
+    """
+    if metadata.status_code in _PERMANENT_REDIRECT_STATUSES or metadata.has_validators:
+        return False
+    directives = metadata.directives
+    if "s-maxage" in directives:
+        # its lifetime depends on the controller being a shared cache or not
+        return False
+    request_cc = get_cache_control(request)
+    if any(name in request_cc for name in _STALE_REQUEST_DIRECTIVES):
+        return False
+
+    expires = metadata.expires
+    if expires is None:
+        # no freshness lifetime, left to the cache controller
+        return False
+
+    grace = 0
+    if "must-revalidate" not in directives:
+        grace = max(
+            directives.get("stale-while-revalidate") or 0,
+            directives.get("stale-if-error") or 0,
+        )
+    return time.time() > expires + grace
 
 
 class CacheControl:
@@ -16,8 +66,21 @@ class CacheControl:
 
     Uses 'cache-contol' header direcrives for using/skipping cache.
 
-    If no cache-control directive is set, the cache is used by default (except if there
-    is an expires header in the response.)
+    Freshness follows RFC 9111: the freshness lifetime comes from the 's-maxage'
+    (shared caches only) or 'max-age' directives, the 'Expires' header or, when
+    the response has none of them, a heuristic based on its 'Last-Modified' header.
+    It's compared with the response age, computed from its 'Date' and 'Age'
+    headers. Responses without any freshness lifetime are stale (except permanent
+    redirects), they are revalidated or fetched again.
+
+    Args:
+        cacheable_methods: methods that are allowed to be cached
+        cacheable_status_codes: status codes that are allowed to be cached
+        always_cache: cache responses even with a 'no-store' directive
+        shared: whether the cache is shared between users (e.g. a RedisCache used
+            by a proxy), shared caches do not store 'private' responses nor
+            responses to authorized requests (unless explicitly allowed), and use
+            the 's-maxage' and 'proxy-revalidate' directives.
     """
 
     def __init__(
@@ -26,10 +89,44 @@ class CacheControl:
         cacheable_methods: tp.Tuple[str, ...] = ("GET",),
         cacheable_status_codes: tp.Tuple[int, ...] = (200, 203, 300, 301, 308),
         always_cache: bool = False,
+        shared: bool = False,
     ) -> None:
         self.cacheable_methods = cacheable_methods
         self.cacheable_status_codes = cacheable_status_codes
         self.always_cache = always_cache
+        self.shared = shared
+
+    def get_freshness_lifetime(self, metadata: CacheMetadata) -> tp.Optional[float]:
+        """Get the freshness lifetime (in seconds) of a response.
+
+        Args:
+            metadata: CacheMetadata of the response
+
+        Returns:
+            Optional[float], None if the response has no freshness lifetime
+        """
+        if self.shared:
+            s_maxage = metadata.directives.get("s-maxage")
+            if isinstance(s_maxage, int):
+                return s_maxage
+        return metadata.lifetime
+
+    def must_revalidate(self, metadata: CacheMetadata) -> bool:
+        """Checks if a stale response must not be used without revalidation.
+
+        Args:
+            metadata: CacheMetadata of the response
+
+        Returns:
+            True if the response has a 'must-revalidate' directive (or, for
+            shared caches, a 'proxy-revalidate' or 's-maxage' directive)
+        """
+        directives = metadata.directives
+        if "must-revalidate" in directives:
+            return True
+        return self.shared and (
+            "proxy-revalidate" in directives or "s-maxage" in directives
+        )
 
     def is_request_cacheable(self, request: httpx.Request) -> bool:
         """Checks if an httpx request has the necessary requirement to support caching.
@@ -59,7 +156,7 @@ class CacheControl:
                 f"'{self.cacheable_methods}' are supported. Request is not cacheable!"
             )
             return False
-        cc = parse_cache_control_headers(request.headers)
+        cc = get_cache_control(request)
         if "no-cache" in cc or cc.get("max-age") == 0:
             logger.debug(
                 "Request cache-control headers has a 'no-cache' directive. "
@@ -73,6 +170,9 @@ class CacheControl:
     ) -> bool:
         """Checks wether a cached response is fresh or not.
 
+        A stale response is still considered fresh when the request accepts it
+        with a 'max-stale' directive (unless the response must be revalidated).
+
         Args:
             request: httpx.Request
             response: httpx.Response
@@ -80,95 +180,148 @@ class CacheControl:
         Returns:
             True if request is fresh else False
         """
-
-        # check if response is a permanenet redirect
-        if response.status_code in _PERMANENT_REDIRECT_STATUSES:
+        # response metadata is computed once (usually when the response is cached)
+        metadata = get_cache_metadata(response)
+        if "no-cache" in metadata.directives:
             logger.debug(
-                "Cached response with permanent redirect status "
-                f"'{response.status_code}' is always fresh."
+                "Response cache-control headers has a 'no-cache' directive. "
+                "Response must be revalidated!"
             )
-            return True
-
-        # check that we do have a response Date header
-        response_date = parse_headers_date(response.headers.get("date"))
-
-        # extract cache_control for both request and response
-        request_cc = parse_cache_control_headers(request.headers)
-        response_cc = parse_cache_control_headers(response.headers)
-
-        # get all values we need for freshness eval
-        resp_max_age = response_cc.get("max-age")
-        req_min_fresh = request_cc.get("min-fresh")
-        req_max_age = request_cc.get("max-age")
+            return False
 
-        # check max-age in response
-        if isinstance(req_max_age, int):
-            max_freshness_age = timedelta(seconds=req_max_age)
+        lifetime = self.get_freshness_lifetime(metadata)
+        if lifetime is None:
+            if response.status_code in _PERMANENT_REDIRECT_STATUSES:
+                logger.debug(
+                    "Cached response with permanent redirect status "
+                    f"'{response.status_code}' is always fresh."
+                )
+                return True
             logger.debug(
-                "Evaluating response freshness from request cache-control "
-                "'max-age' header directive."
+                "Response has no explicit expiration nor 'Last-Modified' header. "
+                "Response is not fresh!"
             )
+            return False
 
-        elif isinstance(resp_max_age, int):
-            max_freshness_age = timedelta(seconds=resp_max_age)
+        age = metadata.get_current_age()
+        request_cc = get_cache_control(request)
+        req_max_age = request_cc.get("max-age")
+        if isinstance(req_max_age, int) and age > req_max_age:
             logger.debug(
-                "Evaluating response freshness from response cache-control "
-                "'max-age' header directive."
-            )
-        elif "expires" in response.headers and response_date is None:
-            logger.warning(
-                "Response is missing a valid 'Date' header, couldn't evaluate "
-                "response freshness. Response is not fresh!"
+                f"Response age ({age}s) is over the request cache-control "
+                f"'max-age={req_max_age}' header directive. Response is not fresh!"
             )
             return False
-        elif "expires" in response.headers:
-            resp_expires = parse_headers_date(response.headers.get("expires"))
-            if resp_expires is None:
-                logger.warning(
-                    "Response has an invalid 'Expires' header, couldn't evaluate "
-                    "response freshness. Response is not fresh!"
-                )
-                return False
 
-            max_freshness_age = resp_expires - response_date  # type: ignore
+        req_min_fresh = request_cc.get("min-fresh")
+        if isinstance(req_min_fresh, int):
             logger.debug(
-                "Evaluating response freshness from response 'expires' header."
+                f"Adjsting response age ({age}s) using request cache-control "
+                "'min-fresh' header directive."
             )
+            age += req_min_fresh
 
-        else:
-            logger.debug(
-                "Request/Response pair has no cache-control headers. Assuming "
-                "response is fresh!"
-            )
+        logger.debug(f"Response age is: {age}s")
+        logger.debug(f"Response freshness lifetime is: {lifetime}s")
+        staleness = age - lifetime
+        if staleness <= 0:
+            logger.debug("Response is fresh.")
             return True
 
-        if response_date is None:
-            logger.warning(
-                "Response is missing a valid 'Date' header, couldn't evaluate "
-                "response freshness. Response is not fresh!"
-            )
-            return False
+        if "max-stale" in request_cc and not self.must_revalidate(metadata):
+            max_stale = request_cc["max-stale"]
+            if max_stale is None or staleness <= max_stale:
+                logger.debug(
+                    f"Stale response ({staleness}s) is accepted by the request "
+                    "cache-control 'max-stale' header directive."
+                )
+                return True
 
-        # get response age (timedelta)
-        now = datetime.now(tz=timezone.utc)
-        response_age = now - response_date
-        if isinstance(req_min_fresh, int):
-            logger.debug(
-                f"Adjsting response age ({response_age}) using request cache-control "
-                "'min-fresh' header directive."
-            )
-            response_age += timedelta(seconds=req_min_fresh)
+        logger.debug("Response is not fresh!")
+        return False
+
+    def get_response_staleness(
+        self, *, response: httpx.Response
+    ) -> tp.Optional[timedelta]:
+        """Get for how long a response has been stale.
 
-        logger.debug(f"Response age is: {response_age}")
-        logger.debug(f"Response allowed max-age is: {max_freshness_age}")
+        Uses the response freshness lifetime and current age.
 
-        if response_age > max_freshness_age:
-            logger.debug("Response is not fresh!")
+        Args:
+            response: httpx.Response
+
+        Returns:
+            timedelta (negative if response is still fresh) or None if the response
+            staleness couldn't be evaluated.
+        """
+        metadata = get_cache_metadata(response)
+        lifetime = self.get_freshness_lifetime(metadata)
+        if lifetime is None:
+            return None
+        return timedelta(seconds=metadata.get_current_age() - lifetime)
+
+    def _is_stale_response_usable(
+        self, *, request: httpx.Request, response: httpx.Response, directive: str
+    ) -> bool:
+        metadata = get_cache_metadata(response)
+        response_cc = metadata.directives
+        if "no-cache" in response_cc or self.must_revalidate(metadata):
             return False
 
-        logger.debug("Response is fresh.")
+        request_cc = get_cache_control(request)
+        window = request_cc.get(directive, response_cc.get(directive))
+        if not isinstance(window, int):
+            return False
+
+        staleness = self.get_response_staleness(response=response)
+        if staleness is None or staleness > timedelta(seconds=window):
+            return False
+        logger.debug(
+            f"Stale response ({staleness}) is within its '{directive}={window}' "
+            "window, it can be served."
+        )
         return True
 
+    def allows_stale_while_revalidate(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> bool:
+        """Checks if a stale response can be served while it's revalidated.
+
+        A stale response can be served if it has a 'stale-while-revalidate=N'
+        cache-control directive and it has been stale for less than N seconds
+        (and it has no 'must-revalidate' directive).
+
+        Args:
+            request: httpx.Request
+            response: httpx.Response, stale cached response
+
+        Returns:
+            True if the stale response can be served else False
+        """
+        return self._is_stale_response_usable(
+            request=request, response=response, directive="stale-while-revalidate"
+        )
+
+    def allows_stale_if_error(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> bool:
+        """Checks if a stale response can be served when the origin fails.
+
+        A stale response can be served if the request or response has a
+        'stale-if-error=N' cache-control directive and it has been stale for less
+        than N seconds (and it has no 'must-revalidate' directive).
+
+        Args:
+            request: httpx.Request
+            response: httpx.Response, stale cached response
+
+        Returns:
+            True if the stale response can be served else False
+        """
+        return self._is_stale_response_usable(
+            request=request, response=response, directive="stale-if-error"
+        )
+
     def is_response_cacheable(
         self, *, request: httpx.Request, response: httpx.Response
     ) -> bool:
@@ -178,6 +331,9 @@ class CacheControl:
 
             - response status_code is cacheable
             - request method is cacheable
+            - for shared caches, response has no 'private' cache-control header
+                and, if the request has an 'Authorization' header, the response
+                has a 'public', 'must-revalidate' or 's-maxage' directive
             - One of:
                 - always_cache is True
             OR:
@@ -213,15 +369,27 @@ class CacheControl:
             )
             return False
 
+        if "*" in get_vary_headers(response.headers):
+            logger.debug(
+                "Response has a 'Vary: *' header, it can never be matched. "
+                "Response is not cacheable!"
+            )
+            return False
+
+        # extract cache_control for both request and response
+        request_cc = get_cache_control(request)
+        response_cc = get_cache_control(response)
+
+        if self.shared and not self._is_shareable(
+            request=request, response_cc=response_cc
+        ):
+            return False
+
         # always cache request, eevent if 'no-store' is set as header
         if self.always_cache:
             logger.debug("Caching Response because 'always_cache' is set to True.'")
             return True
 
-        # extract cache_control for both request and response
-        request_cc = parse_cache_control_headers(request.headers)
-        response_cc = parse_cache_control_headers(response.headers)
-
         if "no-store" in request_cc or "no-store" in response_cc:
             logger.debug(
                 "Request/Response cache-control headers has a 'no-store' directive. "
@@ -230,3 +398,60 @@ class CacheControl:
             return False
 
         return True
+
+    def _is_shareable(
+        self, *, request: httpx.Request, response_cc: tp.Dict[str, tp.Optional[int]]
+    ) -> bool:
+        if "private" in response_cc:
+            logger.debug(
+                "Response cache-control headers has a 'private' directive. "
+                "Response is not cacheable by a shared cache!"
+            )
+            return False
+        if "authorization" in request.headers and not any(
+            name in response_cc for name in _AUTHORIZED_SHAREABLE_DIRECTIVES
+        ):
+            logger.debug(
+                "Request has an 'Authorization' header and the response doesn't "
+                "explicitly allow it. Response is not cacheable by a shared cache!"
+            )
+            return False
+        return True
+
+    def build_revalidation_request(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> tp.Optional[httpx.Request]:
+        """Build a conditional request to revalidate a stale cached response.
+
+        Uses the cached response 'ETag' and 'Last-Modified' headers as validators,
+        with respectively 'If-None-Match' and 'If-Modified-Since' headers.
+
+        Args:
+            request: httpx.Request
+            response: httpx.Response, stale cached response
+
+        Returns:
+            the conditional httpx.Request or None if the cached response has no
+            validators (or if the request is already conditional)
+        """
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if etag is None and last_modified is None:
+            logger.debug("Cached response has no validators, cannot revalidate it.")
+            return None
+
+        if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+            logger.debug("Request is already conditional, skipping revalidation.")
+            return None
+
+        headers = request.headers.copy()
+        if etag is not None:
+            headers["if-none-match"] = etag
+        if last_modified is not None:
+            headers["if-modified-since"] = last_modified
+        return httpx.Request(
+            request.method,
+            request.url,
+            headers=headers,
+            extensions=request.extensions,
+        )
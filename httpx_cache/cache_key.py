@@ -0,0 +1,87 @@
+import fnmatch
+import hashlib
+import typing as tp
+
+import httpx
+
+# function computing the (primary) cache key of a request
+CacheKeyFunc = tp.Callable[[httpx.Request], str]
+
+# tracking query params ignored by default by CacheKey
+DEFAULT_IGNORED_PARAMS = ("utm_*", "gclid", "fbclid")
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class CacheKey:
+    """Normalized cache key of a request, to use as 'cache_key' of the transports.
+
+    The key is the normalized request url: lowercased scheme and host (the
+    userinfo is kept), without default port nor fragment, with sorted query
+    params (the order of repeated params is kept) and without ignored query
+    params.
+
+    When 'headers' is set, a digest of the request values of these headers is
+    appended to the key (e.g. to cache responses per authorization scope).
+
+    Args:
+        ignored_params: names of the query params left out of the key, supports
+            shell-style wildcards (e.g. 'utm_*'), defaults to DEFAULT_IGNORED_PARAMS
+        sort_params: whether to sort the query params, defaults to True
+        headers: names of the request headers included in the key, defaults to ()
+    """
+
+    def __init__(
+        self,
+        *,
+        ignored_params: tp.Iterable[str] = DEFAULT_IGNORED_PARAMS,
+        sort_params: bool = True,
+        headers: tp.Iterable[str] = (),
+    ) -> None:
+        self.ignored_params = tuple(ignored_params)
+        self.sort_params = sort_params
+        self.headers = tuple(sorted({name.lower() for name in headers}))
+
+    def is_ignored(self, name: str) -> bool:
+        """Check if a query param is left out of the key."""
+        return any(
+            fnmatch.fnmatchcase(name, pattern) for pattern in self.ignored_params
+        )
+
+    def normalize_url(self, url: httpx.URL) -> str:
+        """Get the normalized url (without fragment) used in the key."""
+        scheme = url.scheme.lower()
+        netloc = url.host.lower()
+        if ":" in netloc:
+            # ipv6 address
+            netloc = f"[{netloc}]"
+        if url.port is not None and url.port != _DEFAULT_PORTS.get(scheme):
+            netloc = f"{netloc}:{url.port}"
+        if url.userinfo:
+            # responses to different credentials are cached separately
+            netloc = f"{url.userinfo.decode('ascii')}@{netloc}"
+        params = [
+            (name, value)
+            for name, value in url.params.multi_items()
+            if not self.is_ignored(name)
+        ]
+        if self.sort_params:
+            params.sort(key=lambda item: item[0])
+        path = url.raw_path.split(b"?", 1)[0].decode("ascii")
+        key = f"{scheme}://{netloc}{path}"
+        if params:
+            key = f"{key}?{httpx.QueryParams(tuple(params))}"
+        return key
+
+    def __call__(self, request: httpx.Request) -> str:
+        key = self.normalize_url(request.url)
+        if not self.headers:
+            return key
+        values = [
+            f"{name}:{', '.join(request.headers.get_list(name))}"
+            if name in request.headers
+            else f"{name}\x00"
+            for name in self.headers
+        ]
+        digest = hashlib.sha224("\n".join(values).encode()).hexdigest()
+        return f"{key}#headers={digest}"
@@ -21,6 +21,8 @@ from httpx._types import (
 )
 
 from httpx_cache.cache import BaseCache, DictCache
+from httpx_cache.cache_key import CacheKeyFunc
+from httpx_cache.metrics import CacheMetrics, CacheStats
 from httpx_cache.transport import AsyncCacheControlTransport, CacheControlTransport
 
 
@@ -51,11 +53,17 @@ class Client(httpx.Client):
         cacheable_methods: tp.Tuple[str, ...] = ("GET",),
         cacheable_status_codes: tp.Tuple[int, ...] = (200, 203, 300, 301, 308),
         always_cache: bool = False,
+        shared: bool = False,
+        cache_key: tp.Optional[CacheKeyFunc] = None,
+        metrics: tp.Optional[CacheMetrics] = None,
     ):
         self.cache = cache or DictCache()
+        self.metrics = metrics or CacheStats()
         self.cacheable_methods = cacheable_methods
         self.cacheable_status_codes = cacheable_status_codes
         self.always_cache = always_cache
+        self.shared = shared
+        self.cache_key = cache_key
         super().__init__(
             auth=auth,
             params=params,
@@ -107,6 +115,9 @@ class Client(httpx.Client):
             cacheable_status_codes=self.cacheable_status_codes,
             cacheable_methods=self.cacheable_methods,
             always_cache=self.always_cache,
+            shared=self.shared,
+            cache_key=self.cache_key,
+            metrics=self.metrics,
         )
 
     def _init_proxy_transport(
@@ -133,6 +144,9 @@ class Client(httpx.Client):
             cacheable_status_codes=self.cacheable_status_codes,
             cacheable_methods=self.cacheable_methods,
             always_cache=self.always_cache,
+            shared=self.shared,
+            cache_key=self.cache_key,
+            metrics=self.metrics,
         )
 
 
@@ -163,11 +177,17 @@ class AsyncClient(httpx.AsyncClient):
         cacheable_methods: tp.Tuple[str, ...] = ("GET",),
         cacheable_status_codes: tp.Tuple[int, ...] = (200, 203, 300, 301, 308),
         always_cache: bool = False,
+        shared: bool = False,
+        cache_key: tp.Optional[CacheKeyFunc] = None,
+        metrics: tp.Optional[CacheMetrics] = None,
     ):
         self.cache = cache or DictCache()
+        self.metrics = metrics or CacheStats()
         self.cacheable_methods = cacheable_methods
         self.cacheable_status_codes = cacheable_status_codes
         self.always_cache = always_cache
+        self.shared = shared
+        self.cache_key = cache_key
         super().__init__(
             auth=auth,
             params=params,
@@ -219,6 +239,9 @@ class AsyncClient(httpx.AsyncClient):
             cacheable_status_codes=self.cacheable_status_codes,
             cacheable_methods=self.cacheable_methods,
             always_cache=self.always_cache,
+            shared=self.shared,
+            cache_key=self.cache_key,
+            metrics=self.metrics,
         )
 
     def _init_proxy_transport(
@@ -245,4 +268,7 @@ class AsyncClient(httpx.AsyncClient):
             cacheable_status_codes=self.cacheable_status_codes,
             cacheable_methods=self.cacheable_methods,
             always_cache=self.always_cache,
+            shared=self.shared,
+            cache_key=self.cache_key,
+            metrics=self.metrics,
         )
@@ -0,0 +1,179 @@
+import bisect
+import threading
+import typing as tp
+
+# default buckets (in seconds) of the cache latency histograms
+DEFAULT_LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+# (metric name, labels, value)
+Sample = tp.Tuple[str, tp.Dict[str, str], float]
+
+
+class CacheMetrics:
+    """Hook receiving the cache metrics of the transports, does nothing by default.
+
+    Subclass it to forward the metrics to your monitoring system (e.g. prometheus
+    or opentelemetry counters/histograms).
+
+    Counters (incremented with 'incr'):
+
+    - 'hits': fresh responses served from cache
+    - 'misses': cacheable requests without a cached response
+    - 'stale_hits': stale responses served from cache while they are revalidated
+        in the background ('stale-while-revalidate')
+    - 'stale_if_error': stale responses served from cache because the origin
+        failed ('stale-if-error'), their lookups are also counted in 'misses'
+    - 'revalidations': conditional requests sent to revalidate stale responses
+    - 'uncacheable': responses not cached because the request or the response
+        is not cacheable
+    - 'stored_bytes': size of the content of the cached responses
+    - 'evictions': entries evicted by the cache to stay under its limits
+
+    Histograms (observed with 'observe'):
+
+    - 'get_seconds': latency of the cache lookups
+    - 'set_seconds': latency of the cache writes
+
+    All metrics are labelled with the 'backend' (name of the cache class).
+    """
+
+    def incr(self, name: str, value: int = 1, *, backend: str) -> None:
+        """Increment a counter.
+
+        Args:
+            name: name of the counter
+            value: increment, defaults to 1
+            backend: name of the cache class
+        """
+
+    def observe(self, name: str, seconds: float, *, backend: str) -> None:
+        """Observe a latency.
+
+        Args:
+            name: name of the histogram
+            seconds: observed latency in seconds
+            backend: name of the cache class
+        """
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, as used by prometheus."""
+
+    def __init__(self, buckets: tp.Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> tp.List[tp.Tuple[float, int]]:
+        """Get the (upper bound, number of observations <= upper bound) pairs."""
+        total = 0
+        counts = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+
+class CacheStats(CacheMetrics):
+    """In-memory cache metrics, used by default by the transports.
+
+    Args:
+        namespace: prefix of the collected metric names, defaults to "httpx_cache"
+        buckets: upper bounds (in seconds) of the latency histogram buckets
+    """
+
+    def __init__(
+        self,
+        namespace: str = "httpx_cache",
+        buckets: tp.Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.counters: tp.Dict[tp.Tuple[str, str], int] = {}
+        self.histograms: tp.Dict[tp.Tuple[str, str], Histogram] = {}
+        self.lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1, *, backend: str) -> None:
+        with self.lock:
+            key = (name, backend)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, *, backend: str) -> None:
+        with self.lock:
+            histogram = self.histograms.get((name, backend))
+            if histogram is None:
+                histogram = self.histograms[(name, backend)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def get(self, name: str, backend: tp.Optional[str] = None) -> int:
+        """Get the value of a counter, summed over all backends if none is given."""
+        with self.lock:
+            return sum(
+                value
+                for (counter, counter_backend), value in self.counters.items()
+                if counter == name and backend in (None, counter_backend)
+            )
+
+    def hit_ratio(self, backend: tp.Optional[str] = None) -> float:
+        """Ratio of the cacheable requests served from cache (fresh or stale)."""
+        hits = self.get("hits", backend) + self.get("stale_hits", backend)
+        lookups = hits + self.get("misses", backend)
+        # the lookups of stale-if-error responses are already counted as misses
+        hits += self.get("stale_if_error", backend)
+        return hits / lookups if lookups else 0.0
+
+    def collect(self) -> tp.List[Sample]:
+        """Collect all metrics as prometheus-like samples.
+
+        Counters are named '<namespace>_<name>_total' and histograms are exposed as
+        '<namespace>_<name>_bucket' (with a 'le' label), '<namespace>_<name>_sum'
+        and '<namespace>_<name>_count'.
+
+        Returns:
+            list of (metric name, labels, value)
+        """
+        samples: tp.List[Sample] = []
+        with self.lock:
+            for (name, backend), value in sorted(self.counters.items()):
+                samples.append(
+                    (f"{self.namespace}_{name}_total", {"backend": backend}, value)
+                )
+            for (name, backend), histogram in sorted(self.histograms.items()):
+                prefix = f"{self.namespace}_{name}"
+                for bound, count in histogram.cumulative_counts():
+                    labels = {"backend": backend, "le": _format_bound(bound)}
+                    samples.append((f"{prefix}_bucket", labels, count))
+                samples.append((f"{prefix}_sum", {"backend": backend}, histogram.sum))
+                samples.append(
+                    (f"{prefix}_count", {"backend": backend}, histogram.count)
+                )
+        return samples
+
+    def reset(self) -> None:
+        """Reset all metrics."""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
@@ -1,15 +1,20 @@
-from httpx_cache.serializer.base import BaseSerializer
+from httpx_cache.serializer.base import BaseSerializer, LoadError
 from httpx_cache.serializer.common import (
+    BinarySerializer,
     BytesJsonSerializer,
     DictSerializer,
     MsgPackSerializer,
     StringJsonSerializer,
 )
+from httpx_cache.serializer.compression import CompressingSerializer
 
 __all__ = [
     "BaseSerializer",
+    "BinarySerializer",
     "BytesJsonSerializer",
+    "CompressingSerializer",
     "DictSerializer",
+    "LoadError",
     "MsgPackSerializer",
     "StringJsonSerializer",
 ]
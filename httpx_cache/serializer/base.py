@@ -3,6 +3,13 @@ from abc import ABC, abstractmethod
 
 import httpx
 
+from httpx_cache.utils import CacheMetadata
+
+
+class LoadError(ValueError):
+    """A serialized response can't be loaded (e.g. its content was compressed with
+    a codec that is not available), caches treat it as a miss."""
+
 
 class BaseSerializer(ABC):
     @abstractmethod
@@ -13,6 +20,31 @@ class BaseSerializer(ABC):
 
     @abstractmethod
     def loads(
-        self, *, cached: tp.Any, request: tp.Optional[httpx.Request] = None
+        self,
+        *,
+        cached: tp.Any,
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
     ) -> httpx.Response:
-        """Abstract method for loading an httpx.Response."""
+        """Abstract method for loading an httpx.Response.
+
+        'metadata' is the cache metadata already loaded with 'loads_metadata' (if
+        any), so that it's not decoded again.
+
+        Raises:
+            LoadError: if the response can't be loaded
+        """
+
+    def loads_metadata(self, *, cached: tp.Any) -> tp.Optional[CacheMetadata]:
+        """Load only the cache metadata of a serialized response.
+
+        Serializers can override it to read the metadata without loading the
+        response (and its content), defaults to None (unknown metadata).
+
+        Args:
+            cached: serialized response
+
+        Returns:
+            CacheMetadata, or None if it's not available
+        """
+        return None
@@ -1,20 +1,169 @@
+import io
 import json
+import struct
 import typing as tp
 
 import httpx
 import msgpack
 
 from httpx_cache.serializer.base import BaseSerializer
+from httpx_cache.serializer.headers import HeaderTable
+from httpx_cache.utils import (
+    CacheMetadata,
+    ChunkedByteStream,
+    get_cache_metadata,
+    get_raw_chunks,
+    is_content_encoded,
+    set_cache_metadata,
+)
+
+# number of bytes read at once when unpacking the metadata of a msgpack dump
+_METADATA_READ_SIZE = 1024
+
+# content of a response, or list of chunks of its streamed content
+ContentType = tp.Union[bytes, tp.Sequence[bytes]]
+
+
+def _pack_bin_header(size: int) -> bytes:
+    # msgpack 'bin 8/16/32' format header, followed by 'size' raw bytes
+    if size < 1 << 8:
+        return struct.pack(">BB", 0xC4, size)
+    if size < 1 << 16:
+        return struct.pack(">BH", 0xC5, size)
+    return _pack_bin32_header(size)
+
+
+def _pack_bin32_header(size: int) -> bytes:
+    # msgpack 'bin 32' format header, of a fixed size
+    return struct.pack(">BI", 0xC6, size)
+
+
+def _pack_head(state: tp.Dict[str, tp.Any], body_key: str) -> tp.List[bytes]:
+    # msgpack chunks of a response state without content, up to its content key
+    packer = msgpack.Packer(use_bin_type=True)
+    chunks = [packer.pack_map_header(len(state) + 1)]
+    for key, value in state.items():
+        chunks.append(packer.pack(key))
+        chunks.append(packer.pack(value))
+    chunks.append(packer.pack(body_key))
+    return chunks
+
+
+def _pop_body(state: tp.Dict[str, tp.Any]) -> tp.Tuple[str, tp.List[bytes]]:
+    # remove the content from a response state, as a list of chunks
+    body_key = "_content" if "_content" in state else "stream_content"
+    body = state.pop(body_key)
+    return body_key, [body] if isinstance(body, bytes) else body
+
+
+def _decoded_headers(
+    headers: httpx.Headers, content: tp.Optional[bytes] = None
+) -> tp.List[tp.Tuple[str, str]]:
+    # headers of the decoded content of a response
+    decoded = [
+        (name, value)
+        for name, value in headers.multi_items()
+        if name.lower() not in ("content-encoding", "content-length")
+    ]
+    if content is not None:
+        decoded.append(("content-length", str(len(content))))
+    return decoded
+
+
+def _decode_content(response: httpx.Response, content: ContentType) -> bytes:
+    # decode the raw content of a response
+    chunks = [content] if isinstance(content, bytes) else content
+    decoded = httpx.Response(
+        response.status_code, headers=response.headers, stream=ChunkedByteStream(chunks)
+    )
+    return decoded.read()
+
+
+def _new_response(
+    status_code: int,
+    headers: httpx.Headers,
+    stream: tp.Optional[httpx.SyncByteStream],
+    content: tp.Optional[bytes],
+) -> httpx.Response:
+    # same response as httpx.Response(status_code, headers=headers, stream=stream)
+    # or httpx.Response(status_code, headers=headers, content=content) for a not
+    # encoded content, without normalizing headers or reading the content again
+    response = httpx.Response.__new__(httpx.Response)
+    response.status_code = status_code
+    response.headers = headers
+    response._request = None
+    response.next_request = None
+    response.extensions = {}
+    response.history = []
+    response.default_encoding = "utf-8"
+    response._num_bytes_downloaded = 0
+    if stream is not None:
+        response.is_closed = False
+        response.is_stream_consumed = False
+        response.stream = stream
+    else:
+        assert content is not None
+        if content and "content-length" not in headers:
+            headers["Content-Length"] = str(len(content))
+        response.is_closed = True
+        response.is_stream_consumed = True
+        response.stream = httpx.ByteStream(content)
+        response._content = content
+    return response
+
+
+def _check_new_response() -> bool:
+    # responses are only built directly if they match the httpx.Response ones
+    try:
+        headers = [("Content-Type", "text/plain")]
+        for stream, content in ((None, b"Hello"), (httpx.ByteStream(b"Hello"), None)):
+            expected = httpx.Response(
+                200, headers=headers, stream=stream, content=content
+            )
+            response = _new_response(200, httpx.Headers(headers), stream, content)
+            state, expected_state = vars(response), dict(vars(expected))
+            # created when the content is read
+            expected_state.pop("_decoder", None)
+            if state.keys() != expected_state.keys():
+                return False
+            for key, value in expected_state.items():
+                if key == "headers":
+                    if response.headers.raw != expected.headers.raw:
+                        return False
+                elif key != "stream" and state[key] != value:
+                    return False
+        return True
+    except Exception:  # pragma: no cover
+        return False
+
+
+# whether DictSerializer.loads skips httpx.Response.__init__
+FAST_RESPONSE = _check_new_response()
 
 
 class DictSerializer(BaseSerializer):
     """Dumps and loads and httpx.Response into/from a python dict.
 
     The dict contains the state of the response, with all necessary info to recreate it.
+
+    Headers are encoded with a httpx_cache.serializer.headers.HeaderTable: common
+    header names and (name, value) fields are stored as small ints.
+
+    Args:
+        header_fields: Optional (name, value) header fields common to the cached
+            responses, encoded as ints in addition to the static ones, must be the
+            same when loading the responses (new fields can be appended),
+            defaults to ()
     """
 
+    # whether encoded contents are stored raw (binary), or decoded
+    raw_content = True
+
+    def __init__(self, header_fields: tp.Iterable[tp.Tuple[str, str]] = ()) -> None:
+        self.header_table = HeaderTable(header_fields)
+
     def dumps(
-        self, *, response: httpx.Response, content: tp.Optional[bytes] = None
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
     ) -> tp.Dict[str, tp.Any]:
         """Converts and httpx.Response into a dict with it's state.
 
@@ -24,10 +173,15 @@ class DictSerializer(BaseSerializer):
         In case the response does not yet have a '_content' property, content should
         be provided in the optional 'content' kwarg (usually using a callback)
 
+        Encoded contents ('Content-Encoding' header) are stored raw, as sent by the
+        origin, and decoded only when the cached response is read.
+
         Args:
             response: httpx.Response
             content (bytes, optional): Defaults to None, should be provided in case
-                response that not have yet content.
+                response that not have yet content (or to provide the raw content of
+                an encoded response), can also be a list of chunks (kept as is in
+                the state).
 
         Raises:
             httpx.ResponseNotRead: if response does not have content and no content
@@ -36,32 +190,56 @@ class DictSerializer(BaseSerializer):
         Returns:
             Dict[str, Any]
         """
-        state: tp.Dict[str, tp.Any] = {}
+        # cache-control metadata first, so that it can be read without the content
+        state: tp.Dict[str, tp.Any] = {
+            "metadata": get_cache_metadata(response).to_state()
+        }
 
         # set status_code
         state["status_code"] = response.status_code
 
-        # get content or stream_content
-        if hasattr(response, "_content"):
+        # get headers
+        headers = response.headers.multi_items()
+
+        # get content or stream_content, encoded contents are stored raw (as sent
+        # by the origin) and decoded only when the cached response is read
+        encoded = is_content_encoded(response.headers)
+        if hasattr(response, "_content") and not (encoded and self.raw_content):
             state["_content"] = response.content
-        elif content is None:
-            raise httpx.ResponseNotRead()
+            if encoded:
+                headers = _decoded_headers(response.headers, response.content)
         else:
-            state["stream_content"] = content
-
-        # get headers
-        state["headers"] = response.headers.multi_items()
+            if content is None:
+                content = get_raw_chunks(response)
+            if isinstance(content, bytes):
+                state["stream_content"] = content
+            elif content is not None:
+                state["stream_content"] = list(content)
+            elif hasattr(response, "_content"):
+                # raw content is lost, store the decoded content as not encoded
+                state["_content"] = response.content
+                headers = _decoded_headers(response.headers, response.content)
+            else:
+                raise httpx.ResponseNotRead()
+        state["headers"] = self.header_table.encode(headers)
 
         # get encoding
         if response.encoding:
             state["encoding"] = response.encoding
         return state
 
+    def loads_metadata(self, *, cached: tp.Any) -> tp.Optional[CacheMetadata]:
+        """Get the cache metadata of a dict (contains response state)."""
+        if not isinstance(cached, dict) or "metadata" not in cached:
+            return None
+        return CacheMetadata.from_state(cached["metadata"])
+
     def loads(
         self,
         *,
         cached: tp.Dict[str, tp.Any],
         request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
     ) -> httpx.Response:
         """Convert a dict (contains response state) to an httpx.Response instance.
 
@@ -69,22 +247,41 @@ class DictSerializer(BaseSerializer):
             state: Dict of the state of teh response to create
             request (httpx.Request, optional): Defaults to None, request to optionally
                 attach to the response
+            metadata (CacheMetadata, optional): Defaults to None, cache metadata
+                already loaded with 'loads_metadata'
 
         Returns:
             httpx.Response
         """
         status_code = cached["status_code"]
-        headers = cached["headers"]
+        headers = self.header_table.build_headers(cached["headers"])
         content = cached.get("_content")
         stream_content = cached.get("stream_content")
         encoding = cached.get("encoding")
 
-        stream = None if stream_content is None else httpx.ByteStream(stream_content)
-        response = httpx.Response(
-            status_code, stream=stream, headers=headers, content=content
-        )
+        stream: tp.Any = None
+        if isinstance(stream_content, list):
+            stream = ChunkedByteStream(stream_content)
+        elif isinstance(stream_content, bytes):
+            stream = httpx.ByteStream(stream_content)
+        elif stream_content is not None:
+            # already a stream (lazily loaded content)
+            stream = stream_content
+        if FAST_RESPONSE and (
+            stream is not None
+            or (content is not None and not is_content_encoded(headers))
+        ):
+            response = _new_response(status_code, headers, stream, content)
+        else:
+            response = httpx.Response(
+                status_code, stream=stream, headers=headers, content=content
+            )
         if encoding is not None:
             response.encoding = encoding
+        if metadata is None and "metadata" in cached:
+            metadata = CacheMetadata.from_state(cached["metadata"])
+        if metadata is not None:
+            set_cache_metadata(response, metadata)
 
         if request is not None:
             response.request = request
@@ -101,15 +298,28 @@ class StringJsonSerializer(DictSerializer):
 
     NB: bytes are automatically parsed as strings when using this serializer, when
     recreating response the loader is smart enough to know which key/value need to
-    be bytes and not strings (like: _content/stream)
+    be bytes and not strings (like: _content/stream), encoded contents are stored
+    decoded.
     """
 
+    raw_content = False
+
     def dumps(  # type: ignore
-        self, *, response: httpx.Response, content: tp.Optional[bytes] = None
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
     ) -> str:
         """Dump an httpx.Response to json string."""
+        if content is not None and not isinstance(content, bytes):
+            content = b"".join(content)
         state = super().dumps(response=response, content=content)
         encoding = state.get("encoding", "utf-8")
+        if "stream_content" in state and is_content_encoded(response.headers):
+            # json strings can't hold the raw content, it's stored decoded
+            state["stream_content"] = _decode_content(response, state["stream_content"])
+            state["headers"] = self.header_table.encode(
+                _decoded_headers(response.headers)
+            )
+        elif isinstance(state.get("stream_content"), list):
+            state["stream_content"] = b"".join(state["stream_content"])
         if isinstance(state.get("_content"), bytes):
             state["_content"] = state["_content"].decode(encoding)
         if isinstance(state.get("stream_content"), bytes):
@@ -118,7 +328,11 @@ class StringJsonSerializer(DictSerializer):
         return json.dumps(state)
 
     def loads(  # type: ignore
-        self, *, cached: str, request: tp.Optional[httpx.Request] = None
+        self,
+        *,
+        cached: str,
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
     ) -> httpx.Response:
         """Load an httpx.Response from a json string"""
         state = json.loads(cached)
@@ -127,7 +341,11 @@ class StringJsonSerializer(DictSerializer):
             state["_content"] = state["_content"].encode(encoding)
         if isinstance(state.get("stream_content"), str):
             state["stream_content"] = state["stream_content"].encode(encoding)
-        return super().loads(cached=state, request=request)
+        return super().loads(cached=state, request=request, metadata=metadata)
+
+    def loads_metadata(self, *, cached: tp.Any) -> tp.Optional[CacheMetadata]:
+        """Json strings can't be partially loaded, the metadata is not available."""
+        return None
 
 
 class BytesJsonSerializer(StringJsonSerializer):
@@ -136,16 +354,22 @@ class BytesJsonSerializer(StringJsonSerializer):
     """
 
     def dumps(  # type: ignore
-        self, *, response: httpx.Response, content: tp.Optional[bytes] = None
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
     ) -> bytes:
         """Dump an httpx.Response to an utf-8 encoded bytes string."""
         return super().dumps(response=response, content=content).encode("utf-8")
 
     def loads(  # type: ignore
-        self, *, cached: bytes, request: tp.Optional[httpx.Request] = None
+        self,
+        *,
+        cached: bytes,
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
     ) -> httpx.Response:
         """Load an httpx.Response to an utf-8 encoded bytes string."""
-        return super().loads(cached=cached.decode("utf-8"), request=request)
+        return super().loads(
+            cached=cached.decode("utf-8"), request=request, metadata=metadata
+        )
 
 
 class MsgPackSerializer(DictSerializer):
@@ -158,15 +382,258 @@ class MsgPackSerializer(DictSerializer):
     """
 
     def dumps(  # type: ignore
-        self, *, response: httpx.Response, content: tp.Optional[bytes] = None
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
     ) -> bytes:
         """Dump an httpx.Response to msgapck bytes."""
+        if content is not None and not isinstance(content, bytes):
+            return b"".join(self.dumps_chunks(response=response, content=content))
         return msgpack.dumps(
             super().dumps(response=response, content=content), use_bin_type=True
         )
 
+    def dumps_chunks(
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
+    ) -> tp.List[bytes]:
+        """Dump an httpx.Response to a list of msgpack chunks.
+
+        The joined chunks are a valid msgpack dump of the response, the content
+        chunks are part of the list as is, so that the content is never copied.
+        """
+        state = super().dumps(response=response, content=content)
+        body_key, body = _pop_body(state)
+        chunks = _pack_head(state, body_key)
+        chunks.append(_pack_bin_header(sum(len(chunk) for chunk in body)))
+        chunks.extend(body)
+        return chunks
+
+    def dumps_head(
+        self, *, response: httpx.Response
+    ) -> tp.Tuple[bytes, tp.Optional[int]]:
+        """Dump a streamed httpx.Response without its content, before reading it.
+
+        The content chunks are appended as is to the dump, which is a valid dump
+        of the response once the size of the content (4 bytes, big endian) is
+        written at the returned offset.
+
+        Returns:
+            Tuple of the dump without content and the offset of the size of the
+            content, None if the size is not part of the dump.
+        """
+        state = super().dumps(response=response, content=[])
+        body_key, _ = _pop_body(state)
+        head = b"".join(_pack_head(state, body_key))
+        # 'bin 32' header, whatever the size of the content
+        return head + _pack_bin32_header(0), len(head) + 1
+
+    def dumps_parts(
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
+    ) -> tp.Tuple[bytes, tp.List[bytes]]:
+        """Dump an httpx.Response to msgpack bytes without its content.
+
+        Returns:
+            Tuple of the msgpack dump of the response (without content) and the
+            list of chunks of its content, to be loaded back with 'loads_parts'.
+        """
+        state = super().dumps(response=response, content=content)
+        state["body"], body = _pop_body(state)
+        return msgpack.dumps(state, use_bin_type=True), body
+
+    def loads_parts(
+        self,
+        *,
+        head: bytes,
+        body: tp.Union[bytes, httpx.SyncByteStream],
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
+    ) -> httpx.Response:
+        """Load an httpx.Response dumped with 'dumps_parts'.
+
+        Args:
+            head: msgpack dump of the response without content
+            body: content of the response, or a stream to lazily read it from
+            request (httpx.Request, optional): request to attach to the response
+            metadata (CacheMetadata, optional): cache metadata already loaded with
+                'loads_metadata'
+        """
+        state = msgpack.loads(head, raw=False)
+        body_key = state.pop("body")
+        state[body_key if isinstance(body, bytes) else "stream_content"] = body
+        return super().loads(cached=state, request=request, metadata=metadata)
+
+    def loads_metadata(self, *, cached: tp.Any) -> tp.Optional[CacheMetadata]:
+        """Load the cache metadata from msgpack bytes, without the content.
+
+        Works on the bytes of both 'dumps' and 'dumps_parts' (head), only the
+        metadata (first key of the dump) is unpacked.
+        """
+        if not isinstance(cached, bytes):
+            return None
+        unpacker = msgpack.Unpacker(
+            io.BytesIO(cached), raw=False, read_size=_METADATA_READ_SIZE
+        )
+        try:
+            if not unpacker.read_map_header() or unpacker.unpack() != "metadata":
+                return None
+            return CacheMetadata.from_state(unpacker.unpack())
+        except Exception:
+            # not a dumped response (e.g. vary marker) or an older format
+            return None
+
     def loads(  # type: ignore
-        self, *, cached: bytes, request: tp.Optional[httpx.Request] = None
+        self,
+        *,
+        cached: bytes,
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
     ) -> httpx.Response:
         """Load an httpx.Response from a msgapck bytes."""
-        return super().loads(cached=msgpack.loads(cached, raw=False), request=request)
+        return super().loads(
+            cached=msgpack.loads(cached, raw=False), request=request, metadata=metadata
+        )
+
+
+# magic bytes and (magic, header size) prefix of the BinarySerializer format
+_BINARY_MAGIC = b"HXB\x01"
+_BINARY_PREFIX = struct.Struct(">4sI")
+
+
+class BinarySerializer(MsgPackSerializer):
+    """Serialize an httpx.Response to a compact binary format.
+
+    Serialized data is returned as bytes: a fixed size prefix (magic bytes and
+    size of the header block), a msgpack header block (metadata, status code,
+    headers and encoding of the response) and the raw content appended as is.
+
+    The content is never msgpack encoded/decoded: dumping a response only copies
+    it once (none with 'dumps_chunks'/'dumps_parts'), and 'unpack' hands it out
+    as a memoryview of the serialized data.
+    """
+
+    def _dumps_head(
+        self, response: httpx.Response, content: tp.Optional[ContentType]
+    ) -> tp.Tuple[bytes, tp.List[bytes]]:
+        state = DictSerializer.dumps(self, response=response, content=content)
+        streamed = "stream_content" in state
+        _, body = _pop_body(state)
+        header = msgpack.dumps(
+            [
+                state["metadata"],
+                state["status_code"],
+                state["headers"],
+                state.get("encoding"),
+                streamed,
+            ],
+            use_bin_type=True,
+        )
+        return _BINARY_PREFIX.pack(_BINARY_MAGIC, len(header)) + header, body
+
+    def dumps(  # type: ignore
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
+    ) -> bytes:
+        """Dump an httpx.Response to bytes."""
+        return b"".join(self.dumps_chunks(response=response, content=content))
+
+    def dumps_chunks(
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
+    ) -> tp.List[bytes]:
+        """Dump an httpx.Response to a list of chunks, the content chunks as is."""
+        head, body = self._dumps_head(response, content)
+        return [head, *body]
+
+    def dumps_parts(
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
+    ) -> tp.Tuple[bytes, tp.List[bytes]]:
+        """Dump an httpx.Response to its header section and its content chunks."""
+        return self._dumps_head(response, content)
+
+    def dumps_head(
+        self, *, response: httpx.Response
+    ) -> tp.Tuple[bytes, tp.Optional[int]]:
+        """Dump a streamed httpx.Response without its content, before reading it.
+
+        The content chunks are appended as is to the dump, its size is not part
+        of it.
+        """
+        head, _ = self._dumps_head(response, [])
+        return head, None
+
+    def unpack(
+        self, cached: tp.Union[bytes, bytearray, memoryview]
+    ) -> tp.Tuple[tp.List[tp.Any], memoryview]:
+        """Unpack serialized data to its header and its content, without copy.
+
+        Args:
+            cached: serialized response (or its header section only)
+
+        Raises:
+            ValueError: if the data is not a serialized response
+
+        Returns:
+            Tuple of the header (list) and a memoryview of the content
+        """
+        view = memoryview(cached)
+        if len(view) < _BINARY_PREFIX.size:
+            raise ValueError("Not a serialized response")
+        magic, size = _BINARY_PREFIX.unpack_from(view)
+        if magic != _BINARY_MAGIC:
+            raise ValueError("Not a serialized response")
+        offset = _BINARY_PREFIX.size + size
+        header = msgpack.loads(view[_BINARY_PREFIX.size : offset], raw=False)
+        return header, view[offset:]
+
+    def _loads_header(
+        self,
+        header: tp.List[tp.Any],
+        body: tp.Union[bytes, httpx.SyncByteStream],
+        request: tp.Optional[httpx.Request],
+        metadata: tp.Optional[CacheMetadata],
+    ) -> httpx.Response:
+        state_metadata, status_code, headers, encoding, streamed = header
+        state: tp.Dict[str, tp.Any] = {
+            "metadata": state_metadata,
+            "status_code": status_code,
+            "headers": headers,
+        }
+        if encoding is not None:
+            state["encoding"] = encoding
+        if streamed or not isinstance(body, bytes):
+            state["stream_content"] = body
+        else:
+            state["_content"] = body
+        return DictSerializer.loads(
+            self, cached=state, request=request, metadata=metadata
+        )
+
+    def loads_parts(
+        self,
+        *,
+        head: bytes,
+        body: tp.Union[bytes, httpx.SyncByteStream],
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
+    ) -> httpx.Response:
+        """Load an httpx.Response dumped with 'dumps_parts'."""
+        header, _ = self.unpack(head)
+        return self._loads_header(header, body, request, metadata)
+
+    def loads_metadata(self, *, cached: tp.Any) -> tp.Optional[CacheMetadata]:
+        """Load the cache metadata from the header block only."""
+        if not isinstance(cached, (bytes, bytearray, memoryview)):
+            return None
+        try:
+            header, _ = self.unpack(cached)
+            return CacheMetadata.from_state(header[0])
+        except Exception:
+            # not a dumped response (e.g. vary marker)
+            return None
+
+    def loads(  # type: ignore
+        self,
+        *,
+        cached: tp.Union[bytes, bytearray, memoryview],
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
+    ) -> httpx.Response:
+        """Load an httpx.Response from bytes, the content is copied once."""
+        header, body = self.unpack(cached)
+        return self._loads_header(header, body.tobytes(), request, metadata)
@@ -0,0 +1,363 @@
+import fnmatch
+import gzip
+import threading
+import typing as tp
+import zlib
+from abc import ABC, abstractmethod
+
+import httpx
+
+from httpx_cache.serializer.base import BaseSerializer, LoadError
+from httpx_cache.serializer.common import (
+    ContentType,
+    MsgPackSerializer,
+    StringJsonSerializer,
+)
+from httpx_cache.utils import CacheMetadata, get_cache_metadata, set_cache_metadata
+
+__all__ = [
+    "Codec",
+    "CompressingSerializer",
+    "GzipCodec",
+    "Lz4Codec",
+    "ZlibCodec",
+    "ZstdCodec",
+]
+
+# header added to the cached response when its content is compressed, its value is
+# the codec name (with a ';stream' suffix if the content was streamed)
+COMPRESSION_HEADER = "x-httpx-cache-compression"
+
+# content types that are already compressed, never compressed again by default
+DEFAULT_SKIP_CONTENT_TYPES = (
+    "image/png",
+    "image/jpeg",
+    "image/gif",
+    "image/webp",
+    "image/avif",
+    "video/*",
+    "audio/*",
+    "font/woff",
+    "font/woff2",
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+)
+
+
+class Codec(ABC):
+    """Compression codec used by the CompressingSerializer.
+
+    The codec 'name' is stored with the compressed content, it must identify how
+    to decompress it.
+    """
+
+    name: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress data."""
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress data compressed with 'compress'."""
+
+
+class ZlibCodec(Codec):
+    """Stdlib zlib codec.
+
+    Args:
+        level: compression level (0-9), defaults to 6
+    """
+
+    name = "zlib"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class GzipCodec(Codec):
+    """Stdlib gzip codec.
+
+    Args:
+        level: compression level (0-9), defaults to 6
+    """
+
+    name = "gzip"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdCodec(Codec):
+    """Zstandard codec, requires the 'zstandard' package.
+
+    A dictionary trained on samples of the cached contents (see 'train') greatly
+    improves the compression of small responses. Contents compressed with a
+    dictionary can only be decompressed with the same dictionary.
+
+    Args:
+        level: compression level (1-22), defaults to 3
+        dictionary: Optional trained dictionary (bytes of a zstd dictionary)
+    """
+
+    def __init__(self, level: int = 3, dictionary: tp.Optional[bytes] = None) -> None:
+        import zstandard
+
+        self._zstd = zstandard
+        self.level = level
+        self.dictionary = dictionary
+        self._dict_data = None
+        self.name = "zstd"
+        if dictionary is not None:
+            self._dict_data = zstandard.ZstdCompressionDict(dictionary)
+            self.name = f"zstd-{self._dict_data.dict_id()}"
+        # (de)compressor objects can't be shared between threads
+        self._local = threading.local()
+
+    @classmethod
+    def train(
+        cls, samples: tp.Sequence[bytes], dict_size: int = 110 * 1024, level: int = 3
+    ) -> "ZstdCodec":
+        """Create a codec with a dictionary trained on samples of contents.
+
+        Args:
+            samples: contents representative of the cached responses
+            dict_size: max size of the dictionary in bytes, defaults to 110KiB
+            level: compression level, defaults to 3
+        """
+        import zstandard
+
+        dictionary = zstandard.train_dictionary(dict_size, list(samples))
+        return cls(level=level, dictionary=dictionary.as_bytes())
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = self._zstd.ZstdCompressor(
+                level=self.level, dict_data=self._dict_data
+            )
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = self._zstd.ZstdDecompressor(
+                dict_data=self._dict_data
+            )
+        return decompressor.decompress(data)
+
+
+class Lz4Codec(Codec):
+    """LZ4 frame codec (fastest), requires the 'lz4' package.
+
+    Args:
+        level: compression level (0-16), defaults to 0 (fast mode)
+    """
+
+    name = "lz4"
+
+    def __init__(self, level: int = 0) -> None:
+        import lz4.frame
+
+        self._lz4 = lz4.frame
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return self._lz4.compress(  # type: ignore[no-any-return]
+            data, compression_level=self.level
+        )
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._lz4.decompress(data)  # type: ignore[no-any-return]
+
+
+_CODECS: tp.Dict[str, tp.Callable[[], Codec]] = {
+    "zlib": ZlibCodec,
+    "gzip": GzipCodec,
+    "zstd": ZstdCodec,
+    "lz4": Lz4Codec,
+}
+
+
+def get_codec(codec: tp.Union[str, Codec]) -> Codec:
+    """Get a codec instance from its name ('zlib', 'gzip', 'zstd' or 'lz4')."""
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in _CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {list(_CODECS)}")
+    return _CODECS[codec]()
+
+
+class CompressingSerializer(BaseSerializer):
+    """Wraps a serializer to compress the content of the cached responses.
+
+    The content is compressed before being given to the wrapped serializer, which
+    serializes the response as usual (with an additional header naming the
+    codec), so that its format (and cache metadata) is unchanged.
+
+    The content is stored uncompressed when:
+
+    - it's smaller than 'min_size'
+    - the response has a 'Content-Encoding' header: its content was already
+        compressed by the origin, it's kept as is
+    - the response content type matches one of 'skip_content_types' (e.g. images)
+    - compressing it does not make it smaller
+
+    Args:
+        serializer: Optional serializer to wrap (storing bytes contents, not a json
+            serializer), defaults to httpx_cache.MsgPackSerializer
+        codec: codec name ('zlib', 'gzip', 'zstd' or 'lz4') or an instance of
+            httpx_cache.serializer.compression.Codec, defaults to 'zlib'
+        min_size: size in bytes under which contents are not compressed,
+            defaults to 1024
+        skip_content_types: content types that are not compressed, supports
+            shell-style wildcards (e.g. 'video/*'), defaults to already compressed
+            media types
+    """
+
+    def __init__(
+        self,
+        serializer: tp.Optional[BaseSerializer] = None,
+        codec: tp.Union[str, Codec] = "zlib",
+        min_size: int = 1024,
+        skip_content_types: tp.Iterable[str] = DEFAULT_SKIP_CONTENT_TYPES,
+    ) -> None:
+        self.serializer = serializer or MsgPackSerializer()
+        if not isinstance(self.serializer, BaseSerializer):
+            raise TypeError(
+                "Expected serializer of type 'httpx_cache.BaseSerializer', "
+                f"got {type(self.serializer)}"
+            )
+        if isinstance(self.serializer, StringJsonSerializer):
+            raise TypeError("Json serializers can't store compressed (binary) contents")
+        self.codec = get_codec(codec)
+        self.min_size = min_size
+        self.skip_content_types = tuple(skip_content_types)
+        # codecs able to decompress contents, by name
+        self._codecs: tp.Dict[str, Codec] = {self.codec.name: self.codec}
+
+    def is_compressible(self, response: httpx.Response) -> bool:
+        """Checks if the content of a response should be compressed."""
+        if "content-encoding" in response.headers:
+            return False
+        content_type = response.headers.get("content-type", "")
+        mime_type = content_type.split(";", 1)[0].strip().lower()
+        return not any(
+            fnmatch.fnmatchcase(mime_type, pattern)
+            for pattern in self.skip_content_types
+        )
+
+    def _get_codec(self, name: str) -> Codec:
+        codec = self._codecs.get(name)
+        if codec is None:
+            # contents compressed with another (builtin) codec
+            try:
+                codec = self._codecs[name] = get_codec(name)
+            except (ValueError, ImportError) as error:
+                # e.g. a zstd dictionary or a package that is not available
+                raise LoadError(f"Can't decompress content: {error}") from error
+        return codec
+
+    def _compress(
+        self, response: httpx.Response, content: tp.Optional[ContentType]
+    ) -> tp.Optional[bytes]:
+        # compressed content, None if it should be stored as is
+        if not self.is_compressible(response):
+            return None
+        if hasattr(response, "_content"):
+            data = response.content
+        elif content is None:
+            raise httpx.ResponseNotRead()
+        else:
+            data = content if isinstance(content, bytes) else b"".join(content)
+        if len(data) < self.min_size:
+            return None
+        compressed = self.codec.compress(data)
+        return compressed if len(compressed) < len(data) else None
+
+    def dumps(
+        self, *, response: httpx.Response, content: tp.Optional[ContentType] = None
+    ) -> tp.Any:
+        """Dump an httpx.Response with the wrapped serializer, content compressed."""
+        compressed = self._compress(response, content)
+        if compressed is None:
+            return self.serializer.dumps(
+                response=response, content=content  # type: ignore[arg-type]
+            )
+
+        streamed = not hasattr(response, "_content")
+        value = f"{self.codec.name};stream" if streamed else self.codec.name
+        # a stream is used so that httpx does not add a 'Content-Length' header
+        compressed_response = httpx.Response(
+            response.status_code,
+            headers=[*response.headers.multi_items(), (COMPRESSION_HEADER, value)],
+            stream=httpx.ByteStream(b""),
+        )
+        compressed_response.encoding = response.encoding
+        set_cache_metadata(compressed_response, get_cache_metadata(response))
+        return self.serializer.dumps(response=compressed_response, content=compressed)
+
+    def loads_metadata(self, *, cached: tp.Any) -> tp.Optional[CacheMetadata]:
+        """Load the cache metadata with the wrapped serializer."""
+        return self.serializer.loads_metadata(cached=cached)
+
+    def loads(
+        self,
+        *,
+        cached: tp.Any,
+        request: tp.Optional[httpx.Request] = None,
+        metadata: tp.Optional[CacheMetadata] = None,
+    ) -> httpx.Response:
+        """Load an httpx.Response with the wrapped serializer, content decompressed.
+
+        Raises:
+            LoadError: if the content was compressed with an unavailable codec
+        """
+        response = self.serializer.loads(
+            cached=cached, request=request, metadata=metadata
+        )
+        value = response.headers.get(COMPRESSION_HEADER)
+        if value is None:
+            return response
+        name, _, kind = value.partition(";")
+        try:
+            codec = self._get_codec(name)
+        except LoadError:
+            response.close()
+            raise
+        data = codec.decompress(response.read())
+        headers = [
+            (key, value)
+            for key, value in response.headers.multi_items()
+            if key.lower() != COMPRESSION_HEADER
+        ]
+        if kind == "stream":
+            loaded = httpx.Response(
+                response.status_code, headers=headers, stream=httpx.ByteStream(data)
+            )
+        else:
+            loaded = httpx.Response(response.status_code, headers=headers, content=data)
+        loaded.encoding = response.encoding
+        set_cache_metadata(loaded, get_cache_metadata(response))
+        if request is not None:
+            loaded.request = request
+        return loaded
@@ -0,0 +1,243 @@
+import typing as tp
+
+import httpx
+
+__all__ = ["HeaderTable"]
+
+# Header names and (name, value) fields encoded as indexes by the HeaderTable.
+# Indexes are part of the serialized format: entries can only be appended to these
+# tables, never removed or reordered.
+
+# names of the HPACK static table (RFC 7541, Appendix A), then common response headers
+STATIC_HEADER_NAMES: tp.Tuple[str, ...] = (
+    "accept-charset",
+    "accept-encoding",
+    "accept-language",
+    "accept-ranges",
+    "accept",
+    "access-control-allow-origin",
+    "age",
+    "allow",
+    "authorization",
+    "cache-control",
+    "content-disposition",
+    "content-encoding",
+    "content-language",
+    "content-length",
+    "content-location",
+    "content-range",
+    "content-type",
+    "cookie",
+    "date",
+    "etag",
+    "expect",
+    "expires",
+    "from",
+    "host",
+    "if-match",
+    "if-modified-since",
+    "if-none-match",
+    "if-range",
+    "if-unmodified-since",
+    "last-modified",
+    "link",
+    "location",
+    "max-forwards",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "range",
+    "referer",
+    "refresh",
+    "retry-after",
+    "server",
+    "set-cookie",
+    "strict-transport-security",
+    "transfer-encoding",
+    "user-agent",
+    "vary",
+    "via",
+    "www-authenticate",
+    "connection",
+    "keep-alive",
+    "pragma",
+    "warning",
+    "alt-svc",
+    "access-control-allow-credentials",
+    "access-control-allow-headers",
+    "access-control-allow-methods",
+    "access-control-expose-headers",
+    "access-control-max-age",
+    "content-security-policy",
+    "cross-origin-opener-policy",
+    "cross-origin-resource-policy",
+    "permissions-policy",
+    "referrer-policy",
+    "timing-allow-origin",
+    "x-content-type-options",
+    "x-frame-options",
+    "x-xss-protection",
+    "x-powered-by",
+    "x-request-id",
+    "x-cache",
+    "x-httpx-cache-compression",
+)
+
+# common (name, value) fields
+STATIC_HEADER_FIELDS: tp.Tuple[tp.Tuple[str, str], ...] = (
+    ("accept-ranges", "bytes"),
+    ("access-control-allow-origin", "*"),
+    ("cache-control", "no-cache"),
+    ("cache-control", "no-store"),
+    ("cache-control", "private"),
+    ("cache-control", "public"),
+    ("cache-control", "max-age=0"),
+    ("connection", "keep-alive"),
+    ("connection", "close"),
+    ("content-encoding", "gzip"),
+    ("content-encoding", "br"),
+    ("content-encoding", "deflate"),
+    ("content-encoding", "zstd"),
+    ("content-length", "0"),
+    ("content-type", "application/json"),
+    ("content-type", "application/json; charset=utf-8"),
+    ("content-type", "application/javascript"),
+    ("content-type", "application/octet-stream"),
+    ("content-type", "application/xml"),
+    ("content-type", "image/jpeg"),
+    ("content-type", "image/png"),
+    ("content-type", "text/css"),
+    ("content-type", "text/html"),
+    ("content-type", "text/html; charset=utf-8"),
+    ("content-type", "text/plain"),
+    ("content-type", "text/plain; charset=utf-8"),
+    ("referrer-policy", "strict-origin-when-cross-origin"),
+    ("server", "cloudflare"),
+    ("server", "nginx"),
+    ("strict-transport-security", "max-age=31536000"),
+    ("strict-transport-security", "max-age=31536000; includeSubDomains"),
+    ("transfer-encoding", "chunked"),
+    ("vary", "accept-encoding"),
+    ("vary", "Accept-Encoding"),
+    ("vary", "origin"),
+    ("x-content-type-options", "nosniff"),
+    ("x-frame-options", "DENY"),
+    ("x-frame-options", "SAMEORIGIN"),
+    ("x-xss-protection", "1; mode=block"),
+)
+
+# httpx.Headers items: (raw name, lowercased name, value) bytes
+HeaderItem = tp.Tuple[bytes, bytes, bytes]
+
+# encoded headers: a flat list of tokens
+EncodedHeaders = tp.List[tp.Union[int, str]]
+# decoded headers: (name, value) pairs of str, or bytes for the table entries
+RawHeaders = tp.List[tp.Tuple[tp.Any, tp.Any]]
+
+
+def _header_item(name: tp.Union[str, bytes], value: tp.Union[str, bytes]) -> HeaderItem:
+    # same normalization as httpx.Headers (without encoding)
+    raw = name if isinstance(name, bytes) else name.encode("ascii")
+    return (
+        raw,
+        raw.lower(),
+        value if isinstance(value, bytes) else value.encode("ascii"),
+    )
+
+
+def _new_headers(items: tp.List[HeaderItem]) -> httpx.Headers:
+    # httpx.Headers of already normalized items, skips httpx.Headers.__init__
+    headers = httpx.Headers.__new__(httpx.Headers)
+    headers._list = items
+    headers._encoding = None
+    return headers
+
+
+def _check_new_headers() -> bool:
+    # headers are only built directly if they match the httpx.Headers ones
+    try:
+        pairs = [("Content-Type", "text/plain"), ("x-custom", "value")]
+        expected = httpx.Headers(pairs)
+        headers = _new_headers([_header_item(name, value) for name, value in pairs])
+        return vars(headers).keys() == vars(expected).keys() and (
+            headers.raw == expected.raw and headers == expected
+        )
+    except Exception:  # pragma: no cover
+        return False
+
+
+# whether HeaderTable.build_headers skips httpx.Headers.__init__
+FAST_HEADERS = _check_new_headers()
+
+
+class HeaderTable:
+    """Encodes headers into a compact list of tokens (HPACK-style indexing).
+
+    Each header is encoded as:
+
+    - an int >= 0: index of a (name, value) field of the table
+    - an int < 0 (~index of a static header name) followed by the value
+    - the literal name followed by the value
+
+    The table holds the static fields followed by the custom 'fields', which
+    must be the same when loading a response (new fields can be appended).
+
+    Args:
+        fields: Optional custom (name, value) fields, e.g. values common to the
+            responses of the cached API, defaults to ()
+    """
+
+    def __init__(self, fields: tp.Iterable[tp.Tuple[str, str]] = ()) -> None:
+        self.fields = STATIC_HEADER_FIELDS + tuple(
+            (name.lower(), value) for name, value in fields
+        )
+        self._field_indexes: tp.Dict[tp.Tuple[str, str], int] = {}
+        for index, field in enumerate(self.fields):
+            self._field_indexes.setdefault(field, index)
+        self._name_indexes = {
+            name: ~index for index, name in enumerate(STATIC_HEADER_NAMES)
+        }
+        # pre-encoded names and fields, so that httpx.Headers does not encode them
+        self._raw_names = [name.encode("ascii") for name in STATIC_HEADER_NAMES]
+        self._items = [_header_item(name, value) for name, value in self.fields]
+
+    def encode(self, headers: tp.Iterable[tp.Tuple[str, str]]) -> EncodedHeaders:
+        """Encode (name, value) pairs, names are expected lowercased."""
+        encoded: EncodedHeaders = []
+        for field in headers:
+            index = self._field_indexes.get(field)
+            if index is not None:
+                encoded.append(index)
+            else:
+                name, value = field
+                encoded.append(self._name_indexes.get(name, name))
+                encoded.append(value)
+        return encoded
+
+    def decode(self, encoded: tp.Sequence[tp.Any]) -> RawHeaders:
+        """Decode encoded headers to (name, value) pairs for httpx.Headers."""
+        return [(raw, value) for raw, _, value in self.decode_items(encoded)]
+
+    def decode_items(self, encoded: tp.Sequence[tp.Any]) -> tp.List[HeaderItem]:
+        """Decode encoded headers to normalized httpx.Headers items."""
+        if encoded and isinstance(encoded[0], (list, tuple)):
+            # (name, value) pairs of an older format
+            return [_header_item(name, value) for name, value in encoded]
+        items: tp.List[HeaderItem] = []
+        tokens = iter(encoded)
+        for token in tokens:
+            if isinstance(token, int):
+                if token >= 0:
+                    items.append(self._items[token])
+                    continue
+                raw = self._raw_names[~token]
+                # static names are lowercase
+                items.append((raw, raw, next(tokens).encode("ascii")))
+            else:
+                items.append(_header_item(token, next(tokens)))
+        return items
+
+    def build_headers(self, encoded: tp.Sequence[tp.Any]) -> httpx.Headers:
+        """Build the httpx.Headers of encoded headers, without normalizing them."""
+        if FAST_HEADERS:
+            return _new_headers(self.decode_items(encoded))
+        return httpx.Headers(self.decode(encoded))
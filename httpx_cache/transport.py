@@ -1,18 +1,154 @@
+import asyncio
+import functools
 import logging
+import threading
+import time
 import typing as tp
+from concurrent.futures import ThreadPoolExecutor
+from types import TracebackType
 
+import anyio
 import httpx
+import sniffio
 
-from httpx_cache.cache import BaseCache, DictCache
+from httpx_cache.cache import BaseCache, CacheWriter, DictCache
 from httpx_cache.cache_control import CacheControl
-from httpx_cache.utils import ByteStreamWrapper
+from httpx_cache.cache_key import CacheKeyFunc
+from httpx_cache.metrics import CacheMetrics, CacheStats
+from httpx_cache.utils import (
+    ByteStreamWrapper,
+    get_cache_key,
+    merge_not_modified_response,
+    set_cache_key,
+)
 
 logger = logging.getLogger(__name__)
 
+# origin errors for which a stale response can be served (stale-if-error)
+_SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+
+
+class _InFlight:
+    """Registry of in-flight origin requests by cache key (single-flight).
+
+    The first thread to acquire a key is the leader and must release it once the
+    response is cached, other threads get an event to wait for. A thread
+    acquiring a key it already leads (e.g. while consuming a streaming response)
+    gets an already set event, so that it never waits for itself.
+    """
+
+    def __init__(self) -> None:
+        self._flights: tp.Dict[str, tp.Tuple[threading.Event, int]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> tp.Optional[threading.Event]:
+        ident = threading.get_ident()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                self._flights[key] = (threading.Event(), ident)
+                return None
+        event, owner = flight
+        if owner == ident:
+            event = threading.Event()
+            event.set()
+        return event
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight[0].set()
+
+
+class _AsyncInFlight:
+    """Async version of _InFlight, using anyio events and task ids."""
+
+    def __init__(self) -> None:
+        self._flights: tp.Dict[str, tp.Tuple[anyio.Event, int]] = {}
+
+    def acquire(self, key: str) -> tp.Optional[anyio.Event]:
+        task_id = anyio.get_current_task().id
+        flight = self._flights.get(key)
+        if flight is None:
+            self._flights[key] = (anyio.Event(), task_id)
+            return None
+        event, owner = flight
+        if owner == task_id:
+            event = anyio.Event()
+            event.set()
+        return event
+
+    def release(self, key: str) -> None:
+        flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight[0].set()
+
+
+class _MetricsRecorder:
+    """Records the cache metrics of a transport, labelled with its cache backend."""
+
+    def __init__(self, metrics: CacheMetrics, cache: BaseCache) -> None:
+        self.metrics = metrics
+        self.cache = cache
+        self.backend = type(cache).__name__
+        self._evictions = cache.evictions
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.metrics.incr(name, value, backend=self.backend)
+
+    def get_done(self, started: float) -> None:
+        self.metrics.observe(
+            "get_seconds", time.perf_counter() - started, backend=self.backend
+        )
+
+    def set_done(self, started: float, size: int) -> None:
+        self.metrics.observe(
+            "set_seconds", time.perf_counter() - started, backend=self.backend
+        )
+        self.incr("stored_bytes", size)
+        # evictions can happen outside of 'set' (e.g. background gc)
+        evictions = self.cache.evictions
+        if evictions > self._evictions:
+            self.incr("evictions", evictions - self._evictions)
+        self._evictions = evictions
+
+
+def _spawn_system_task(
+    func: tp.Callable[..., tp.Coroutine[tp.Any, tp.Any, None]], *args: tp.Any
+) -> tp.Any:
+    # start a task outside of any task group, so that no cancel scope is held open
+    # across the lifetime of a transport (which can then be closed from any task)
+    if sniffio.current_async_library() == "trio":
+        import trio
+
+        trio.lowlevel.spawn_system_task(func, *args)
+        return None
+    # the event loop only keeps a weak reference to its tasks
+    return asyncio.get_running_loop().create_task(func(*args))
+
+
+def _release_when_cached(
+    response: httpx.Response, release: tp.Callable[[], None]
+) -> httpx.Response:
+    # a streaming response is cached only when its stream is consumed/closed, a
+    # stream already read (e.g. revalidated response) is already cached
+    if isinstance(response.stream, ByteStreamWrapper) and not response.stream.closed:
+        response.stream.on_close = release
+    else:
+        release()
+    return response
+
 
 class CacheControlTransport(httpx.BaseTransport):
     """CacheControl transport for httpx_cache.
 
+    Stale responses that allow it ('stale-while-revalidate') are served directly
+    while they are revalidated in a background thread.
+
+    Concurrent cache misses for the same url are coalesced: only the first one is
+    sent to the origin, the others wait for its response to be cached.
+
     Args:
         transport (optional): an existing httpx transport, if no transport
             is given, defaults to an httpx.HTTPTransport with default args.
@@ -21,8 +157,22 @@ class CacheControlTransport(httpx.BaseTransport):
         cacheable_methods: methods that are allowed to be cached, defaults to ['GET']
         cacheable_status_codes: status codes that are allowed to be cached,
             defaults to: (200, 203, 300, 301, 308)
+        always_cache: cache responses even with a 'no-store' directive, defaults
+            to False
+        shared: whether the cache is shared between users, see
+            httpx_cache.CacheControl, defaults to False (private cache)
+        cache_key (optional): function computing the cache key of a request (e.g.
+            an httpx_cache.CacheKey), defaults to the request url
+        metrics (optional): hook receiving the cache metrics (hits, misses,
+            latencies...), defaults to an httpx_cache.CacheStats, available as
+            'transport.metrics'
     """
 
+    # max number of threads used to revalidate stale responses in background
+    max_background_workers = 4
+    # max time (in seconds) to wait for an in-flight request to the same url
+    coalescing_timeout = 60.0
+
     def __init__(
         self,
         *,
@@ -31,52 +181,244 @@ class CacheControlTransport(httpx.BaseTransport):
         cacheable_methods: tp.Tuple[str, ...] = ("GET",),
         cacheable_status_codes: tp.Tuple[int, ...] = (200, 203, 300, 301, 308),
         always_cache: bool = False,
+        shared: bool = False,
+        cache_key: tp.Optional[CacheKeyFunc] = None,
+        metrics: tp.Optional[CacheMetrics] = None,
     ):
         self.controller = CacheControl(
             cacheable_methods=cacheable_methods,
             cacheable_status_codes=cacheable_status_codes,
             always_cache=always_cache,
+            shared=shared,
         )
         self.transport = transport or httpx.HTTPTransport()
         self.cache = cache or DictCache()
+        self.cache_key = cache_key
+        self.metrics = metrics or CacheStats()
+        self._recorder = _MetricsRecorder(self.metrics, self.cache)
+
+        self._executor: tp.Optional[ThreadPoolExecutor] = None
+        self._refreshing: tp.Set[str] = set()
+        self._refreshing_lock = threading.Lock()
+        self._in_flight = _InFlight()
+
+    def _cache_get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        started = time.perf_counter()
+        cached = self.cache.get(request)
+        self._recorder.get_done(started)
+        return cached
+
+    def _cache_set(self, *, request: httpx.Request, response: httpx.Response) -> None:
+        started = time.perf_counter()
+        self.cache.set(request=request, response=response)
+        self._recorder.set_done(started, len(response.content))
+
+    def _cache_commit(self, writer: CacheWriter) -> None:
+        logger.debug(f"Caching response for: {writer.request}")
+        started = time.perf_counter()
+        writer.commit()
+        self._recorder.set_done(started, writer.size)
 
     def close(self) -> None:
+        if self._executor is not None:
+            # wait for background revalidations before closing cache/transport
+            self._executor.shutdown(wait=True)
+            self._executor = None
         self.cache.close()
         self.transport.close()
 
+    def _handle_not_modified(
+        self,
+        *,
+        request: httpx.Request,
+        cached: httpx.Response,
+        response: httpx.Response,
+    ) -> httpx.Response:
+        logger.debug(f"Cached response is still valid, refreshing it: {request}")
+        response.read()
+        response.close()
+        cached = merge_not_modified_response(cached=cached, response=response)
+        if hasattr(cached, "_content"):
+            self._cache_set(request=request, response=cached)
+        else:
+            # cache the raw content, written while it's read (and decoded)
+            cached.stream = ByteStreamWrapper(
+                stream=cached.stream,  # type: ignore
+                callback=self._cache_commit,
+                writer=self.cache.open_writer(request=request, response=cached),
+            )
+            cached.read()
+        setattr(cached, "from_cache", True)
+        return cached
+
+    def _revalidate(
+        self, *, request: httpx.Request, cached: httpx.Response
+    ) -> httpx.Response:
+        revalidation_request = self.controller.build_revalidation_request(
+            request=request, response=cached
+        )
+        logger.debug(f"Cached response is stale, revalidating: {request}")
+        if revalidation_request is not None:
+            self._recorder.incr("revalidations")
+        try:
+            response = self.transport.handle_request(revalidation_request or request)
+        except Exception as error:
+            if not isinstance(error, httpx.TransportError) or (
+                not self.controller.allows_stale_if_error(
+                    request=request, response=cached
+                )
+            ):
+                # the stale response is not served, release its stream (e.g. file)
+                cached.close()
+                raise
+            logger.warning(f"Origin failed, serving stale response: {request}")
+            self._recorder.incr("stale_if_error")
+            setattr(cached, "from_cache", True)
+            return cached
+
+        if response.status_code == 304 and revalidation_request is not None:
+            return self._handle_not_modified(
+                request=request, cached=cached, response=response
+            )
+        if response.status_code in _SERVER_ERROR_STATUSES and (
+            self.controller.allows_stale_if_error(request=request, response=cached)
+        ):
+            logger.warning(
+                f"Origin answered with '{response.status_code}', serving stale "
+                f"response: {request}"
+            )
+            self._recorder.incr("stale_if_error")
+            response.close()
+            setattr(cached, "from_cache", True)
+            return cached
+
+        # the stale response is replaced by the new one
+        cached.close()
+        if not self.controller.is_response_cacheable(
+            request=request, response=response
+        ):
+            # a cacheable response replaces the stale one, no need to delete it first
+            logger.debug(f"Cached response is stale, deleting: {request}")
+            self.cache.delete(request)
+        return self._cache_response(request=request, response=response)
+
+    def _background_revalidate(self, *, key: str, request: httpx.Request) -> None:
+        try:
+            # use a new copy of the cached response, the other one is being served
+            cached = self._cache_get(request)
+            if cached is None:
+                response = self._cache_response(
+                    request=request, response=self.transport.handle_request(request)
+                )
+            else:
+                response = self._revalidate(request=request, cached=cached)
+            # consume response so that it's cached
+            response.read()
+            response.close()
+        except Exception as error:
+            logger.warning(f"Background revalidation failed for {request}: {error}")
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(key)
+
+    def _schedule_revalidation(self, request: httpx.Request) -> None:
+        key = get_cache_key(request)
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                logger.debug(f"Revalidation already in progress for: {request}")
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_background_workers,
+                    thread_name_prefix="httpx-cache",
+                )
+        logger.debug(f"Serving stale response while revalidating: {request}")
+        self._executor.submit(self._background_revalidate, key=key, request=request)
+
     def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cache_key is not None:
+            set_cache_key(request, self.cache_key(request))
         # check if request is cacheable
         if self.controller.is_request_cacheable(request):
             logger.debug(f"Checking cache for: {request}")
-            cached_response = self.cache.get(request)
+            cached_response = self._cache_get(request)
             if cached_response is not None:
                 logger.debug(f"Found cached response for: {request}")
                 if self.controller.is_response_fresh(
                     request=request, response=cached_response
                 ):
+                    self._recorder.incr("hits")
+                    setattr(cached_response, "from_cache", True)
+                    return cached_response
+                if self.controller.allows_stale_while_revalidate(
+                    request=request, response=cached_response
+                ):
+                    self._schedule_revalidation(request)
+                    self._recorder.incr("stale_hits")
                     setattr(cached_response, "from_cache", True)
                     return cached_response
-                else:
-                    logger.debug(f"Cached response is stale, deleting: {request}")
-                    self.cache.delete(request)
             logger.debug("No valid cached response found in cache...")
+            self._recorder.incr("misses")
+            return self._coalesced_fetch(request=request, cached=cached_response)
 
-        # Request is not in cache, call original transport
+        # Request is not cacheable, call original transport
         response = self.transport.handle_request(request)
+        return self._cache_response(request=request, response=response)
 
+    def _fetch(
+        self, *, request: httpx.Request, cached: tp.Optional[httpx.Response]
+    ) -> httpx.Response:
+        if cached is not None:
+            return self._revalidate(request=request, cached=cached)
+        response = self.transport.handle_request(request)
+        return self._cache_response(request=request, response=response)
+
+    def _coalesced_fetch(
+        self, *, request: httpx.Request, cached: tp.Optional[httpx.Response]
+    ) -> httpx.Response:
+        key = get_cache_key(request)
+        in_flight = self._in_flight.acquire(key)
+        if in_flight is None:
+            try:
+                response = self._fetch(request=request, cached=cached)
+            except BaseException:
+                self._in_flight.release(key)
+                raise
+            return _release_when_cached(
+                response, functools.partial(self._in_flight.release, key)
+            )
+
+        if cached is not None:
+            # the stale response is read again from the cache once the request ends
+            cached.close()
+        logger.debug(f"Waiting for in-flight request to the origin: {request}")
+        in_flight.wait(self.coalescing_timeout)
+        cached = self._cache_get(request)
+        if cached is not None and self.controller.is_response_fresh(
+            request=request, response=cached
+        ):
+            logger.debug(f"Found cached response from in-flight request: {request}")
+            setattr(cached, "from_cache", True)
+            return cached
+        return self._fetch(request=request, cached=cached)
+
+    def _cache_response(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> httpx.Response:
         if self.controller.is_response_cacheable(request=request, response=response):
             if hasattr(response, "_content"):
                 logger.debug(f"Caching response for: {request}")
-                self.cache.set(request=request, response=response)
+                self._cache_set(request=request, response=response)
             else:
-                # Wrap the response with cache callback:
-                def _callback(content: bytes) -> None:
-                    logger.debug(f"Caching response for: {request}")
-                    self.cache.set(request=request, response=response, content=content)
-
+                # Wrap the response stream with a cache writer:
                 response.stream = ByteStreamWrapper(
-                    stream=response.stream, callback=_callback  # type: ignore
+                    stream=response.stream,  # type: ignore
+                    callback=self._cache_commit,
+                    writer=self.cache.open_writer(request=request, response=response),
                 )
+        else:
+            self._recorder.incr("uncacheable")
         setattr(response, "from_cache", False)
         return response
 
@@ -84,6 +426,14 @@ class CacheControlTransport(httpx.BaseTransport):
 class AsyncCacheControlTransport(httpx.AsyncBaseTransport):
     """Async CacheControl transport for httpx_cache.
 
+    Stale responses that allow it ('stale-while-revalidate') are served directly
+    while they are revalidated in a background task, background tasks are only
+    available when the transport (or client) is used as an async context manager,
+    otherwise stale responses are revalidated before being returned.
+
+    Concurrent cache misses for the same url are coalesced: only the first one is
+    sent to the origin, the others wait for its response to be cached.
+
     Args:
         transport (optional): an existing httpx async-transport, if no transport
             is given, defaults to an httpx.AsyncHTTPTransport with default args.
@@ -92,8 +442,20 @@ class AsyncCacheControlTransport(httpx.AsyncBaseTransport):
         cacheable_methods: methods that are allowed to be cached, defaults to ['GET']
         cacheable_status_codes: status codes that are allowed to be cached,
             defaults to: (200, 203, 300, 301, 308)
+        always_cache: cache responses even with a 'no-store' directive, defaults
+            to False
+        shared: whether the cache is shared between users, see
+            httpx_cache.CacheControl, defaults to False (private cache)
+        cache_key (optional): function computing the cache key of a request (e.g.
+            an httpx_cache.CacheKey), defaults to the request url
+        metrics (optional): hook receiving the cache metrics (hits, misses,
+            latencies...), defaults to an httpx_cache.CacheStats, available as
+            'transport.metrics'
     """
 
+    # max time (in seconds) to wait for an in-flight request to the same url
+    coalescing_timeout = 60.0
+
     def __init__(
         self,
         *,
@@ -102,52 +464,274 @@ class AsyncCacheControlTransport(httpx.AsyncBaseTransport):
         cacheable_methods: tp.Tuple[str, ...] = ("GET",),
         cacheable_status_codes: tp.Tuple[int, ...] = (200, 203, 300, 301, 308),
         always_cache: bool = False,
+        shared: bool = False,
+        cache_key: tp.Optional[CacheKeyFunc] = None,
+        metrics: tp.Optional[CacheMetrics] = None,
     ):
         self.controller = CacheControl(
             cacheable_methods=cacheable_methods,
             cacheable_status_codes=cacheable_status_codes,
             always_cache=always_cache,
+            shared=shared,
         )
         self.transport = transport or httpx.AsyncHTTPTransport()
         self.cache = cache or DictCache()
+        self.cache_key = cache_key
+        self.metrics = metrics or CacheStats()
+        self._recorder = _MetricsRecorder(self.metrics, self.cache)
+
+        # running background revalidations (done event -> task), only when the
+        # transport is used as an async context manager
+        self._background: tp.Optional[tp.Dict[anyio.Event, tp.Any]] = None
+        self._refreshing: tp.Set[str] = set()
+        self._in_flight = _AsyncInFlight()
+
+    async def __aenter__(self) -> "AsyncCacheControlTransport":
+        self._background = {}
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: tp.Optional[tp.Type[BaseException]] = None,
+        exc_value: tp.Optional[BaseException] = None,
+        traceback: tp.Optional[TracebackType] = None,
+    ) -> None:
+        if self._background is not None:
+            # wait for background revalidations before closing cache/transport
+            background, self._background = self._background, None
+            for done in list(background):
+                await done.wait()
+        await self.aclose()
+
+    async def _cache_get(self, request: httpx.Request) -> tp.Optional[httpx.Response]:
+        started = time.perf_counter()
+        cached = await self.cache.aget(request)
+        self._recorder.get_done(started)
+        return cached
+
+    async def _cache_set(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> None:
+        started = time.perf_counter()
+        await self.cache.aset(request=request, response=response)
+        self._recorder.set_done(started, len(response.content))
+
+    async def _cache_commit(self, writer: CacheWriter) -> None:
+        logger.debug(f"Caching response for: {writer.request}")
+        started = time.perf_counter()
+        await writer.acommit()
+        self._recorder.set_done(started, writer.size)
 
     async def aclose(self) -> None:
         await self.cache.aclose()
         await self.transport.aclose()
 
+    async def _handle_not_modified(
+        self,
+        *,
+        request: httpx.Request,
+        cached: httpx.Response,
+        response: httpx.Response,
+    ) -> httpx.Response:
+        logger.debug(f"Cached response is still valid, refreshing it: {request}")
+        await response.aread()
+        await response.aclose()
+        cached = merge_not_modified_response(cached=cached, response=response)
+        if hasattr(cached, "_content"):
+            await self._cache_set(request=request, response=cached)
+        else:
+            # cache the raw content, written while it's read (and decoded)
+            cached.stream = ByteStreamWrapper(
+                stream=cached.stream,  # type: ignore
+                callback=self._cache_commit,
+                writer=self.cache.open_writer(request=request, response=cached),
+            )
+            await cached.aread()
+        setattr(cached, "from_cache", True)
+        return cached
+
+    async def _revalidate(
+        self, *, request: httpx.Request, cached: httpx.Response
+    ) -> httpx.Response:
+        revalidation_request = self.controller.build_revalidation_request(
+            request=request, response=cached
+        )
+        logger.debug(f"Cached response is stale, revalidating: {request}")
+        if revalidation_request is not None:
+            self._recorder.incr("revalidations")
+        try:
+            response = await self.transport.handle_async_request(
+                revalidation_request or request
+            )
+        except Exception as error:
+            if not isinstance(error, httpx.TransportError) or (
+                not self.controller.allows_stale_if_error(
+                    request=request, response=cached
+                )
+            ):
+                # the stale response is not served, release its stream (e.g. file)
+                await cached.aclose()
+                raise
+            logger.warning(f"Origin failed, serving stale response: {request}")
+            self._recorder.incr("stale_if_error")
+            setattr(cached, "from_cache", True)
+            return cached
+
+        if response.status_code == 304 and revalidation_request is not None:
+            return await self._handle_not_modified(
+                request=request, cached=cached, response=response
+            )
+        if response.status_code in _SERVER_ERROR_STATUSES and (
+            self.controller.allows_stale_if_error(request=request, response=cached)
+        ):
+            logger.warning(
+                f"Origin answered with '{response.status_code}', serving stale "
+                f"response: {request}"
+            )
+            self._recorder.incr("stale_if_error")
+            await response.aclose()
+            setattr(cached, "from_cache", True)
+            return cached
+
+        # the stale response is replaced by the new one
+        await cached.aclose()
+        if not self.controller.is_response_cacheable(
+            request=request, response=response
+        ):
+            # a cacheable response replaces the stale one, no need to delete it first
+            logger.debug(f"Cached response is stale, deleting: {request}")
+            await self.cache.adelete(request)
+        return await self._cache_response(request=request, response=response)
+
+    async def _background_revalidate(self, key: str, request: httpx.Request) -> None:
+        try:
+            # use a new copy of the cached response, the other one is being served
+            cached = await self._cache_get(request)
+            if cached is None:
+                response = await self._cache_response(
+                    request=request,
+                    response=await self.transport.handle_async_request(request),
+                )
+            else:
+                response = await self._revalidate(request=request, cached=cached)
+            # consume response so that it's cached
+            await response.aread()
+            await response.aclose()
+        except Exception as error:
+            logger.warning(f"Background revalidation failed for {request}: {error}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def _run_in_background(
+        self,
+        background: tp.Dict[anyio.Event, tp.Any],
+        done: anyio.Event,
+        key: str,
+        request: httpx.Request,
+    ) -> None:
+        try:
+            await self._background_revalidate(key, request)
+        finally:
+            background.pop(done, None)
+            done.set()
+
     async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cache_key is not None:
+            set_cache_key(request, self.cache_key(request))
         # check if request is cacheable
         if self.controller.is_request_cacheable(request):
             logger.debug(f"Checking cache for: {request}")
-            cached_response = await self.cache.aget(request)
+            cached_response = await self._cache_get(request)
             if cached_response is not None:
                 logger.debug(f"Found cached response for: {request}")
                 if self.controller.is_response_fresh(
                     request=request, response=cached_response
                 ):
+                    self._recorder.incr("hits")
+                    setattr(cached_response, "from_cache", True)
+                    return cached_response
+                if self._background is not None and (
+                    self.controller.allows_stale_while_revalidate(
+                        request=request, response=cached_response
+                    )
+                ):
+                    key = get_cache_key(request)
+                    if key not in self._refreshing:
+                        logger.debug(
+                            f"Serving stale response while revalidating: {request}"
+                        )
+                        self._refreshing.add(key)
+                        done = anyio.Event()
+                        self._background[done] = _spawn_system_task(
+                            self._run_in_background,
+                            self._background,
+                            done,
+                            key,
+                            request,
+                        )
+                    self._recorder.incr("stale_hits")
                     setattr(cached_response, "from_cache", True)
                     return cached_response
-                else:
-                    logger.debug(f"Cached response is stale, deleting: {request}")
-                    await self.cache.adelete(request)
+            self._recorder.incr("misses")
+            return await self._coalesced_fetch(request=request, cached=cached_response)
 
-        # Request is not in cache, call original transport
+        # Request is not cacheable, call original transport
         response = await self.transport.handle_async_request(request)
+        return await self._cache_response(request=request, response=response)
 
+    async def _fetch(
+        self, *, request: httpx.Request, cached: tp.Optional[httpx.Response]
+    ) -> httpx.Response:
+        if cached is not None:
+            return await self._revalidate(request=request, cached=cached)
+        response = await self.transport.handle_async_request(request)
+        return await self._cache_response(request=request, response=response)
+
+    async def _coalesced_fetch(
+        self, *, request: httpx.Request, cached: tp.Optional[httpx.Response]
+    ) -> httpx.Response:
+        key = get_cache_key(request)
+        in_flight = self._in_flight.acquire(key)
+        if in_flight is None:
+            try:
+                response = await self._fetch(request=request, cached=cached)
+            except BaseException:
+                self._in_flight.release(key)
+                raise
+            return _release_when_cached(
+                response, functools.partial(self._in_flight.release, key)
+            )
+
+        if cached is not None:
+            # the stale response is read again from the cache once the request ends
+            await cached.aclose()
+        logger.debug(f"Waiting for in-flight request to the origin: {request}")
+        with anyio.move_on_after(self.coalescing_timeout):
+            await in_flight.wait()
+        cached = await self._cache_get(request)
+        if cached is not None and self.controller.is_response_fresh(
+            request=request, response=cached
+        ):
+            logger.debug(f"Found cached response from in-flight request: {request}")
+            setattr(cached, "from_cache", True)
+            return cached
+        return await self._fetch(request=request, cached=cached)
+
+    async def _cache_response(
+        self, *, request: httpx.Request, response: httpx.Response
+    ) -> httpx.Response:
         if self.controller.is_response_cacheable(request=request, response=response):
             if hasattr(response, "_content"):
                 logger.debug(f"Caching response for: {request}")
-                await self.cache.aset(request=request, response=response)
+                await self._cache_set(request=request, response=response)
             else:
-                # Wrap the response with cache callback:
-                async def _callback(content: bytes) -> None:
-                    logger.debug(f"Caching response for: {request}")
-                    await self.cache.aset(
-                        request=request, response=response, content=content
-                    )
-
+                # Wrap the response stream with a cache writer:
                 response.stream = ByteStreamWrapper(
-                    stream=response.stream, callback=_callback  # type: ignore
+                    stream=response.stream,  # type: ignore
+                    callback=self._cache_commit,
+                    writer=self.cache.open_writer(request=request, response=response),
                 )
+        else:
+            self._recorder.incr("uncacheable")
         setattr(response, "from_cache", False)
         return response
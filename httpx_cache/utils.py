@@ -1,32 +1,107 @@
 import hashlib
 import logging
+import mmap
+import time
 import typing as tp
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from email.utils import parsedate_to_datetime
 from pathlib import Path
 
 import attr
 import httpx
 
+if tp.TYPE_CHECKING:  # pragma: no cover
+    from httpx_cache.cache.base import CacheWriter
+
 logger = logging.getLogger(__name__)
 
 
-def get_cache_key(request: httpx.Request) -> str:
+# key of the custom cache key in the request extensions
+_CACHE_KEY_EXTENSION = "httpx_cache.key"
+
+
+def get_vary_headers(headers: httpx.Headers) -> tp.Tuple[str, ...]:
+    """Get the (lowercased and sorted) header names listed in the 'Vary' header.
+
+    Args:
+        headers: httpx.Headers of a response
+
+    Returns:
+        tuple of header names, empty if the response has no 'Vary' header.
+    """
+    names = {
+        name.strip().lower()
+        for name in headers.get_list("vary", split_commas=True)
+        if name.strip()
+    }
+    return tuple(sorted(names))
+
+
+def get_cache_key(
+    request: httpx.Request, vary: tp.Optional[tp.Sequence[str]] = None
+) -> str:
     """Get the cache key from a request.
 
-    The cache key is the str request url.
+    The cache key is the str request url, or the key set with 'set_cache_key'
+    (primary key). When the cached response varies on some request headers, a
+    digest of the request values of these headers is appended to it (secondary
+    key).
 
     Args:
         request: httpx.Request
+        vary: optional header names the response varies on (see get_vary_headers)
 
     Returns:
-        str: httpx.Request.url
+        str: httpx.Request.url (or the custom key), with the optional vary digest
     """
-    return str(request.url)
+    key = request.extensions.get(_CACHE_KEY_EXTENSION) or str(request.url)
+    if not vary:
+        return key
+    values = []
+    for name in vary:
+        if name in request.headers:
+            values.append(f"{name}:{', '.join(request.headers.get_list(name))}")
+        else:
+            values.append(f"{name}\x00")
+    digest = hashlib.sha224("\n".join(values).encode()).hexdigest()
+    return f"{key}#vary={digest}"
+
+
+def set_cache_key(request: httpx.Request, key: str) -> None:
+    """Set a custom (primary) cache key on a request, used by all caches.
+
+    Args:
+        request: httpx.Request
+        key: the cache key, replaces the request url
+    """
+    extensions = tp.cast(tp.Dict[str, tp.Any], request.extensions)
+    extensions[_CACHE_KEY_EXTENSION] = key
+
+
+def get_sharded_filepath(cache_dir: Path, filename: str, shards: int = 0) -> Path:
+    """Get the path of a cache file in a sharded cache_dir.
+
+    Each shard level is a sub-directory named after the next 2 characters of the
+    filename, e.g. with 2 levels: 'cache_dir/ab/cd/abcdef...'.
+
+    Args:
+        cache_dir: pathlib.Path, path to the cache_dir
+        filename: name of the cache file (hex digest)
+        shards: number of sub-directory levels, 0 for a flat cache_dir
+
+    Returns:
+        pathlib.Path of the cache filepath
+    """
+    parts = [filename[2 * i : 2 * i + 2] for i in range(shards)]
+    return cache_dir.joinpath(*parts, filename)
 
 
 def get_cache_filepath(
-    cache_dir: Path, request: httpx.Request, extra: str = ""
+    cache_dir: Path,
+    request: httpx.Request,
+    extra: str = "",
+    key: tp.Optional[str] = None,
+    shards: int = 0,
 ) -> Path:
     """Get the cache filepath from a request.
 
@@ -34,13 +109,15 @@ def get_cache_filepath(
         cache_dir: pathlib.Path, path to the cache_dir
         request: httpx.Request
         extra: an extra string to add to filename before encoding it.
+        key: optional cache key to use instead of the request cache key
+        shards: number of sub-directory levels (see get_sharded_filepath)
 
     Returns:
         pathlib.Path of the cache filepath
     """
-    buffer = (get_cache_key(request) + extra).encode()
+    buffer = ((key or get_cache_key(request)) + extra).encode()
     filename = hashlib.sha224(buffer).hexdigest()
-    return cache_dir / filename
+    return get_sharded_filepath(cache_dir, filename, shards=shards)
 
 
 def parse_headers_date(headers_date: tp.Optional[str]) -> tp.Optional[datetime]:
@@ -91,38 +168,516 @@ def parse_cache_control_headers(
     return cache_control
 
 
+def get_response_expires(headers: httpx.Headers) -> tp.Optional[datetime]:
+    """Get the date when a response stops being fresh from its headers.
+
+    Uses the response cache-control 'max-age' directive (counted from the 'Date'
+    header, or from now if missing) or the 'Expires' header.
+
+    Args:
+        headers: httpx.Headers of a response
+
+    Returns:
+        Optional[datetime], None if the response has no explicit expiration
+    """
+    max_age = parse_cache_control_headers(headers).get("max-age")
+    if isinstance(max_age, int):
+        date = parse_headers_date(headers.get("date"))
+        if date is None:
+            date = datetime.now(tz=timezone.utc)
+        return date + timedelta(seconds=max_age)
+    return parse_headers_date(headers.get("expires"))
+
+
+# key of the memoized cache-control data in the request/response extensions
+_CACHE_CONTROL_EXTENSION = "httpx_cache.cache_control"
+_METADATA_EXTENSION = "httpx_cache.metadata"
+
+
+def get_cache_control(
+    message: tp.Union[httpx.Request, httpx.Response]
+) -> tp.Dict[str, tp.Optional[int]]:
+    """Get the parsed cache-control directives of a request or response.
+
+    Directives are parsed once and memoized in the message extensions, until its
+    headers are replaced.
+
+    Args:
+        message: httpx.Request or httpx.Response
+
+    Returns:
+        parsed cache-control headers as dict.
+    """
+    if isinstance(message, httpx.Response):
+        return get_cache_metadata(message).directives
+    memoized = message.extensions.get(_CACHE_CONTROL_EXTENSION)
+    if memoized is not None and memoized[0] is message.headers:
+        return memoized[1]  # type: ignore
+    directives = parse_cache_control_headers(message.headers)
+    extensions = tp.cast(tp.Dict[str, tp.Any], message.extensions)
+    extensions[_CACHE_CONTROL_EXTENSION] = (message.headers, directives)
+    return directives
+
+
+# status codes that can be cached with a heuristic freshness lifetime (RFC 9110)
+_HEURISTICALLY_CACHEABLE_STATUSES = frozenset(
+    (200, 203, 204, 206, 300, 301, 308, 404, 405, 410, 414, 501)
+)
+# fraction of the time since 'Last-Modified' used as heuristic freshness lifetime
+_HEURISTIC_FRACTION = 0.1
+
+
+@attr.s(frozen=True)
+class CacheMetadata:
+    """Cache-control metadata of a response, computed from its headers.
+
+    It's computed once per response and stored with the cached response, so that
+    freshness checks of cache hits do not parse the headers again, and so that
+    caches can reject unusable responses without deserializing them.
+
+    The freshness lifetime and the age of the response follow RFC 9111 (sections
+    4.2.1 to 4.2.3), as seen by a private cache ('s-maxage' is left to the
+    controller).
+
+    Args:
+        directives: parsed response cache-control directives
+        date: response 'Date' as a timestamp, None if missing or invalid
+        lifetime: freshness lifetime in seconds, from the cache-control 'max-age'
+            directive, the 'Expires' header (0 if invalid) or a heuristic based on
+            the 'Last-Modified' header, None if the response has none
+        has_expires: whether the response has an 'Expires' header
+        status_code: response status code, None if unknown
+        etag: response 'ETag' validator, None if missing
+        last_modified: response 'Last-Modified' validator, None if missing
+        response_time: timestamp when the response was received
+        age: age of the response (in seconds) when it was received, from its
+            'Date' and 'Age' headers
+        heuristic: whether 'lifetime' is a heuristic freshness lifetime
+    """
+
+    directives: tp.Dict[str, tp.Optional[int]] = attr.ib(kw_only=True)
+    date: tp.Optional[float] = attr.ib(kw_only=True)
+    lifetime: tp.Optional[float] = attr.ib(kw_only=True)
+    has_expires: bool = attr.ib(default=False, kw_only=True)
+    status_code: tp.Optional[int] = attr.ib(default=None, kw_only=True)
+    etag: tp.Optional[str] = attr.ib(default=None, kw_only=True)
+    last_modified: tp.Optional[str] = attr.ib(default=None, kw_only=True)
+    response_time: float = attr.ib(factory=time.time, kw_only=True)
+    age: float = attr.ib(default=0.0, kw_only=True)
+    heuristic: bool = attr.ib(default=False, kw_only=True)
+
+    @property
+    def expires(self) -> tp.Optional[float]:
+        """Timestamp when the response stops being fresh, None if unknown."""
+        return self.get_expires(self.lifetime)
+
+    @property
+    def has_validators(self) -> bool:
+        """Whether the response can be revalidated with a conditional request."""
+        return self.etag is not None or self.last_modified is not None
+
+    def get_expires(self, lifetime: tp.Optional[float]) -> tp.Optional[float]:
+        """Timestamp when the response stops being fresh for a given lifetime."""
+        if lifetime is None:
+            return None
+        return self.response_time - self.age + lifetime
+
+    def get_current_age(self, now: tp.Optional[float] = None) -> float:
+        """Current age of the response in seconds (RFC 9111 section 4.2.3)."""
+        if now is None:
+            now = time.time()
+        return self.age + now - self.response_time
+
+    def get_usable_ttl(
+        self, now: tp.Optional[float] = None, shared: bool = False
+    ) -> tp.Optional[float]:
+        """Seconds until the response can no longer be used without revalidation.
+
+        Computed as the cache controller would: the freshness lifetime ('s-maxage'
+        first for shared caches) minus the current age, plus the
+        'stale-while-revalidate'/'stale-if-error' grace period (none under
+        'must-revalidate', or 'proxy-revalidate'/'s-maxage' for shared caches).
+
+        Args:
+            now: Optional timestamp of the current time, defaults to now
+            shared: whether the cache controller is a shared cache
+
+        Returns:
+            Optional[float], negative if the response is already unusable, None if
+            it has no explicit freshness lifetime
+        """
+        directives = self.directives
+        lifetime: tp.Optional[float] = None
+        if shared:
+            lifetime = directives.get("s-maxage")
+        if lifetime is None:
+            lifetime = None if self.heuristic else self.lifetime
+        if lifetime is None:
+            return None
+        grace = 0
+        must_revalidate = "must-revalidate" in directives or (
+            shared and ("proxy-revalidate" in directives or "s-maxage" in directives)
+        )
+        if not must_revalidate:
+            grace = max(
+                directives.get("stale-while-revalidate") or 0,
+                directives.get("stale-if-error") or 0,
+            )
+        return lifetime - self.get_current_age(now) + grace
+
+    @classmethod
+    def from_headers(
+        cls,
+        headers: httpx.Headers,
+        status_code: tp.Optional[int] = None,
+        response_time: tp.Optional[float] = None,
+    ) -> "CacheMetadata":
+        """Compute the cache metadata of a response from its headers.
+
+        Args:
+            headers: httpx.Headers of the response
+            status_code: Optional response status code, enables heuristic
+                freshness for the status codes that allow it
+            response_time: Optional timestamp when the response was received,
+                defaults to now
+        """
+        if response_time is None:
+            response_time = time.time()
+        directives = parse_cache_control_headers(headers)
+        response_date = parse_headers_date(headers.get("date"))
+        date = None if response_date is None else response_date.timestamp()
+        # without a 'Date', the response is dated when it's received
+        date_value = response_time if date is None else date
+        has_expires = "expires" in headers
+
+        heuristic = False
+        lifetime: tp.Optional[float] = None
+        last_modified = headers.get("last-modified")
+        max_age = directives.get("max-age")
+        if isinstance(max_age, int):
+            lifetime = max_age
+        elif has_expires:
+            expires = parse_headers_date(headers.get("expires"))
+            # invalid dates (e.g. "0") are in the past
+            lifetime = 0 if expires is None else expires.timestamp() - date_value
+        elif last_modified is not None and (
+            status_code in _HEURISTICALLY_CACHEABLE_STATUSES or "public" in directives
+        ):
+            modified = parse_headers_date(last_modified)
+            if modified is not None:
+                heuristic = True
+                lifetime = max(
+                    (date_value - modified.timestamp()) * _HEURISTIC_FRACTION, 0.0
+                )
+
+        age_value = headers.get("age", "")
+        age = max(response_time - date_value, 0.0)
+        if age_value.isdigit():
+            age = max(age, int(age_value))
+        return cls(
+            directives=directives,
+            date=date,
+            lifetime=lifetime,
+            has_expires=has_expires,
+            status_code=status_code,
+            etag=headers.get("etag"),
+            last_modified=last_modified,
+            response_time=response_time,
+            age=age,
+            heuristic=heuristic,
+        )
+
+    def to_state(self) -> tp.List[tp.Any]:
+        """Convert the metadata to a (compact) list of builtin types."""
+        return [
+            self.directives,
+            self.date,
+            self.lifetime,
+            self.has_expires,
+            self.status_code,
+            self.etag,
+            self.last_modified,
+            self.response_time,
+            self.age,
+            self.heuristic,
+        ]
+
+    @classmethod
+    def from_state(cls, state: tp.Sequence[tp.Any]) -> "CacheMetadata":
+        """Load the metadata from a list created with 'to_state'."""
+        (
+            directives,
+            date,
+            lifetime,
+            has_expires,
+            status_code,
+            etag,
+            last_modified,
+            response_time,
+            age,
+            heuristic,
+        ) = state
+        return cls(
+            directives=directives,
+            date=date,
+            lifetime=lifetime,
+            has_expires=has_expires,
+            status_code=status_code,
+            etag=etag,
+            last_modified=last_modified,
+            response_time=response_time,
+            age=age,
+            heuristic=heuristic,
+        )
+
+
+def get_cache_metadata(response: httpx.Response) -> CacheMetadata:
+    """Get the cache metadata of a response.
+
+    The metadata is computed once and memoized in the response extensions, until
+    its headers are replaced.
+
+    Args:
+        response: httpx.Response
+
+    Returns:
+        CacheMetadata
+    """
+    memoized = response.extensions.get(_METADATA_EXTENSION)
+    if memoized is not None and memoized[0] is response.headers:
+        return memoized[1]  # type: ignore
+    metadata = CacheMetadata.from_headers(
+        response.headers, status_code=response.status_code
+    )
+    set_cache_metadata(response, metadata)
+    return metadata
+
+
+def set_cache_metadata(response: httpx.Response, metadata: CacheMetadata) -> None:
+    """Attach (already computed) cache metadata to a response.
+
+    Args:
+        response: httpx.Response
+        metadata: CacheMetadata of the response headers
+    """
+    extensions = tp.cast(tp.Dict[str, tp.Any], response.extensions)
+    extensions[_METADATA_EXTENSION] = (response.headers, metadata)
+
+
+# headers describing the stored body, they must not be updated from a 304 response
+_NOT_MODIFIED_IGNORED_HEADERS = frozenset(
+    ("content-length", "content-encoding", "transfer-encoding", "content-range")
+)
+
+
+def merge_not_modified_response(
+    *, cached: httpx.Response, response: httpx.Response
+) -> httpx.Response:
+    """Refresh a stale cached response with the headers of a '304 Not Modified'.
+
+    Headers sent in the 304 response replace the cached ones (except the headers
+    describing the body), the cached body is kept as is.
+
+    Args:
+        cached: httpx.Response, the stale cached response
+        response: httpx.Response, the '304 Not Modified' response
+
+    Returns:
+        httpx.Response, the cached response with refreshed headers
+    """
+    updated = {
+        name.lower()
+        for name in response.headers.keys()
+        if name.lower() not in _NOT_MODIFIED_IGNORED_HEADERS
+    }
+    headers = [
+        (name, value)
+        for name, value in cached.headers.multi_items()
+        if name.lower() not in updated
+    ]
+    headers.extend(
+        (name, value)
+        for name, value in response.headers.multi_items()
+        if name.lower() in updated
+    )
+    cached.headers = httpx.Headers(headers)
+    return cached
+
+
+class ChunkedByteStream(httpx.ByteStream):
+    """In-memory stream over a list of chunks, so that they never get joined."""
+
+    def __init__(self, chunks: tp.Sequence[bytes]) -> None:
+        super().__init__(b"")
+        self.chunks = chunks
+
+    def __iter__(self) -> tp.Iterator[bytes]:
+        yield from self.chunks
+
+    async def __aiter__(self) -> tp.AsyncIterator[bytes]:
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FileByteStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Stream over the end of an open file, memory-mapped and read lazily.
+
+    The file is owned by the stream, it is closed when the stream is closed.
+
+    Args:
+        file: file opened in binary mode
+        offset: position of the first byte of the stream in the file
+        size: number of bytes of the stream
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, file: tp.BinaryIO, offset: int, size: int) -> None:
+        self.file = file
+        self.offset = offset
+        self.size = size
+        self._mmap: tp.Optional[mmap.mmap] = None
+
+    def _iter_chunks(self) -> tp.Iterator[bytes]:
+        if not self.size:
+            return
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        end = self.offset + self.size
+        for start in range(self.offset, end, self.chunk_size):
+            yield self._mmap[start : min(start + self.chunk_size, end)]
+
+    def __iter__(self) -> tp.Iterator[bytes]:
+        yield from self._iter_chunks()
+
+    async def __aiter__(self) -> tp.AsyncIterator[bytes]:
+        for chunk in self._iter_chunks():
+            yield chunk
+
+    def close(self) -> None:
+        """Unmap and close the file."""
+        if self._mmap is not None:
+            self._mmap.close()
+        self.file.close()
+
+    async def aclose(self) -> None:
+        """Unmap and close the file."""
+        self.close()
+
+
 @attr.s
 class ByteStreamWrapper(httpx.ByteStream):
-    """Wrapper around the stream object of an httpx.Response."""
+    """Wrapper around the stream object of an httpx.Response.
+
+    Chunks of the stream are buffered in memory (as a list, not joined) until the
+    stream is consumed, the callback is then called with the full content, or
+    with the list of chunks if 'chunked' is True.
+
+    With a 'writer', chunks are written to it as they arrive instead of being
+    buffered, the callback is then called with the writer (to commit it), and the
+    writer is aborted if the stream is closed before its end.
+    """
 
     stream: httpx.ByteStream = attr.ib(kw_only=True)
-    callback: tp.Callable[[bytes], tp.Any] = attr.ib(kw_only=True)
-    content: bytearray = attr.ib(factory=bytearray, init=False)
+    callback: tp.Callable[[tp.Any], tp.Any] = attr.ib(kw_only=True)
+    on_close: tp.Optional[tp.Callable[[], None]] = attr.ib(default=None, kw_only=True)
+    chunked: bool = attr.ib(default=False, kw_only=True)
+    writer: tp.Optional["CacheWriter"] = attr.ib(default=None, kw_only=True)
+    chunks: tp.List[bytes] = attr.ib(factory=list, init=False)
+    closed: bool = attr.ib(default=False, init=False)
+
+    @property
+    def content(self) -> bytes:
+        """Content of the stream consumed so far."""
+        return b"".join(self.chunks)
+
+    def _get_callback_content(self) -> tp.Any:
+        if self.writer is not None:
+            return self.writer
+        return self.chunks if self.chunked else self.content
+
+    def _on_close(self) -> None:
+        self.closed = True
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            on_close()
 
     def close(self) -> None:
-        """Close stream."""
-        self.stream.close()
+        """Close stream, and call the optional on_close hook."""
+        try:
+            self.stream.close()
+        finally:
+            try:
+                if self.writer is not None:
+                    # no-op when the stream was consumed (writer committed)
+                    self.writer.abort()
+            finally:
+                self._on_close()
 
     async def aclose(self) -> None:
-        """Close async stream."""
-        await self.stream.aclose()
+        """Close async stream, and call the optional on_close hook."""
+        try:
+            await self.stream.aclose()
+        finally:
+            try:
+                if self.writer is not None:
+                    await self.writer.aabort()
+            finally:
+                self._on_close()
 
     def __iter__(self) -> tp.Iterator[bytes]:
-        """Iterate over the stream object and store it's chunks in a content.
+        """Iterate over the stream object and store it's chunks.
 
         After the stream is completed call the callback with content as argument.
         """
         for chunk in self.stream:
-            self.content.extend(chunk)
+            if self.writer is not None:
+                self.writer.write(chunk)
+            else:
+                self.chunks.append(chunk)
             yield chunk
-        self.callback(bytes(self.content))
+        self.callback(self._get_callback_content())
 
     async def __aiter__(self) -> tp.AsyncIterator[bytes]:
-        """Iterate over the async stream object and store it's chunks in a content.
+        """Iterate over the async stream object and store it's chunks.
 
         After the stream is completed call the async callback with content as argument.
         """
         async for chunk in self.stream:
-            self.content.extend(chunk)
+            if self.writer is not None:
+                await self.writer.awrite(chunk)
+            else:
+                self.chunks.append(chunk)
             yield chunk
-        await self.callback(bytes(self.content))
+        await self.callback(self._get_callback_content())
+
+
+def is_content_encoded(headers: httpx.Headers) -> bool:
+    """Check if the content of a response is encoded (e.g. 'Content-Encoding: gzip')."""
+    encoding = headers.get("content-encoding", "").strip().lower()
+    return encoding not in ("", "identity")
+
+
+def get_raw_chunks(response: httpx.Response) -> tp.Optional[tp.List[bytes]]:
+    """Get the raw (not decoded) content chunks of a response, if still available.
+
+    httpx decodes the content of a response when reading it, the raw content is
+    only available when its stream keeps it in memory (e.g. ByteStream) or when
+    it was captured by a ByteStreamWrapper (without a writer).
+
+    Args:
+        response: httpx.Response
+
+    Returns:
+        Optional list of raw content chunks, None if not available
+    """
+    stream = response.stream
+    if isinstance(stream, ByteStreamWrapper):
+        if stream.writer is not None:
+            # chunks were handed to the writer, not kept
+            return None
+        # chunks captured so far, complete only when the content was read
+        return stream.chunks if hasattr(response, "_content") else None
+    if isinstance(stream, httpx.ByteStream):
+        return list(stream)
+    return None
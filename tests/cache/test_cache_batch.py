@@ -0,0 +1,113 @@
+import httpx
+import pytest
+
+import httpx_cache
+from httpx_cache.cache.redis import RedisCache
+
+pytestmark = pytest.mark.anyio
+
+
+def _items(count: int):
+    items = []
+    for index in range(count):
+        request = httpx.Request("GET", f"http://httpx-cache/{index}")
+        response = httpx.Response(200, content=f"response-{index}".encode())
+        items.append((request, response))
+    return items
+
+
+def test_cache_set_get_delete_many(cache: httpx_cache.BaseCache):
+    items = _items(3)
+    requests = [request for request, _ in items]
+    missing = httpx.Request("GET", "http://httpx-cache/missing")
+
+    assert cache.get_many([]) == []
+    assert cache.get_many(requests) == [None, None, None]
+
+    cache.set_many(items)
+    cached = cache.get_many(requests[:2] + [missing] + requests[2:])
+    assert [c.content if c else None for c in cached] == [
+        b"response-0",
+        b"response-1",
+        None,
+        b"response-2",
+    ]
+
+    cache.delete_many(requests[:2])
+    cached = cache.get_many(requests)
+    assert cached[0] is None and cached[1] is None
+    assert cached[2] is not None and cached[2].content == b"response-2"
+
+
+async def test_cache_aset_aget_adelete_many(cache: httpx_cache.BaseCache):
+    items = _items(3)
+    requests = [request for request, _ in items]
+
+    assert await cache.aget_many(requests) == [None, None, None]
+
+    await cache.aset_many(items)
+    cached = await cache.aget_many(requests)
+    assert [c.content for c in cached] == [b"response-0", b"response-1", b"response-2"]
+
+    await cache.adelete_many(requests)
+    assert await cache.aget_many(requests) == [None, None, None]
+
+
+def test_cache_get_many_vary(cache: httpx_cache.BaseCache):
+    response = httpx.Response(200, headers={"Vary": "Accept"}, content=b"json")
+    request = httpx.Request(
+        "GET", "http://httpx-cache", headers={"Accept": "application/json"}
+    )
+    other = httpx.Request("GET", "http://httpx-cache", headers={"Accept": "text/html"})
+    cache.set_many([(request, response)])
+
+    cached, not_cached = cache.get_many([request, other])
+    assert cached is not None and cached.content == b"json"
+    assert not_cached is None
+
+
+class _LoopCache(httpx_cache.DictCache):
+    # only keeps the default, looping, batch implementation of BaseCache
+    get_many = httpx_cache.BaseCache.get_many
+    aget_many = httpx_cache.BaseCache.aget_many
+    set_many = httpx_cache.BaseCache.set_many
+    aset_many = httpx_cache.BaseCache.aset_many
+    delete_many = httpx_cache.BaseCache.delete_many
+    adelete_many = httpx_cache.BaseCache.adelete_many
+
+
+async def test_base_cache_batch_fallback():
+    cache = _LoopCache()
+    items = _items(2)
+    requests = [request for request, _ in items]
+
+    cache.set_many(items)
+    assert [c.content for c in cache.get_many(requests)] == [
+        b"response-0",
+        b"response-1",
+    ]
+    cache.delete_many(requests)
+    assert cache.get_many(requests) == [None, None]
+
+    await cache.aset_many(items)
+    assert [c.content for c in await cache.aget_many(requests)] == [
+        b"response-0",
+        b"response-1",
+    ]
+    await cache.adelete_many(requests)
+    assert await cache.aget_many(requests) == [None, None]
+
+
+async def test_redis_cache_batch_round_trips(redis_cache: RedisCache):
+    items = _items(10)
+    requests = [request for request, _ in items]
+
+    redis_cache.set_many(items)
+    redis_cache.get_many(requests)
+    redis_cache.delete_many(requests)
+    assert redis_cache.redis.round_trips == 3
+
+    await redis_cache.aset_many(items)
+    await redis_cache.aget_many(requests)
+    await redis_cache.adelete_many(requests)
+    assert redis_cache.aredis.round_trips == 3
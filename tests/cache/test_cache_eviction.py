@@ -0,0 +1,143 @@
+import pytest
+
+import httpx_cache
+from httpx_cache.cache.eviction import CountMinSketch, get_eviction_policy
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("lru", httpx_cache.LRUPolicy),
+        ("LFU", httpx_cache.LFUPolicy),
+        ("tinylfu", httpx_cache.TinyLFUPolicy),
+    ],
+)
+def test_get_eviction_policy(name, expected):
+    assert isinstance(get_eviction_policy(name), expected)
+
+
+def test_get_eviction_policy_instance():
+    policy = httpx_cache.LFUPolicy()
+    assert get_eviction_policy(policy) is policy
+
+
+def test_get_eviction_policy_unknown():
+    with pytest.raises(ValueError):
+        get_eviction_policy("fifo")
+    with pytest.raises(TypeError):
+        get_eviction_policy(1)
+
+
+def test_lru_policy():
+    policy = httpx_cache.LRUPolicy()
+    assert policy.pop() is None
+    for key in "abc":
+        policy.add(key)
+    policy.touch("a")
+    policy.discard("b")
+    assert len(policy) == 2
+    assert "b" not in policy
+    assert policy.pop() == "c"
+    assert policy.pop() == "a"
+    assert policy.pop() is None
+
+
+def test_lfu_policy():
+    policy = httpx_cache.LFUPolicy()
+    assert policy.pop() is None
+    for key in "abcd":
+        policy.add(key)
+    policy.touch("a")
+    policy.touch("a")
+    policy.touch("b")
+    policy.touch("c")
+    # re-adding an existing key counts as an access
+    policy.add("d")
+    policy.touch("unknown")
+    assert len(policy) == 4
+    # b, c, d have the same frequency, b is the oldest one
+    assert policy.pop() == "b"
+    policy.discard("c")
+    assert policy.pop() == "d"
+    assert policy.pop() == "a"
+    assert policy.pop() is None
+    assert "a" not in policy
+
+
+def test_lfu_policy_discard_lowest_bucket():
+    policy = httpx_cache.LFUPolicy()
+    policy.add("a")
+    policy.add("b")
+    policy.touch("b")
+    policy.discard("a")
+    assert policy.pop() == "b"
+
+
+def test_lfu_policy_min_freq():
+    policy = httpx_cache.LFUPolicy()
+    assert policy._min_freq == 0
+    policy.add("a")
+    for _ in range(3):
+        policy.touch("a")
+    # bumped when its bucket empties
+    assert policy._min_freq == 4
+    policy.add("b")
+    # reset on insert
+    assert policy._min_freq == 1
+    policy.touch("b")
+    policy.touch("b")
+    policy.add("c")
+    policy.discard("c")
+    # next lowest bucket once the lowest one is emptied
+    assert policy._min_freq == 3
+    assert policy.pop() == "b"
+    assert policy._min_freq == 4
+    assert policy.pop() == "a"
+    assert policy._min_freq == 0
+    assert policy._buckets == {}
+
+
+def test_count_min_sketch():
+    sketch = CountMinSketch(capacity=16)
+    assert sketch.estimate("a") == 0
+    for _ in range(20):
+        sketch.increment("a")
+    # counters are saturated
+    assert sketch.estimate("a") == CountMinSketch.max_count
+    for i in range(200):
+        sketch.increment(str(i))
+    # counters are halved on reset
+    assert sketch.estimate("a") < CountMinSketch.max_count
+
+
+def test_tinylfu_policy_keeps_frequent_keys():
+    policy = httpx_cache.TinyLFUPolicy(capacity=100)
+    assert policy.pop() is None
+    policy.add("hot")
+    for _ in range(5):
+        policy.touch("hot")
+    for i in range(50):
+        policy.add(f"cold-{i}")
+    assert "hot" in policy
+    assert len(policy) == 51
+
+    evicted = [policy.pop() for _ in range(50)]
+    assert "hot" not in evicted
+    assert len(policy) == 1
+    assert policy.pop() == "hot"
+    assert policy.pop() is None
+
+
+def test_tinylfu_policy_touch_and_discard():
+    policy = httpx_cache.TinyLFUPolicy(capacity=100)
+    for key in "abcde":
+        policy.add(key)
+    # touching keys from probation promotes them to the protected region
+    for key in "abcd":
+        policy.touch(key)
+        policy.touch(key)
+    policy.add("a")
+    policy.discard("b")
+    policy.discard("e")
+    assert len(policy) == 3
+    assert sorted(policy.pop() for _ in range(3)) == ["a", "c", "d"]
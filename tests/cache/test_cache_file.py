@@ -1,3 +1,6 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import httpx
@@ -5,6 +8,8 @@ import mock
 import pytest
 
 import httpx_cache
+from httpx_cache.cache.file import FILE_MAGIC
+from httpx_cache.utils import FileByteStream
 
 pytestmark = pytest.mark.anyio
 
@@ -213,3 +218,271 @@ async def test_file_cache_aset_aget_adelete_with_async_streaming_body(
     assert len(list(file_cache.cache_dir.glob("**/*"))) == 0
 
     await file_cache.aclose()
+
+
+def test_file_cache_lazy_content(tmp_path: Path, httpx_request: httpx.Request):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=16)
+    content = b"0123456789" * 10_000
+    response = httpx.Response(200, content=content)
+    cache.set(request=httpx_request, response=response)
+
+    (filepath,) = tmp_path.iterdir()
+    data = filepath.read_bytes()
+    assert data.startswith(FILE_MAGIC)
+    # content is stored raw at the end of the file
+    assert data.endswith(content)
+
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    assert isinstance(cached.stream, FileByteStream)
+    with pytest.raises(httpx.ResponseNotRead):
+        cached.content
+    assert cached.headers == response.headers
+    assert cached.read() == content
+    assert cached.stream.file.closed
+
+
+async def test_file_cache_alazy_content(tmp_path: Path, httpx_request: httpx.Request):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=16)
+    content = b"0123456789" * 10_000
+    await cache.aset(
+        request=httpx_request, response=httpx.Response(200, content=content)
+    )
+
+    cached = await cache.aget(httpx_request)
+    assert cached is not None
+    assert isinstance(cached.stream, FileByteStream)
+    assert await cached.aread() == content
+
+
+def test_file_cache_lazy_content_survives_overwrite(
+    tmp_path: Path, httpx_request: httpx.Request
+):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=0)
+    cache.set(request=httpx_request, response=httpx.Response(200, content=b"old"))
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    cache.set(request=httpx_request, response=httpx.Response(200, content=b"new!"))
+    # the file is replaced, not rewritten in place
+    assert cached.read() == b"old"
+
+
+def test_file_cache_writer(tmp_path: Path, httpx_request: httpx.Request):
+    cache = httpx_cache.FileCache(
+        cache_dir=tmp_path, mmap_threshold=0, max_size=10**6
+    )
+    response = httpx.Response(
+        200, stream=httpx_cache.utils.ChunkedByteStream([]), headers={"a": "b"}
+    )
+    writer = cache.open_writer(request=httpx_request, response=response)
+    with mock.patch.object(writer, "flush_size", 4):
+        writer.write(b"Hello, ")
+        (tmp_file,) = tmp_path.iterdir()
+        assert tmp_file.suffix == ".tmp"
+        assert tmp_file.read_bytes().endswith(b"Hello, ")
+        writer.write(b"world!")
+    assert cache.get(httpx_request) is None
+    writer.commit()
+    writer.abort()
+
+    (filepath,) = tmp_path.iterdir()
+    assert cache.total_bytes == filepath.stat().st_size
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    assert isinstance(cached.stream, FileByteStream)
+    assert cached.headers == response.headers
+    assert cached.read() == b"Hello, world!"
+
+    writer = cache.open_writer(request=httpx_request, response=response)
+    writer.write(b"partial")
+    writer.abort()
+    assert list(tmp_path.iterdir()) == [filepath]
+
+
+def test_file_cache_get_single_blob_file(tmp_path: Path, httpx_request: httpx.Request):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path)
+    response = httpx.Response(200, content=b"Hello, world!")
+    # file written as a single msgpack blob (previous file format)
+    cache._get_filepath(httpx_request, str(httpx_request.url)).write_bytes(
+        cache.serializer.dumps(response=response)
+    )
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    assert cached.content == b"Hello, world!"
+
+
+def test_file_cache_not_local_cache_dir(tmp_path: Path, httpx_request: httpx.Request):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=0)
+    # e.g. a universal_pathlib path to a remote filesystem
+    cache._is_local = False
+    cache.set(request=httpx_request, response=httpx.Response(200, content=b"data"))
+    assert len(list(tmp_path.iterdir())) == 1
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    assert cached.content == b"data"
+
+
+def test_file_cache_bad_shards(tmp_path: Path):
+    with pytest.raises(ValueError):
+        httpx_cache.FileCache(cache_dir=tmp_path, shards=-1)
+    with pytest.raises(ValueError):
+        httpx_cache.FileCache(cache_dir=tmp_path, shards=29)
+
+
+def test_file_cache_sharded(tmp_path: Path, httpx_request: httpx.Request):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, shards=2)
+    cache.set(request=httpx_request, response=httpx.Response(200, content=b"data"))
+
+    (filepath,) = [path for path in tmp_path.rglob("*") if path.is_file()]
+    name = filepath.name
+    assert filepath == tmp_path / name[:2] / name[2:4] / name
+
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    assert cached.content == b"data"
+    cache.delete(httpx_request)
+    assert cache.get(httpx_request) is None
+
+
+def test_file_cache_migrate(tmp_path: Path, httpx_request: httpx.Request):
+    flat_cache = httpx_cache.FileCache(cache_dir=tmp_path)
+    flat_cache.set(request=httpx_request, response=httpx.Response(200, content=b"a"))
+    (tmp_path / "leftover.tmp").write_bytes(b"")
+
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, shards=2)
+    assert cache.get(httpx_request) is None
+    assert cache.migrate() == 1
+    assert cache.migrate() == 0
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    assert cached.content == b"a"
+    # temporary files are left as is
+    assert (tmp_path / "leftover.tmp").is_file()
+
+    # back to a flat layout, empty shard directories are removed
+    assert flat_cache.migrate() == 1
+    assert sorted(path.is_file() for path in tmp_path.iterdir()) == [True, True]
+    assert flat_cache.get(httpx_request) is not None
+
+
+def test_file_cache_bad_lock_stripes(tmp_path: Path):
+    with pytest.raises(ValueError):
+        httpx_cache.FileCache(cache_dir=tmp_path, lock_stripes=0)
+
+
+def test_file_cache_lock_striping(tmp_path: Path):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, lock_stripes=4096)
+    assert len(cache.locks) == 4096
+    request = httpx.Request("GET", "http://striped-1")
+    other = httpx.Request("GET", "http://striped-2")
+    cache.set(request=request, response=httpx.Response(200, content=b"1"))
+
+    def write_other():
+        cache.set(request=other, response=httpx.Response(200, content=b"2"))
+
+    # holding the lock of a cache file does not block writes of other files
+    with cache._locked(cache._get_filepath(request, str(request.url)), True):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(write_other).result(timeout=5)
+    cached = cache.get(other)
+    assert cached is not None
+    assert cached.content == b"2"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs fcntl")
+async def test_file_cache_process_locks(tmp_path: Path, httpx_request: httpx.Request):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, process_locks=True)
+    await cache.aset(request=httpx_request, response=httpx.Response(200, content=b"a"))
+    cached = await cache.aget(httpx_request)
+    assert cached is not None
+    assert cached.content == b"a"
+    await cache.adelete(httpx_request)
+    assert await cache.aget(httpx_request) is None
+    assert (tmp_path / ".locks").is_dir()
+
+
+def test_file_cache_process_locks_without_fcntl(tmp_path: Path):
+    with mock.patch("httpx_cache.cache.file.fcntl", None):
+        with pytest.raises(ValueError):
+            httpx_cache.FileCache(cache_dir=tmp_path, process_locks=True)
+
+
+def _cache_files(cache_dir: Path):
+    return [path for path in cache_dir.rglob("*") if path.is_file()]
+
+
+def test_file_cache_bad_gc_args(tmp_path: Path):
+    with pytest.raises(ValueError):
+        httpx_cache.FileCache(cache_dir=tmp_path, max_size=0)
+    with pytest.raises(ValueError):
+        httpx_cache.FileCache(cache_dir=tmp_path, gc_mode="never")
+
+
+def test_file_cache_max_size_inline_gc(tmp_path: Path):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, max_size=5000)
+    requests = [httpx.Request("GET", f"http://test-gc/{i}") for i in range(10)]
+    for request in requests[:4]:
+        cache.set(request=request, response=httpx.Response(200, content=b"x" * 1000))
+    assert cache.evictions == 0
+    # first request is the most recently used one
+    assert cache.get(requests[0]) is not None
+
+    cache.set(request=requests[4], response=httpx.Response(200, content=b"x" * 1000))
+    assert cache.total_bytes <= 5000 * cache.gc_low_watermark
+    assert cache.evictions > 0
+    assert cache.get(requests[0]) is not None
+    assert cache.get(requests[1]) is None
+    assert cache.get(requests[4]) is not None
+    assert sum(path.stat().st_size for path in _cache_files(tmp_path)) == (
+        cache.total_bytes
+    )
+
+
+def test_file_cache_gc_existing_cache_dir(tmp_path: Path):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path)
+    for i in range(5):
+        request = httpx.Request("GET", f"http://test-gc/{i}")
+        cache.set(request=request, response=httpx.Response(200, content=b"x" * 1000))
+
+    bounded = httpx_cache.FileCache(cache_dir=tmp_path, max_size=2500, gc_mode="manual")
+    # files already in the cache_dir are indexed on the first collection
+    assert bounded.gc() == 3
+    assert len(_cache_files(tmp_path)) == 2
+    assert bounded.gc() == 0
+
+    request = httpx.Request("GET", "http://test-gc/4")
+    bounded.delete(request)
+    assert len(_cache_files(tmp_path)) == 1
+    assert bounded.total_bytes == sum(bounded.sizes.values())
+
+
+async def test_file_cache_agc(tmp_path: Path):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, max_size=1500, gc_mode="manual")
+    for i in range(3):
+        request = httpx.Request("GET", f"http://test-gc/{i}")
+        await cache.aset(
+            request=request, response=httpx.Response(200, content=b"x" * 1000)
+        )
+    # nothing is removed until the garbage collection runs
+    assert len(_cache_files(tmp_path)) == 3
+    assert await cache.agc() == 2
+    assert len(_cache_files(tmp_path)) == 1
+    await cache.aclose()
+
+
+def test_file_cache_gc_thread(tmp_path: Path):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path, max_size=1500, gc_mode="thread")
+    for i in range(3):
+        request = httpx.Request("GET", f"http://test-gc/{i}")
+        cache.set(request=request, response=httpx.Response(200, content=b"x" * 1000))
+    deadline = time.monotonic() + 5
+    while len(_cache_files(tmp_path)) > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(_cache_files(tmp_path)) == 1
+    cache.close()
+    assert cache._gc_thread is None
+
+
+def test_file_cache_gc_unbounded(tmp_path: Path):
+    cache = httpx_cache.FileCache(cache_dir=tmp_path)
+    assert cache.gc() == 0
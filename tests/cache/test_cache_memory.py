@@ -164,3 +164,70 @@ async def test_dict_cache_aset_aget_adelete_with_async_streaming_body(
     assert len(dict_cache.data) == 0
 
     await dict_cache.aclose()
+
+
+@pytest.mark.parametrize("kwargs", [{"max_entries": 0}, {"max_bytes": -1}])
+def test_dict_cache_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        httpx_cache.DictCache(**kwargs)
+
+
+def test_dict_cache_init_data_over_limits():
+    cache = httpx_cache.DictCache(data={"a": b"1", "b": b"2", "c": b"3"}, max_entries=2)
+    assert list(cache.data) == ["b", "c"]
+    assert cache.total_bytes == 2
+    assert cache.evictions == 1
+
+
+@pytest.mark.parametrize("policy", ["lru", "lfu", "tinylfu"])
+def test_dict_cache_max_entries(policy: str):
+    cache = httpx_cache.DictCache(max_entries=3, policy=policy)
+    requests = [httpx.Request("GET", f"http://httpx-cache/{i}") for i in range(10)]
+    for request in requests:
+        cache.set(request=request, response=httpx.Response(200, content=b"data"))
+        assert len(cache.data) <= 3
+    assert len(cache.data) == len(cache.sizes) == len(cache.policy) == 3
+    assert cache.evictions == 7
+
+
+def test_dict_cache_lru_eviction_order():
+    cache = httpx_cache.DictCache(max_entries=2)
+    first, second, third = (
+        httpx.Request("GET", f"http://httpx-cache/{i}") for i in range(3)
+    )
+    cache.set(request=first, response=httpx.Response(200, content=b"1"))
+    cache.set(request=second, response=httpx.Response(200, content=b"2"))
+    # access first request, so that second becomes the least recently used
+    assert cache.get(first) is not None
+    cache.set(request=third, response=httpx.Response(200, content=b"3"))
+    assert cache.get(second) is None
+    assert cache.get(first) is not None
+    assert cache.get(third) is not None
+
+
+async def test_dict_cache_max_bytes(serializer: httpx_cache.BaseSerializer):
+    cache = httpx_cache.DictCache(serializer=serializer, max_bytes=1024)
+    for i in range(20):
+        await cache.aset(
+            request=httpx.Request("GET", f"http://httpx-cache/{i}"),
+            response=httpx.Response(200, content=b"x" * 100),
+        )
+        assert cache.total_bytes <= 1024
+    assert 0 < len(cache.data) < 20
+    assert cache.total_bytes == sum(cache.sizes.values())
+
+    # updating an existing key does not count it twice
+    request = httpx.Request("GET", "http://httpx-cache/19")
+    cache.set(request=request, response=httpx.Response(200, content=b"x" * 100))
+    assert cache.total_bytes == sum(cache.sizes.values())
+
+    await cache.adelete(request)
+    assert request.url not in cache.sizes
+    assert cache.total_bytes == sum(cache.sizes.values())
+
+
+def test_dict_cache_entry_bigger_than_max_bytes(httpx_request: httpx.Request):
+    cache = httpx_cache.DictCache(max_bytes=10)
+    cache.set(request=httpx_request, response=httpx.Response(200, content=b"x" * 100))
+    assert cache.data == {}
+    assert cache.total_bytes == 0
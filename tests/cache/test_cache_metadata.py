@@ -0,0 +1,112 @@
+import time
+import typing as tp
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import httpx
+import mock
+import pytest
+
+import httpx_cache
+from httpx_cache.utils import CacheMetadata
+
+pytestmark = pytest.mark.anyio
+
+
+def _serializer(cache: httpx_cache.BaseCache) -> httpx_cache.BaseSerializer:
+    if isinstance(cache, httpx_cache.TieredCache):
+        cache = cache.l2
+    return cache.serializer  # type: ignore[attr-defined]
+
+
+def _loads_metadata(cache: httpx_cache.BaseCache) -> bool:
+    # serializers that can load the metadata without loading the whole response
+    serializer = _serializer(cache)
+    dumped = serializer.dumps(response=httpx.Response(200))
+    return serializer.loads_metadata(cached=dumped) is not None
+
+
+def _response(**headers: str) -> httpx.Response:
+    return httpx.Response(
+        200,
+        headers={
+            "date": format_datetime(datetime.now(tz=timezone.utc), usegmt=True),
+            **{name.replace("_", "-"): value for name, value in headers.items()},
+        },
+        content=b"Hello, world!",
+    )
+
+
+def _two_hours_later() -> tp.ContextManager[mock.Mock]:
+    # only moves the clock of the freshness checks, not the one of the backends
+    clock = mock.Mock(wraps=time)
+    clock.time.return_value = time.time() + 7200
+    return mock.patch("httpx_cache.cache_control.time", clock)
+
+
+def test_cache_skips_unusable_response(cache: httpx_cache.BaseCache):
+    if not _loads_metadata(cache):
+        pytest.skip("the serializer can't load the metadata only")
+    request = httpx.Request("GET", "http://httpx-cache/stale")
+    cache.set(request=request, response=_response(cache_control="max-age=60"))
+    with _two_hours_later(), mock.patch.object(
+        type(_serializer(cache)), "loads"
+    ) as loads:
+        assert cache.get(request) is None
+        assert cache.get_many([request]) == [None]
+    loads.assert_not_called()
+
+
+def test_cache_decodes_metadata_once(cache: httpx_cache.BaseCache):
+    request = httpx.Request("GET", "http://httpx-cache/fresh")
+    cache.set(request=request, response=_response(cache_control="max-age=60"))
+    from_state = CacheMetadata.from_state
+    with mock.patch.object(
+        CacheMetadata, "from_state", wraps=from_state
+    ) as loads_state:
+        cached = cache.get(request)
+        assert cached is not None and cached.read() == b"Hello, world!"
+        assert loads_state.call_count <= 1
+        loads_state.reset_mock()
+        (cached,) = cache.get_many([request])
+        assert cached is not None and cached.read() == b"Hello, world!"
+        assert loads_state.call_count <= 1
+
+
+async def test_cache_askips_unusable_response(cache: httpx_cache.BaseCache):
+    request = httpx.Request("GET", "http://httpx-cache/stale")
+    await cache.aset(request=request, response=_response(cache_control="max-age=60"))
+    with _two_hours_later():
+        cached = await cache.aget(request)
+    if _loads_metadata(cache):
+        assert cached is None
+    else:
+        # the stale response is loaded and left to the transport
+        assert cached is not None and await cached.aread() == b"Hello, world!"
+
+
+@pytest.mark.parametrize(
+    "headers,request_headers",
+    [
+        # can be revalidated
+        ({"cache_control": "max-age=60", "etag": '"abc"'}, {}),
+        # in its stale-while-revalidate window
+        ({"cache_control": "max-age=60, stale-while-revalidate=86400"}, {}),
+        # fresh
+        ({"cache_control": "max-age=86400"}, {}),
+        # no explicit expiration
+        ({}, {}),
+        # the request accepts stale responses
+        ({"cache_control": "max-age=60"}, {"cache-control": "max-stale"}),
+    ],
+)
+def test_cache_keeps_usable_response(
+    cache: httpx_cache.BaseCache, headers, request_headers
+):
+    request = httpx.Request("GET", "http://httpx-cache/usable")
+    cache.set(request=request, response=_response(**headers))
+    request = httpx.Request("GET", "http://httpx-cache/usable", headers=request_headers)
+    with _two_hours_later():
+        cached = cache.get(request)
+    assert cached is not None
+    assert cached.read() == b"Hello, world!"
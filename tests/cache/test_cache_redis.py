@@ -1,3 +1,8 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import anyio
 import httpx
 import mock
 import pytest
@@ -194,3 +199,167 @@ async def test_redis_cache_aset_aget_adelete_with_async_streaming_body(
     assert len(redis_cache.aredis._data) == 0
 
     await redis_cache.aclose()
+
+
+def _dated_response(**headers: str) -> httpx.Response:
+    headers["date"] = format_datetime(datetime.now(tz=timezone.utc), usegmt=True)
+    return httpx.Response(200, content=b"data", headers=headers)
+
+
+@pytest.mark.parametrize(
+    "headers,expected",
+    [
+        ({"cache-control": "max-age=600"}, 600),
+        ({"cache-control": "max-age=600, stale-while-revalidate=60"}, 660),
+        ({"cache-control": "max-age=600, stale-if-error=120"}, 720),
+        ({"cache-control": "max-age=600, must-revalidate, stale-if-error=120"}, 600),
+        ({"cache-control": "max-age=600", "age": "100"}, 500),
+        ({"cache-control": "max-age=600", "age": "700"}, -100),
+        ({"cache-control": "max-age=600", "etag": '"v1"'}, 600 + 3600),
+        ({"cache-control": "max-age=0", "last-modified": "today"}, 3600),
+    ],
+)
+def test_redis_cache_ttl_from_freshness(
+    redis_cache: RedisCache, httpx_request: httpx.Request, headers, expected: int
+):
+    redis_cache.revalidation_ttl = timedelta(hours=1)
+    response = _dated_response(**headers)
+    assert expected - 5 < redis_cache.get_ttl(response).total_seconds() <= expected
+    redis_cache.set(request=httpx_request, response=response)
+    if expected < 1:
+        # already unusable, not stored
+        assert redis_cache.redis.ttls == {}
+    else:
+        (ttl,) = redis_cache.redis.ttls.values()
+        assert expected - 5 < ttl.total_seconds() <= expected
+
+
+@pytest.mark.parametrize(
+    "cache_control,private,shared",
+    [
+        ("max-age=3600, s-maxage=10", 3600, 10),
+        ("max-age=10, s-maxage=3600", 10, 3600),
+        # s-maxage implies proxy-revalidate for shared caches
+        ("max-age=60, s-maxage=60, stale-while-revalidate=30", 90, 60),
+        ("max-age=60, proxy-revalidate, stale-while-revalidate=30", 90, 60),
+    ],
+)
+def test_redis_cache_shared_ttl(
+    redis_cache: RedisCache, cache_control: str, private: int, shared: int
+):
+    # s-maxage is only used by shared caches
+    response = _dated_response(**{"cache-control": cache_control})
+    assert private - 5 < redis_cache.get_ttl(response).total_seconds() <= private
+    redis_cache.shared = True
+    assert shared - 5 < redis_cache.get_ttl(response).total_seconds() <= shared
+
+
+def test_redis_cache_ttl_expires_header(redis_cache: RedisCache):
+    expires = datetime.now(tz=timezone.utc) + timedelta(hours=1)
+    response = _dated_response(expires=format_datetime(expires, usegmt=True))
+    assert 3590 < redis_cache.get_ttl(response).total_seconds() <= 3600
+
+
+def test_redis_cache_default_ttl_without_expiration(redis_cache: RedisCache):
+    assert redis_cache.get_ttl(httpx.Response(200)) is None
+    redis_cache.default_ttl = timedelta(hours=2)
+    assert redis_cache.get_ttl(httpx.Response(200)) == timedelta(hours=2)
+
+
+async def test_redis_cache_expired_response_not_stored(
+    redis_cache: RedisCache, httpx_request: httpx.Request
+):
+    response = _dated_response(**{"cache-control": "max-age=0"})
+    redis_cache.set(request=httpx_request, response=response)
+    await redis_cache.aset(request=httpx_request, response=response)
+    assert redis_cache.redis._data == {}
+    assert redis_cache.aredis._data == {}
+
+
+def test_redis_cache_entries_expire(
+    redis_cache: RedisCache, httpx_request: httpx.Request
+):
+    now = time.monotonic()
+    redis_cache.redis.clock = lambda: now
+    response = _dated_response(**{"cache-control": "max-age=600"})
+    redis_cache.set(request=httpx_request, response=response)
+    now += 590
+    assert redis_cache.get(httpx_request) is not None
+    # expired by the mock redis clock (freshness checks use the real clock)
+    now += 20
+    assert redis_cache.get(httpx_request) is None
+    assert redis_cache.redis._data == {}
+
+
+async def test_redis_cache_vary_marker_single_round_trip(redis_cache: RedisCache):
+    request = httpx.Request("GET", "http://test-vary", headers={"accept": "a"})
+    response = httpx.Response(200, content=b"data", headers={"vary": "accept"})
+    redis_cache.set(request=request, response=response)
+    assert len(redis_cache.redis._data) == 2
+    assert redis_cache.redis.round_trips == 1
+    assert redis_cache.redis.transactions == 1
+
+    request = httpx.Request("GET", "http://test-vary-async", headers={"accept": "a"})
+    await redis_cache.aset(request=request, response=response)
+    assert len(redis_cache.aredis._data) == 2
+    assert redis_cache.aredis.round_trips == 1
+    assert redis_cache.aredis.transactions == 1
+
+
+async def test_redis_cache_writer(redis_cache: RedisCache):
+    if not isinstance(redis_cache.serializer, httpx_cache.MsgPackSerializer):
+        pytest.skip("content written at once with 'set_chunks'")
+    cache = redis_cache
+    request = httpx.Request("GET", "http://test-writer", headers={"accept": "a"})
+    response = _dated_response(**{"cache-control": "max-age=600", "vary": "accept"})
+    response.stream = httpx_cache.utils.ChunkedByteStream([])
+    writer = cache.open_writer(request=request, response=response)
+    writer.flush_size = 4
+    writer.write(b"Hello, ")
+    (tmp_key,) = cache.redis._data
+    assert ":partial:" in tmp_key
+    assert cache.redis.ttls[tmp_key] == cache.partial_ttl
+    writer.write(b"world!")
+    writer.commit()
+
+    # content, ttl and vary marker are set when the key is renamed
+    assert tmp_key not in cache.redis._data
+    assert len(cache.redis._data) == 2
+    key = cache._namespaced(cache.get_store_key(request, response)[0])
+    assert 595 < cache.redis.ttls[key].total_seconds() <= 600
+    cached = cache.get(request)
+    assert cached is not None
+    assert cached.read() == b"Hello, world!"
+
+    # aborted and expired responses are not stored
+    writer = cache.open_writer(request=request, response=response)
+    await writer.awrite(b"x" * (2 * 1024 * 1024))
+    await writer.aabort()
+    assert len(cache.aredis._data) == 0
+    response = _dated_response(**{"cache-control": "max-age=0"})
+    response.stream = httpx_cache.utils.ChunkedByteStream([])
+    writer = cache.open_writer(request=request, response=response)
+    await writer.awrite(b"x" * (2 * 1024 * 1024))
+    await writer.acommit()
+    assert len(cache.aredis._data) == 0
+
+
+async def test_redis_cache_concurrent_aget_aset(
+    redis_cache: RedisCache, httpx_request: httpx.Request
+):
+    # no lock is held around redis I/O: a pending command does not block others
+    blocked = anyio.Event()
+
+    async def slow_get(key: str) -> bytes:
+        await blocked.wait()
+        return redis_cache.aredis._data.get(key)
+
+    response = httpx.Response(200, content=b"data")
+    with mock.patch.object(redis_cache.aredis, "get", side_effect=slow_get):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(redis_cache.aget, httpx_request)
+            with anyio.fail_after(1):
+                await redis_cache.aset(request=httpx_request, response=response)
+                await redis_cache.adelete(httpx_request)
+            blocked.set()
+    assert redis_cache.aredis.transactions == 0
@@ -0,0 +1,203 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+
+import httpx
+import pytest
+
+import httpx_cache
+
+pytestmark = pytest.mark.anyio
+
+
+def _response(size: int = 100, **headers: str) -> httpx.Response:
+    headers = {name.replace("_", "-"): value for name, value in headers.items()}
+    return httpx.Response(200, content=b"x" * size, headers=headers)
+
+
+def test_sqlite_cache_init_bad_serializer(tmp_path: Path):
+    with pytest.raises(TypeError):
+        httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite", serializer="Serial")
+
+
+def test_sqlite_cache_init_bad_max_size(tmp_path: Path):
+    with pytest.raises(ValueError):
+        httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite", max_size=0)
+
+
+def test_sqlite_cache_set_get_delete(tmp_path: Path, httpx_request: httpx.Request):
+    path = tmp_path / "sub-dir" / "cache.sqlite"
+    cache = httpx_cache.SQLiteCache(path=path)
+    assert cache.get(httpx_request) is None
+
+    cache.set(request=httpx_request, response=_response())
+    cached = cache.get(httpx_request)
+    assert cached is not None
+    assert cached.content == b"x" * 100
+    assert cache.connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+    cache.delete(httpx_request)
+    assert cache.get(httpx_request) is None
+    assert cache.total_size == 0
+    cache.close()
+
+    # the database persists after closing the cache
+    cache = httpx_cache.SQLiteCache(path=path)
+    cache.set(request=httpx_request, response=_response())
+    cache.close()
+    assert httpx_cache.SQLiteCache(path=path).get(httpx_request) is not None
+
+
+async def test_sqlite_cache_aset_aget_adelete(
+    tmp_path: Path, httpx_request: httpx.Request
+):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite")
+    await cache.aset(request=httpx_request, response=_response())
+    cached = await cache.aget(httpx_request)
+    assert cached is not None
+    assert cached.content == b"x" * 100
+    await cache.adelete(httpx_request)
+    assert await cache.aget(httpx_request) is None
+    await cache.aclose()
+
+
+def test_sqlite_cache_total_size(tmp_path: Path):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite")
+    request = httpx.Request("GET", "http://test-sqlite/1")
+    cache.set(request=request, response=_response(100))
+    size = cache.total_size
+    cache.set(request=request, response=_response(1100))
+    assert cache.total_size >= size + 1000
+    (total,) = cache.connection.execute("SELECT SUM(size) FROM responses").fetchone()
+    assert cache.total_size == total
+
+
+def test_sqlite_cache_expires(tmp_path: Path):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite")
+    now = datetime.now(tz=timezone.utc).replace(microsecond=0)
+    expired = httpx.Request("GET", "http://test-sqlite/expired")
+    fresh = httpx.Request("GET", "http://test-sqlite/fresh")
+    no_expiry = httpx.Request("GET", "http://test-sqlite/no-expiry")
+    cache.set(
+        request=expired,
+        response=_response(
+            date=format_datetime(now - timedelta(hours=2), usegmt=True),
+            cache_control="max-age=60",
+        ),
+    )
+    cache.set(
+        request=fresh,
+        response=_response(
+            date=format_datetime(now, usegmt=True),
+            expires=format_datetime(now + timedelta(hours=1), usegmt=True),
+        ),
+    )
+    cache.set(request=no_expiry, response=_response())
+
+    (expires,) = cache.connection.execute(
+        "SELECT expires FROM responses WHERE key = ?", (str(fresh.url),)
+    ).fetchone()
+    assert expires == pytest.approx((now + timedelta(hours=1)).timestamp())
+
+    # expired 2 hours ago
+    assert cache.delete_expired(grace=timedelta(hours=3)) == 0
+    assert cache.delete_expired() == 1
+    assert cache.get(expired) is None
+    assert cache.get(fresh) is not None
+    assert cache.get(no_expiry) is not None
+
+
+@pytest.mark.parametrize(
+    "headers,expected",
+    [
+        # s-maxage is only used by shared caches
+        ({"cache-control": "max-age=600, s-maxage=60"}, 600),
+        ({"cache-control": "max-age=600", "age": "100"}, 500),
+        ({"cache-control": "max-age=600, stale-while-revalidate=60"}, 660),
+        ({"cache-control": "max-age=600, must-revalidate, stale-if-error=60"}, 600),
+    ],
+)
+def test_sqlite_cache_expires_from_freshness(tmp_path: Path, headers, expected: int):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite")
+    request = httpx.Request("GET", "http://test-sqlite/")
+    now = datetime.now(tz=timezone.utc)
+    headers["date"] = format_datetime(now, usegmt=True)
+    cache.set(request=request, response=_response(**headers))
+    (expires,) = cache.connection.execute(
+        "SELECT expires FROM responses WHERE key = ?", (str(request.url),)
+    ).fetchone()
+    assert expires - now.timestamp() == pytest.approx(expected, abs=5)
+
+
+@pytest.mark.parametrize("shared,expected", [(False, 3600), (True, 10)])
+def test_sqlite_cache_shared_expires(tmp_path: Path, shared: bool, expected: int):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite", shared=shared)
+    request = httpx.Request("GET", "http://test-sqlite/")
+    now = datetime.now(tz=timezone.utc)
+    response = _response(
+        date=format_datetime(now, usegmt=True),
+        cache_control="max-age=3600, s-maxage=10",
+    )
+    cache.set(request=request, response=response)
+    (expires,) = cache.connection.execute(
+        "SELECT expires FROM responses WHERE key = ?", (str(request.url),)
+    ).fetchone()
+    assert expires - now.timestamp() == pytest.approx(expected, abs=5)
+
+
+async def test_sqlite_cache_adelete_expired(tmp_path: Path):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite")
+    request = httpx.Request("GET", "http://test-sqlite/expired")
+    await cache.aset(
+        request=request, response=_response(expires="Thu, 01 Jan 1970 00:00:00 GMT")
+    )
+    assert await cache.adelete_expired() == 1
+
+
+def test_sqlite_cache_max_size(tmp_path: Path):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite", max_size=5000)
+    cache.access_resolution = 0
+    requests = [httpx.Request("GET", f"http://test-sqlite/{i}") for i in range(5)]
+    for request in requests[:4]:
+        cache.set(request=request, response=_response(1000))
+    # first request is the most recently accessed one
+    assert cache.get(requests[0]) is not None
+
+    cache.set(request=requests[4], response=_response(1000))
+    assert cache.total_size <= 5000 * cache.gc_low_watermark
+    assert cache.get(requests[0]) is not None
+    assert cache.get(requests[1]) is None
+    assert cache.get(requests[4]) is not None
+    assert cache.evict() == 0
+
+
+def test_sqlite_cache_evict_unbounded(tmp_path: Path):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite")
+    assert cache.evict() == 0
+
+
+def test_sqlite_cache_threads(tmp_path: Path):
+    cache = httpx_cache.SQLiteCache(path=tmp_path / "cache.sqlite")
+
+    def set_get(i: int) -> bytes:
+        request = httpx.Request("GET", f"http://test-sqlite/{i}")
+        cache.set(request=request, response=_response(i))
+        cached = cache.get(request)
+        assert cached is not None
+        return cached.content
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        contents = list(executor.map(set_get, range(64)))
+        # one connection per thread
+        assert 1 < len(cache._connections) <= 9
+        connections = set(cache._connections)
+    assert contents == [b"x" * i for i in range(64)]
+    # the connections of the ended threads are closed, only the main one is kept
+    assert cache._connections == {cache.connection}
+    for connection in connections - cache._connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+    cache.close()
+    assert cache._connections == set()
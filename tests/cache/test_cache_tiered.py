@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import httpx
+import mock
+import pytest
+
+import httpx_cache
+
+pytestmark = pytest.mark.anyio
+
+
+def test_tiered_cache_init_bad_caches():
+    with pytest.raises(TypeError):
+        httpx_cache.TieredCache(l2="cache")
+    with pytest.raises(TypeError):
+        httpx_cache.TieredCache(l2=httpx_cache.DictCache(), l1="cache")
+
+
+def test_tiered_cache_init_bad_negative_ttl():
+    with pytest.raises(ValueError):
+        httpx_cache.TieredCache(l2=httpx_cache.DictCache(), negative_ttl=0)
+
+
+def test_tiered_cache_default_l1():
+    cache = httpx_cache.TieredCache(l2=httpx_cache.DictCache(), l1_max_entries=10)
+    assert isinstance(cache.l1, httpx_cache.DictCache)
+    assert isinstance(cache.l1.serializer, httpx_cache.DictSerializer)
+    assert cache.l1.max_entries == 10
+
+
+def test_tiered_cache_write_through_and_promotion(httpx_request: httpx.Request):
+    l1, l2 = httpx_cache.DictCache(), httpx_cache.DictCache()
+    cache = httpx_cache.TieredCache(l2=l2, l1=l1)
+    response = httpx.Response(200, content=b"data")
+
+    cache.set(request=httpx_request, response=response)
+    assert l1.get(httpx_request) is not None
+    assert l2.get(httpx_request) is not None
+
+    # another worker's L1 is promoted on the first L2 hit
+    other = httpx_cache.TieredCache(l2=l2)
+    with mock.patch.object(l2, "get", wraps=l2.get) as l2_get:
+        for _ in range(3):
+            cached = other.get(httpx_request)
+            assert cached is not None and cached.content == b"data"
+    assert l2_get.call_count == 1
+
+    cache.delete(httpx_request)
+    assert l1.get(httpx_request) is None
+    assert l2.get(httpx_request) is None
+
+
+async def test_tiered_cache_async_write_through_and_promotion(
+    httpx_request: httpx.Request,
+):
+    l2 = httpx_cache.DictCache()
+    cache = httpx_cache.TieredCache(l2=l2)
+    await cache.aset(request=httpx_request, response=httpx.Response(200, content=b"1"))
+    assert await cache.l1.aget(httpx_request) is not None
+
+    other = httpx_cache.TieredCache(l2=l2)
+    with mock.patch.object(l2, "aget", wraps=l2.aget) as l2_aget:
+        assert (await other.aget(httpx_request)).content == b"1"
+        assert (await other.aget(httpx_request)).content == b"1"
+    assert l2_aget.call_count == 1
+
+    await cache.adelete(httpx_request)
+    assert await l2.aget(httpx_request) is None
+
+
+def test_tiered_cache_lazy_content_not_promoted(tmp_path: Path):
+    l2 = httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=10)
+    request = httpx.Request("GET", "http://httpx-cache")
+    l2.set(request=request, response=httpx.Response(200, content=b"x" * 100))
+
+    cache = httpx_cache.TieredCache(l2=l2)
+    cached = cache.get(request)
+    assert cached is not None
+    assert cached.read() == b"x" * 100
+    cached.close()
+    assert cache.l1.get(request) is None
+
+
+def test_tiered_cache_negative_entries(httpx_request: httpx.Request):
+    l2 = httpx_cache.DictCache()
+    cache = httpx_cache.TieredCache(l2=l2, negative_ttl=60)
+    with mock.patch.object(l2, "get", wraps=l2.get) as l2_get:
+        assert cache.get(httpx_request) is None
+        assert cache.get(httpx_request) is None
+        assert cache.get_many([httpx_request]) == [None]
+    assert l2_get.call_count == 1
+
+    # caching a response drops the negative entry
+    cache.set(request=httpx_request, response=httpx.Response(200, content=b"data"))
+    assert cache.negative == {}
+    assert cache.get(httpx_request) is not None
+
+
+async def test_tiered_cache_negative_entries_expire(httpx_request: httpx.Request):
+    cache = httpx_cache.TieredCache(l2=httpx_cache.DictCache(), negative_ttl=60)
+    with mock.patch("time.monotonic", return_value=0):
+        assert await cache.aget(httpx_request) is None
+    assert len(cache.negative) == 1
+
+    with mock.patch("time.monotonic", return_value=61):
+        assert not cache._is_negative(httpx_request)
+    assert len(cache.negative) == 0
+
+
+def test_tiered_cache_max_negative_entries():
+    cache = httpx_cache.TieredCache(
+        l2=httpx_cache.DictCache(), negative_ttl=60, max_negative_entries=2
+    )
+    requests = [httpx.Request("GET", f"http://httpx-cache/{i}") for i in range(3)]
+    assert cache.get_many(requests) == [None, None, None]
+    assert list(cache.negative) == [
+        httpx_cache.utils.get_cache_key(request) for request in requests[1:]
+    ]
+
+
+async def test_tiered_cache_aget_many_promotion():
+    l2 = httpx_cache.DictCache()
+    cache = httpx_cache.TieredCache(l2=l2)
+    requests = [httpx.Request("GET", f"http://httpx-cache/{i}") for i in range(3)]
+    await l2.aset_many(
+        [(request, httpx.Response(200, content=b"data")) for request in requests[:2]]
+    )
+
+    cached = await cache.aget_many(requests)
+    assert [c.content if c else None for c in cached] == [b"data", b"data", None]
+    assert [c is not None for c in cache.l1.get_many(requests)] == [True, True, False]
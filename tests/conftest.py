@@ -1,5 +1,7 @@
 import re
 import shutil
+import time
+from datetime import timedelta
 from pathlib import Path
 
 import httpx
@@ -68,6 +70,14 @@ class SerializerCases:
     def case_msgpack_serializer(self) -> httpx_cache.BaseSerializer:
         return httpx_cache.MsgPackSerializer()
 
+    @case(tags=["bytes"])
+    def case_binary_serializer(self) -> httpx_cache.BaseSerializer:
+        return httpx_cache.BinarySerializer()
+
+    @case(tags=["bytes"])
+    def case_compressing_serializer(self) -> httpx_cache.BaseSerializer:
+        return httpx_cache.CompressingSerializer(min_size=0)
+
 
 @fixture(scope="function")
 @parametrize_with_cases("serializer", cases=SerializerCases)
@@ -89,22 +99,136 @@ def file_cache(
     return httpx_cache.FileCache(serializer=serializer, cache_dir=tmp_path)
 
 
+@fixture(scope="function")
+@parametrize_with_cases("serializer", cases=SerializerCases, has_tag="bytes")
+def sqlite_cache(
+    serializer: httpx_cache.BaseSerializer, tmp_path: Path
+) -> httpx_cache.SQLiteCache:
+    return httpx_cache.SQLiteCache(
+        serializer=serializer, path=tmp_path / "cache.sqlite"
+    )
+
+
+class _MockPipeline:
+    def __init__(self, redis, transaction: bool):
+        self._redis = redis
+        self._transaction = transaction
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        # queue the commands of the mock redis (set, append, rename, ...)
+        command = getattr(self._redis, f"_{name}")
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def _execute(self):
+        commands, self._commands = self._commands, []
+        results = [command(*args, **kwargs) for command, args, kwargs in commands]
+        self._redis.round_trips += 1
+        self._redis.transactions += self._transaction
+        return results
+
+    def execute(self):
+        return self._execute()
+
+
+class _MockAsyncPipeline(_MockPipeline):
+    async def execute(self):
+        return self._execute()
+
+
 class _MockRedis:
     def __init__(self):
         self._data = {}
-
-    def get(self, key: str) -> bytes:
+        self.ttls = {}
+        self._deadlines = {}
+        self.clock = time.monotonic
+        self.round_trips = 0
+        self.transactions = 0
+
+    def _set_ttl(self, key: str, ex):
+        self.ttls[key] = ex
+        if ex is None:
+            self._deadlines.pop(key, None)
+        else:
+            seconds = ex.total_seconds() if isinstance(ex, timedelta) else ex
+            self._deadlines[key] = self.clock() + seconds
+
+    def _get(self, key: str):
+        # expired keys are removed when accessed
+        deadline = self._deadlines.get(key)
+        if deadline is not None and deadline <= self.clock():
+            self._delete(key)
         return self._data.get(key)
 
-    def set(self, key: str, value: bytes):
+    def _set(self, key: str, value: bytes, ex=None):
         self._data[key] = value
+        self._set_ttl(key, ex)
+        return True
+
+    def _append(self, key: str, value: bytes):
+        self._data[key] = (self._get(key) or b"") + value
+        self.ttls.setdefault(key, None)
+        return len(self._data[key])
+
+    def _setrange(self, key: str, offset: int, value: bytes):
+        data = (self._get(key) or b"").ljust(offset, b"\0")
+        self._data[key] = data[:offset] + value + data[offset + len(value) :]
+        self.ttls.setdefault(key, None)
+        return len(self._data[key])
+
+    def _rename(self, src: str, dst: str):
+        self._data[dst] = self._data.pop(src)
+        self.ttls[dst] = self.ttls.pop(src)
+        self._deadlines.pop(dst, None)
+        if src in self._deadlines:
+            self._deadlines[dst] = self._deadlines.pop(src)
+        return True
+
+    def _expire(self, key: str, time_):
+        if self._get(key) is None:
+            return False
+        self._set_ttl(key, time_)
+        return True
+
+    def _persist(self, key: str):
+        if self._get(key) is None:
+            return False
+        self._set_ttl(key, None)
+        return True
+
+    def _delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+            self.ttls.pop(key, None)
+            self._deadlines.pop(key, None)
+        return len(keys)
+
+    def get(self, key: str) -> bytes:
+        self.round_trips += 1
+        return self._get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self._get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ex=None):
+        self.round_trips += 1
+        self._set(key, value, ex)
 
     def setex(self, key: str, time_: int, value: bytes):
-        # TODO: time_ is ignored
-        self.set(key, value)
+        self.set(key, value, ex=time_)
+
+    def pipeline(self, transaction: bool = True):
+        return _MockPipeline(self, transaction)
 
-    def delete(self, key: str):
-        self._data.pop(key, None)
+    def delete(self, *keys: str):
+        self.round_trips += 1
+        self._delete(*keys)
 
     def close(self):
         pass
@@ -112,20 +236,35 @@ class _MockRedis:
 
 class _MockAsyncRedis:
     def __init__(self):
-        self._data = {}
+        self._mock = _MockRedis()
+        self._data = self._mock._data
+        self.ttls = self._mock.ttls
+
+    @property
+    def round_trips(self) -> int:
+        return self._mock.round_trips
+
+    @property
+    def transactions(self) -> int:
+        return self._mock.transactions
 
     async def get(self, key: str) -> bytes:
-        return self._data.get(key)
+        return self._mock.get(key)
 
-    async def set(self, key: str, value: bytes):
-        self._data[key] = value
+    async def mget(self, keys):
+        return self._mock.mget(keys)
+
+    async def set(self, key: str, value: bytes, ex=None):
+        self._mock.set(key, value, ex=ex)
 
     async def setex(self, key: str, time_: int, value: bytes):
-        # TODO: time_ is ignored
-        self.set(key, value)
+        self._mock.setex(key, time_, value)
+
+    def pipeline(self, transaction: bool = True):
+        return _MockAsyncPipeline(self._mock, transaction)
 
-    async def delete(self, key: str):
-        self._data.pop(key, None)
+    async def delete(self, *keys: str):
+        self._mock.delete(*keys)
 
     async def close(self):
         pass
@@ -139,4 +278,15 @@ def redis_cache(serializer: httpx_cache.BaseSerializer) -> RedisCache:
     return RedisCache(serializer=serializer, redis=redis, aredis=aredis)
 
 
-cache = fixture_union("cache", [dict_cache, file_cache, redis_cache], scope="function")
+@fixture(scope="function")
+@parametrize_with_cases("serializer", cases=SerializerCases, has_tag="bytes")
+def tiered_cache(serializer: httpx_cache.BaseSerializer) -> httpx_cache.TieredCache:
+    l2 = RedisCache(serializer=serializer, redis=_MockRedis(), aredis=_MockAsyncRedis())
+    return httpx_cache.TieredCache(l2=l2)
+
+
+cache = fixture_union(
+    "cache",
+    [dict_cache, file_cache, sqlite_cache, redis_cache, tiered_cache],
+    scope="function",
+)
@@ -6,13 +6,16 @@ and cached response behave similiary.
 Test are taken from:
     https://github.com/encode/httpx/blob/master/tests/models/test_responses.py
 """
+import gzip
 import json
 
 import httpx
+import mock
 import pytest
 import chardet
 
 import httpx_cache
+from httpx_cache.utils import get_cache_metadata
 
 pytestmark = pytest.mark.anyio
 
@@ -752,3 +755,174 @@ def test_response_decode_text_using_explicit_encoding(
     assert response.reason_phrase == cached.reason_phrase == "OK"
     assert response.encoding == cached.encoding == "cp1252"
     assert response.text == cached.text == text
+
+
+def test_response_streaming_chunks(serializer: httpx_cache.BaseSerializer):
+    response = httpx.Response(200, content=StreamingBody())
+    chunks = [b"Hello, ", b"world!"]
+    cached = serializer.loads(
+        cached=serializer.dumps(response=response, content=chunks)
+    )
+    assert cached.read() == b"Hello, world!"
+    assert cached.headers == {"Transfer-Encoding": "chunked"}
+
+
+@pytest.mark.parametrize("size", [0, 10, 300, 70_000])
+def test_msgpack_serializer_dumps_chunks(size: int):
+    import msgpack
+
+    serializer = httpx_cache.MsgPackSerializer()
+    response = httpx.Response(200, content=StreamingBody())
+    chunks = [b"a" * size, b"b" * size]
+    dumped = serializer.dumps_chunks(response=response, content=chunks)
+    # content chunks are part of the dump as is, not copied
+    assert dumped[-2] is chunks[0] and dumped[-1] is chunks[1]
+    joined = b"".join(dumped)
+    assert msgpack.loads(joined)["stream_content"] == b"".join(chunks)
+    cached = serializer.loads(cached=joined)
+    assert cached.read() == b"".join(chunks)
+
+
+def test_response_cache_metadata(serializer: httpx_cache.BaseSerializer):
+    response = httpx.Response(
+        200,
+        headers={"date": "Mon, 01 Jan 2024 00:00:00 GMT", "cache-control": "max-age=5"},
+        content=b"Hello, world!",
+    )
+    dumped = serializer.dumps(response=response)
+    with mock.patch("httpx_cache.utils.parse_cache_control_headers") as parse:
+        cached = serializer.loads(cached=dumped)
+        # metadata is loaded with the response, headers are not parsed again
+        assert get_cache_metadata(cached) == get_cache_metadata(response)
+    parse.assert_not_called()
+
+
+def test_response_encoded_content(serializer: httpx_cache.BaseSerializer):
+    content = b"Hello, world!" * 100
+    response = httpx.Response(
+        200, headers={"content-encoding": "gzip"}, content=gzip.compress(content)
+    )
+    assert response.content == content
+    cached = serializer.loads(cached=serializer.dumps(response=response))
+    if "content-encoding" in cached.headers:
+        # raw content, decoded when the cached response is read
+        assert not hasattr(cached, "_content")
+    assert cached.read() == content
+
+
+def test_msgpack_serializer_encoded_content_stored_raw():
+    serializer = httpx_cache.MsgPackSerializer()
+    content = b"Hello, world!" * 100
+    raw = gzip.compress(content)
+    response = httpx.Response(200, headers={"content-encoding": "gzip"}, content=raw)
+    response.read()
+    dumped = serializer.dumps(response=response)
+    assert raw in dumped and len(dumped) < len(content)
+    cached = serializer.loads(cached=dumped)
+    assert cached.headers["content-encoding"] == "gzip"
+    assert cached.read() == content
+
+
+def test_serializer_encoded_content_without_raw_content(
+    serializer: httpx_cache.BaseSerializer,
+):
+    content = b"Hello, world!" * 100
+    response = httpx.Response(
+        200,
+        headers={"content-encoding": "gzip"},
+        content=iter([gzip.compress(content)]),
+    )
+    response.read()
+    # the raw content was consumed, the decoded one is stored as not encoded
+    cached = serializer.loads(cached=serializer.dumps(response=response))
+    assert "content-encoding" not in cached.headers
+    assert cached.headers["content-length"] == str(len(content))
+    assert cached.read() == content
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_serializer_fast_path(serializer: httpx_cache.BaseSerializer, streamed: bool):
+    from httpx_cache.serializer.common import FAST_RESPONSE
+
+    # the installed httpx version supports building responses directly
+    assert FAST_RESPONSE
+    headers = {"content-type": "application/json", "x-custom": "value"}
+    if streamed:
+        response = httpx.Response(200, headers=headers, content=StreamingBody())
+        dumped = serializer.dumps(response=response, content=[b'{"a": ', b"1}"])
+    else:
+        response = httpx.Response(200, headers=headers, content=b'{"a": 1}')
+        dumped = serializer.dumps(response=response)
+
+    cached = serializer.loads(cached=dumped)
+    with mock.patch("httpx_cache.serializer.common.FAST_RESPONSE", False), mock.patch(
+        "httpx_cache.serializer.headers.FAST_HEADERS", False
+    ):
+        expected = serializer.loads(cached=dumped)
+    # same response as the one built by httpx.Response
+    assert cached.headers.raw == expected.headers.raw
+    assert cached.is_closed == expected.is_closed
+    assert hasattr(cached, "_content") == hasattr(expected, "_content")
+    assert cached.read() == expected.read() == b'{"a": 1}'
+    assert cached.json() == {"a": 1}
+    assert cached.encoding == expected.encoding
+    # the content decoder is created lazily
+    assert vars(cached).keys() - {"_decoder"} == vars(expected).keys() - {"_decoder"}
+
+
+def test_msgpack_serializer_loads_metadata():
+    serializer = httpx_cache.MsgPackSerializer()
+    response = httpx.Response(
+        200,
+        headers={"cache-control": "max-age=5", "etag": '"abc"'},
+        content=b"x" * 10_000,
+    )
+    metadata = get_cache_metadata(response)
+    assert serializer.loads_metadata(cached=serializer.dumps(response=response)) == (
+        metadata
+    )
+    head, _ = serializer.dumps_parts(response=response)
+    assert serializer.loads_metadata(cached=head) == metadata
+    assert serializer.loads_metadata(cached=b"not msgpack") is None
+
+
+def test_binary_serializer_content_out_of_band():
+    serializer = httpx_cache.BinarySerializer()
+    content = b"x" * 100_000
+    response = httpx.Response(200, headers={"etag": '"abc"'}, content=content)
+
+    chunks = serializer.dumps_chunks(response=response)
+    # content is part of the dump as is, not copied
+    assert chunks[-1] is response.content
+    dumped = serializer.dumps(response=response)
+    assert dumped == b"".join(chunks)
+    assert dumped.endswith(content)
+
+    header, body = serializer.unpack(dumped)
+    assert isinstance(body, memoryview) and body.obj is dumped
+    assert body == content
+    assert header[1] == 200
+
+    cached = serializer.loads(cached=dumped)
+    assert cached.content == content
+    assert cached.headers["etag"] == '"abc"'
+    assert serializer.loads_metadata(cached=dumped) == get_cache_metadata(response)
+    head, _ = serializer.dumps_parts(response=response)
+    assert serializer.loads_metadata(cached=head) == get_cache_metadata(response)
+
+
+def test_binary_serializer_streamed_content():
+    serializer = httpx_cache.BinarySerializer()
+    response = httpx.Response(200, content=StreamingBody())
+    dumped = serializer.dumps(response=response, content=[b"Hello, ", b"world!"])
+    cached = serializer.loads(cached=dumped)
+    assert not hasattr(cached, "_content")
+    assert cached.read() == b"Hello, world!"
+
+
+@pytest.mark.parametrize("cached", [b"", b"HXB", b"httpx-cache:vary:accept"])
+def test_binary_serializer_invalid_data(cached):
+    serializer = httpx_cache.BinarySerializer()
+    with pytest.raises(ValueError):
+        serializer.unpack(cached)
+    assert serializer.loads_metadata(cached=cached) is None
@@ -0,0 +1,165 @@
+import os
+import zlib
+
+import httpx
+import mock
+import pytest
+
+import httpx_cache
+from httpx_cache.serializer import compression
+from httpx_cache.serializer.compression import (
+    COMPRESSION_HEADER,
+    Codec,
+    GzipCodec,
+    ZlibCodec,
+    get_codec,
+)
+from httpx_cache.utils import get_cache_metadata
+
+CONTENT = b'{"name": "httpx-cache", "description": "Caching for HTTPX."}' * 100
+
+pytestmark = pytest.mark.anyio
+
+
+class CustomCodec(Codec):
+    name = "custom"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+def _codec(name: str) -> Codec:
+    if name == "zstd":
+        pytest.importorskip("zstandard")
+    elif name == "lz4":
+        pytest.importorskip("lz4")
+    return get_codec(name)
+
+
+@pytest.mark.parametrize("codec", ["zlib", "gzip", "zstd", "lz4"])
+def test_compressing_serializer_content(codec: str):
+    serializer = httpx_cache.CompressingSerializer(codec=_codec(codec))
+    response = httpx.Response(
+        200,
+        headers={"content-type": "application/json", "cache-control": "max-age=5"},
+        content=CONTENT,
+    )
+    dumped = serializer.dumps(response=response)
+    assert len(dumped) < len(CONTENT)
+    assert serializer.loads_metadata(cached=dumped) == get_cache_metadata(response)
+
+    request = httpx.Request("GET", "http://testurl")
+    cached = serializer.loads(cached=dumped, request=request)
+    assert cached.request is request
+    assert cached.content == CONTENT
+    assert cached.headers == response.headers
+    assert COMPRESSION_HEADER not in cached.headers
+    assert get_cache_metadata(cached) == get_cache_metadata(response)
+
+
+def test_compressing_serializer_streamed_content():
+    serializer = httpx_cache.CompressingSerializer()
+    response = httpx.Response(200, content=iter([CONTENT]))
+    dumped = serializer.dumps(response=response, content=[CONTENT[:10], CONTENT[10:]])
+    assert len(dumped) < len(CONTENT)
+    cached = serializer.loads(cached=dumped)
+    assert not hasattr(cached, "_content")
+    assert cached.read() == CONTENT
+    assert cached.headers == {"Transfer-Encoding": "chunked"}
+
+
+@pytest.mark.parametrize(
+    "headers,content",
+    [
+        # too small
+        ({}, b"Hello, world!" * 10),
+        # already compressed by the origin
+        ({"content-encoding": "br"}, CONTENT),
+        # already compressed media
+        ({"content-type": "image/png"}, CONTENT),
+        ({"content-type": "video/mp4; codecs=avc1"}, CONTENT),
+        # incompressible
+        ({}, os.urandom(2048)),
+    ],
+    ids=["small", "content-encoding", "image", "video", "incompressible"],
+)
+def test_compressing_serializer_skips_content(headers, content):
+    inner = httpx_cache.MsgPackSerializer()
+    serializer = httpx_cache.CompressingSerializer(inner)
+    response = httpx.Response(200, headers=headers, content=content)
+    dumped = serializer.dumps(response=response)
+    assert dumped == inner.dumps(response=response)
+    assert serializer.loads(cached=dumped).read() == content
+
+
+def test_compressing_serializer_loads_other_codec():
+    response = httpx.Response(200, content=CONTENT)
+    dumped = httpx_cache.CompressingSerializer(codec=GzipCodec()).dumps(
+        response=response
+    )
+    serializer = httpx_cache.CompressingSerializer(codec=ZlibCodec())
+    assert serializer.loads(cached=dumped).content == CONTENT
+
+
+def test_compressing_serializer_loads_unknown_codec():
+    response = httpx.Response(200, content=CONTENT)
+    dumped = httpx_cache.CompressingSerializer(codec=CustomCodec()).dumps(
+        response=response
+    )
+    with pytest.raises(httpx_cache.LoadError):
+        httpx_cache.CompressingSerializer().loads(cached=dumped)
+
+
+def test_compressing_serializer_loads_codec_not_installed():
+    response = httpx.Response(200, content=CONTENT)
+    dumped = httpx_cache.CompressingSerializer(codec=GzipCodec()).dumps(
+        response=response
+    )
+    missing = mock.Mock(side_effect=ImportError("No module named 'gzip'"))
+    with mock.patch.dict(compression._CODECS, {"gzip": missing}):
+        with pytest.raises(httpx_cache.LoadError):
+            httpx_cache.CompressingSerializer().loads(cached=dumped)
+
+
+async def test_cache_unknown_codec_is_a_miss(cache: httpx_cache.BaseCache):
+    if isinstance(cache, httpx_cache.TieredCache):
+        cache = cache.l2
+    serializer = cache.serializer  # type: ignore[attr-defined]
+    if not isinstance(serializer, httpx_cache.CompressingSerializer):
+        pytest.skip("content not compressed")
+    request = httpx.Request("GET", "http://httpx-cache/unknown-codec")
+    serializer.codec = CustomCodec()
+    cache.set(request=request, response=httpx.Response(200, content=CONTENT))
+    serializer.codec = ZlibCodec()
+
+    assert cache.get_many([request]) == [None]
+    assert cache.get(request) is None
+    assert await cache.aget(request) is None
+
+
+def test_compressing_serializer_zstd_dictionary():
+    pytest.importorskip("zstandard")
+    from httpx_cache.serializer.compression import ZstdCodec
+
+    samples = [
+        b'{"id": %d, "name": "user-%d", "email": "user-%d@example.com"}' % (i, i, i)
+        for i in range(1000)
+    ]
+    codec = ZstdCodec.train(samples, dict_size=4096)
+    assert codec.name.startswith("zstd-")
+    serializer = httpx_cache.CompressingSerializer(codec=codec, min_size=0)
+    response = httpx.Response(200, content=samples[0])
+    dumped = serializer.dumps(response=response)
+    assert serializer.loads(cached=dumped).content == samples[0]
+
+
+def test_compressing_serializer_invalid_arguments():
+    with pytest.raises(ValueError):
+        httpx_cache.CompressingSerializer(codec="brotli")
+    with pytest.raises(TypeError):
+        httpx_cache.CompressingSerializer(serializer="msgpack")  # type: ignore
+    with pytest.raises(TypeError):
+        httpx_cache.CompressingSerializer(httpx_cache.BytesJsonSerializer())
@@ -0,0 +1,99 @@
+import httpx
+import msgpack
+import pytest
+
+import httpx_cache
+from httpx_cache.serializer.headers import (
+    STATIC_HEADER_FIELDS,
+    STATIC_HEADER_NAMES,
+    HeaderTable,
+)
+
+HEADERS = [
+    ("content-type", "application/json"),
+    ("content-length", "13"),
+    ("set-cookie", "a=1"),
+    ("set-cookie", "b=2"),
+    ("x-api-version", "2"),
+    ("x-custom", "value"),
+    ("vary", "Accept-Encoding"),
+]
+
+
+def test_header_table_encode():
+    table = HeaderTable(fields=[("X-Api-Version", "2")])
+    encoded = table.encode(HEADERS)
+    assert encoded == [
+        STATIC_HEADER_FIELDS.index(("content-type", "application/json")),
+        ~STATIC_HEADER_NAMES.index("content-length"),
+        "13",
+        ~STATIC_HEADER_NAMES.index("set-cookie"),
+        "a=1",
+        ~STATIC_HEADER_NAMES.index("set-cookie"),
+        "b=2",
+        len(STATIC_HEADER_FIELDS),
+        "x-custom",
+        "value",
+        STATIC_HEADER_FIELDS.index(("vary", "Accept-Encoding")),
+    ]
+    # order and repeated headers are kept
+    assert httpx.Headers(table.decode(encoded)).multi_items() == HEADERS
+
+
+def test_header_table_decode_pairs():
+    # headers stored as (name, value) pairs by older versions
+    pairs = [list(header) for header in HEADERS]
+    assert httpx.Headers(HeaderTable().decode(pairs)).multi_items() == HEADERS
+    assert HeaderTable().build_headers(pairs).multi_items() == HEADERS
+    assert HeaderTable().decode([]) == []
+
+
+def test_header_table_build_headers():
+    table = HeaderTable()
+    pairs = [("Content-Type", "application/json"), *HEADERS]
+    items = httpx.Headers(pairs).multi_items()
+    headers = table.build_headers(table.encode(items))
+    # same headers as the ones built by httpx.Headers (names are lowercased)
+    assert headers.raw == httpx.Headers(items).raw
+    assert headers == httpx.Headers(pairs)
+
+
+def test_serializer_header_fields(serializer: httpx_cache.BaseSerializer):
+    response = httpx.Response(200, headers=HEADERS, content=b"Hello, world!")
+    cached = serializer.loads(cached=serializer.dumps(response=response))
+    assert cached.headers.multi_items() == response.headers.multi_items()
+    assert cached.headers["x-custom"] == "value"
+
+
+def test_msgpack_serializer_compact_headers():
+    response = httpx.Response(200, headers=HEADERS, content=b"Hello, world!")
+    legacy = msgpack.dumps(
+        {"status_code": 200, "headers": response.headers.multi_items()},
+        use_bin_type=True,
+    )
+    encoded = msgpack.dumps(
+        {"status_code": 200, "headers": HeaderTable().encode(HEADERS)},
+        use_bin_type=True,
+    )
+    assert len(encoded) < len(legacy)
+
+    serializer = httpx_cache.MsgPackSerializer(header_fields=[("x-api-version", "2")])
+    dumped = serializer.dumps(response=response)
+    assert len(dumped) < len(httpx_cache.MsgPackSerializer().dumps(response=response))
+    assert serializer.loads(cached=dumped).headers["x-api-version"] == "2"
+
+
+@pytest.mark.parametrize(
+    "serializer",
+    [httpx_cache.DictSerializer(), httpx_cache.MsgPackSerializer()],
+    ids=["dict", "msgpack"],
+)
+def test_serializer_loads_header_pairs(serializer: httpx_cache.DictSerializer):
+    dumped = serializer.dumps(response=httpx.Response(200, content=b"Hello"))
+    state = dumped if isinstance(dumped, dict) else msgpack.loads(dumped)
+    state["headers"] = [["content-length", "5"], ["x-custom", "value"]]
+    if not isinstance(dumped, dict):
+        state = msgpack.dumps(state, use_bin_type=True)
+    cached = serializer.loads(cached=state)
+    assert cached.headers["x-custom"] == "value"
+    assert cached.read() == b"Hello"
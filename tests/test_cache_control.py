@@ -5,7 +5,12 @@ import httpx
 import pytest
 
 import httpx_cache
-from httpx_cache.cache_control import _PERMANENT_REDIRECT_STATUSES, CacheControl
+from httpx_cache.cache_control import (
+    _PERMANENT_REDIRECT_STATUSES,
+    CacheControl,
+    is_response_unusable,
+)
+from httpx_cache.utils import get_cache_metadata
 
 
 def test_is_request_cacheable(httpx_request):
@@ -105,9 +110,10 @@ def test_is_response_cacheable_with_request_no_store_header_and_always_cache_is_
 
 def test_is_response_fresh(httpx_request, httpx_response):
     controller = httpx_cache.CacheControl()
+    # no explicit expiration nor 'Last-Modified': never fresh
     assert (
         controller.is_response_fresh(request=httpx_request, response=httpx_response)
-        is True
+        is False
     )
 
 
@@ -210,7 +216,8 @@ def test_is_response_fresh_with_max_age_response_header_no_date():
         headers={"cache-control": "max-age=900"},
     )
     controller = CacheControl()
-    assert controller.is_response_fresh(request=request, response=response) is False
+    # the response is dated when it's received
+    assert controller.is_response_fresh(request=request, response=response) is True
 
 
 def test_is_response_fresh_with_max_age_request_header_fresh():
@@ -226,6 +233,16 @@ def test_is_response_fresh_with_max_age_request_header_fresh():
         },
     )
     controller = CacheControl()
+    # the request 'max-age' does not extend the response freshness lifetime
+    assert controller.is_response_fresh(request=request, response=response) is False
+
+    response = httpx.Response(
+        200,
+        headers={
+            "date": format_datetime(date, usegmt=True),
+            "cache-control": "max-age=100000",
+        },
+    )
     assert controller.is_response_fresh(request=request, response=response) is True
 
 
@@ -258,3 +275,298 @@ def test_is_response_fresh_with_max_age_request_header_fresh_with_min_fresh_head
     )
     controller = CacheControl()
     assert controller.is_response_fresh(request=request, response=response) is False
+
+
+def test_build_revalidation_request_no_validators(httpx_request):
+    controller = CacheControl()
+    response = httpx.Response(200)
+    assert (
+        controller.build_revalidation_request(request=httpx_request, response=response)
+        is None
+    )
+
+
+def test_build_revalidation_request():
+    controller = CacheControl()
+    request = httpx.Request("GET", "http://testurl", headers={"x-custom": "value"})
+    response = httpx.Response(
+        200,
+        headers={"etag": '"abc"', "last-modified": "Tue, 15 Nov 1994 12:45:26 GMT"},
+    )
+    conditional = controller.build_revalidation_request(
+        request=request, response=response
+    )
+    assert conditional is not None
+    assert conditional is not request
+    assert conditional.url == request.url
+    assert conditional.headers["x-custom"] == "value"
+    assert conditional.headers["if-none-match"] == '"abc"'
+    assert conditional.headers["if-modified-since"] == "Tue, 15 Nov 1994 12:45:26 GMT"
+    assert "if-none-match" not in request.headers
+
+
+def test_build_revalidation_request_already_conditional():
+    controller = CacheControl()
+    request = httpx.Request("GET", "http://testurl", headers={"if-none-match": "*"})
+    response = httpx.Response(200, headers={"etag": '"abc"'})
+    assert (
+        controller.build_revalidation_request(request=request, response=response)
+        is None
+    )
+
+
+def _stale_response(cache_control: str, stale_for: int = 10) -> httpx.Response:
+    date = datetime.now(tz=timezone.utc) - timedelta(seconds=60 + stale_for)
+    return httpx.Response(
+        200,
+        headers={
+            "date": format_datetime(date, usegmt=True),
+            "cache-control": cache_control,
+        },
+    )
+
+
+def test_get_response_staleness():
+    controller = CacheControl()
+    staleness = controller.get_response_staleness(
+        response=_stale_response("max-age=60", stale_for=10)
+    )
+    assert timedelta(seconds=9) < staleness < timedelta(seconds=11)
+
+
+def test_get_response_staleness_with_expires():
+    controller = CacheControl()
+    now = datetime.now(tz=timezone.utc)
+    response = httpx.Response(
+        200,
+        headers={
+            "date": format_datetime(now - timedelta(seconds=30), usegmt=True),
+            "expires": format_datetime(now - timedelta(seconds=20), usegmt=True),
+        },
+    )
+    staleness = controller.get_response_staleness(response=response)
+    assert timedelta(seconds=19) < staleness < timedelta(seconds=21)
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {},
+        {"date": "Tue, 15 Nov 1994 12:45:26 GMT"},
+        {"cache-control": "no-store", "last-modified": "invalid"},
+    ],
+)
+def test_get_response_staleness_unknown(headers):
+    controller = CacheControl()
+    response = httpx.Response(200, headers=headers)
+    assert controller.get_response_staleness(response=response) is None
+
+
+@pytest.mark.parametrize(
+    "cache_control,stale_for,expected",
+    [
+        ("max-age=60", 10, False),
+        ("max-age=60, stale-while-revalidate=30", 10, True),
+        ("max-age=60, stale-while-revalidate=30", 40, False),
+        ("max-age=60, stale-while-revalidate=30, must-revalidate", 10, False),
+        ("max-age=60, stale-if-error=30", 10, False),
+    ],
+)
+def test_allows_stale_while_revalidate(
+    cache_control, stale_for, expected, httpx_request
+):
+    controller = CacheControl()
+    response = _stale_response(cache_control, stale_for=stale_for)
+    assert (
+        controller.allows_stale_while_revalidate(
+            request=httpx_request, response=response
+        )
+        is expected
+    )
+
+
+@pytest.mark.parametrize(
+    "request_cc,response_cc,expected",
+    [
+        (None, "max-age=60", False),
+        (None, "max-age=60, stale-if-error=30", True),
+        ("stale-if-error=30", "max-age=60", True),
+        ("stale-if-error=5", "max-age=60, stale-if-error=30", False),
+    ],
+)
+def test_allows_stale_if_error(request_cc, response_cc, expected):
+    controller = CacheControl()
+    headers = {"cache-control": request_cc} if request_cc else {}
+    request = httpx.Request("GET", "http://testurl", headers=headers)
+    response = _stale_response(response_cc, stale_for=10)
+    assert (
+        controller.allows_stale_if_error(request=request, response=response) is expected
+    )
+
+
+@pytest.mark.parametrize(
+    "request_cc,response_headers,expected",
+    [
+        (None, {"cache-control": "max-age=60"}, True),
+        (None, {"cache-control": "max-age=60", "etag": '"abc"'}, False),
+        (None, {"cache-control": "max-age=60", "last-modified": "x"}, False),
+        (None, {"cache-control": "max-age=60, stale-if-error=30"}, False),
+        (None, {"cache-control": "max-age=60, stale-if-error=5"}, True),
+        (
+            None,
+            {"cache-control": "max-age=60, stale-if-error=30, must-revalidate"},
+            True,
+        ),
+        (None, {"cache-control": "max-age=86400"}, False),
+        (None, {}, False),
+        (None, {"expires": "invalid"}, True),
+        ("max-age=3600", {"cache-control": "max-age=60"}, False),
+        ("max-stale", {"cache-control": "max-age=60"}, False),
+    ],
+)
+def test_is_response_unusable(request_cc, response_headers, expected):
+    headers = {"cache-control": request_cc} if request_cc else {}
+    request = httpx.Request("GET", "http://testurl", headers=headers)
+    date = datetime.now(tz=timezone.utc) - timedelta(seconds=70)
+    response = httpx.Response(
+        200, headers={"date": format_datetime(date, usegmt=True), **response_headers}
+    )
+    metadata = get_cache_metadata(response)
+    assert is_response_unusable(request=request, metadata=metadata) is expected
+
+
+def test_is_response_unusable_permanent_redirect():
+    request = httpx.Request("GET", "http://testurl")
+    response = httpx.Response(301, headers={"expires": "invalid"})
+    metadata = get_cache_metadata(response)
+    assert is_response_unusable(request=request, metadata=metadata) is False
+
+
+def _response(
+    elapsed: int = 0, status_code: int = 200, **headers: str
+) -> httpx.Response:
+    # response dated 'elapsed' seconds ago
+    date = datetime.now(tz=timezone.utc) - timedelta(seconds=elapsed)
+    return httpx.Response(
+        status_code,
+        headers={
+            "date": format_datetime(date, usegmt=True),
+            **{name.replace("_", "-"): value for name, value in headers.items()},
+        },
+    )
+
+
+def test_is_response_fresh_with_age_header(httpx_request):
+    controller = CacheControl()
+    response = _response(cache_control="max-age=60", age="30")
+    assert controller.is_response_fresh(request=httpx_request, response=response)
+    response = _response(cache_control="max-age=60", age="90")
+    assert not controller.is_response_fresh(request=httpx_request, response=response)
+
+
+@pytest.mark.parametrize(
+    "age,status_code,expected",
+    [
+        # 10% of 10 hours since last modified: 1 hour
+        (600, 200, True),
+        (7200, 200, False),
+        (600, 404, True),
+        # not heuristically cacheable
+        (600, 201, False),
+    ],
+)
+def test_is_response_fresh_heuristic(httpx_request, age, status_code, expected):
+    controller = CacheControl()
+    modified = datetime.now(tz=timezone.utc) - timedelta(seconds=age, hours=10)
+    response = _response(
+        elapsed=age,
+        status_code=status_code,
+        last_modified=format_datetime(modified, usegmt=True),
+    )
+    assert (
+        controller.is_response_fresh(request=httpx_request, response=response)
+        is expected
+    )
+
+
+def test_is_response_fresh_with_response_no_cache(httpx_request):
+    controller = CacheControl()
+    response = _response(cache_control="max-age=60, no-cache")
+    assert not controller.is_response_fresh(request=httpx_request, response=response)
+
+
+@pytest.mark.parametrize(
+    "request_cc,response_cc,expected",
+    [
+        ("max-stale", "max-age=60", True),
+        ("max-stale=60", "max-age=60", True),
+        ("max-stale=10", "max-age=60", False),
+        ("max-stale", "max-age=60, must-revalidate", False),
+        # proxy-revalidate only applies to shared caches
+        ("max-stale", "max-age=60, proxy-revalidate", True),
+    ],
+)
+def test_is_response_fresh_with_max_stale(request_cc, response_cc, expected):
+    controller = CacheControl()
+    request = httpx.Request(
+        "GET", "http://testurl", headers={"cache-control": request_cc}
+    )
+    response = _response(elapsed=90, cache_control=response_cc)
+    assert controller.is_response_fresh(request=request, response=response) is expected
+
+
+@pytest.mark.parametrize(
+    "shared,response_cc,expected",
+    [
+        (False, "max-age=60, s-maxage=3600", False),
+        (True, "max-age=60, s-maxage=3600", True),
+        (True, "max-age=3600, s-maxage=60", False),
+    ],
+)
+def test_is_response_fresh_with_s_maxage(httpx_request, shared, response_cc, expected):
+    controller = CacheControl(shared=shared)
+    response = _response(elapsed=120, cache_control=response_cc)
+    assert (
+        controller.is_response_fresh(request=httpx_request, response=response)
+        is expected
+    )
+
+
+@pytest.mark.parametrize(
+    "response_cc,expected",
+    [
+        ("max-age=60, stale-while-revalidate=60", True),
+        ("s-maxage=60, stale-while-revalidate=60", False),
+        ("max-age=60, proxy-revalidate, stale-while-revalidate=60", False),
+    ],
+)
+def test_allows_stale_while_revalidate_shared(httpx_request, response_cc, expected):
+    controller = CacheControl(shared=True)
+    response = _response(elapsed=90, cache_control=response_cc)
+    assert (
+        controller.allows_stale_while_revalidate(
+            request=httpx_request, response=response
+        )
+        is expected
+    )
+
+
+@pytest.mark.parametrize(
+    "shared,request_headers,response_cc,expected",
+    [
+        (False, {}, "private", True),
+        (True, {}, "private", False),
+        (False, {"authorization": "token"}, "max-age=60", True),
+        (True, {"authorization": "token"}, "max-age=60", False),
+        (True, {"authorization": "token"}, "max-age=60, public", True),
+        (True, {"authorization": "token"}, "max-age=60, must-revalidate", True),
+        (True, {"authorization": "token"}, "s-maxage=60", True),
+    ],
+)
+def test_is_response_cacheable_shared(shared, request_headers, response_cc, expected):
+    controller = CacheControl(shared=shared)
+    request = httpx.Request("GET", "http://testurl", headers=request_headers)
+    response = _response(cache_control=response_cc)
+    assert (
+        controller.is_response_cacheable(request=request, response=response) is expected
+    )
@@ -18,7 +18,9 @@ def test_httpx_cache_client_with_existing_cache_control_transport():
 
 def test_httpx_cache_client(respx_mock):
     my_route = respx_mock.get("https://example.org/").mock(
-        return_value=httpx.Response(200, json={"foo": "bar"})
+        return_value=httpx.Response(
+            200, headers={"cache-control": "max-age=60"}, json={"foo": "bar"}
+        )
     )
     with httpx_cache.Client() as client:
         assert isinstance(client, httpx.Client)
@@ -44,7 +46,9 @@ async def test_httpx_cache_async_client_with_existing_cache_control_transport():
 
 async def test_httpx_cache_async_client(respx_mock):
     my_route = respx_mock.get("https://example.org/").mock(
-        return_value=httpx.Response(200, json={"foo": "bar"})
+        return_value=httpx.Response(
+            200, headers={"cache-control": "max-age=60"}, json={"foo": "bar"}
+        )
     )
     async with httpx_cache.AsyncClient() as client:
         assert isinstance(client, httpx.AsyncClient)
@@ -56,3 +60,16 @@ async def test_httpx_cache_async_client(respx_mock):
         assert getattr(cached, "from_cache") is True
         assert cached.status_code == response.status_code == 200
         assert cached.json() == response.json() == {"foo": "bar"}
+
+
+def test_client_cache_key(respx_mock):
+    route = respx_mock.get("https://example.org/").mock(
+        return_value=httpx.Response(
+            200, headers={"cache-control": "max-age=60"}, json={"foo": "bar"}
+        )
+    )
+    with httpx_cache.Client(cache_key=httpx_cache.CacheKey()) as client:
+        client.get("https://example.org/?utm_source=a")
+        cached = client.get("https://example.org/?utm_source=b")
+        assert route.call_count == 1
+        assert getattr(cached, "from_cache") is True
@@ -0,0 +1,55 @@
+import httpx_cache
+from httpx_cache.metrics import Histogram
+
+
+def test_cache_metrics_noop():
+    metrics = httpx_cache.CacheMetrics()
+    metrics.incr("hits", backend="DictCache")
+    metrics.observe("get_seconds", 0.1, backend="DictCache")
+
+
+def test_histogram():
+    histogram = Histogram(buckets=[0.1, 0.01])
+    for value in (0.005, 0.01, 0.05, 2.0):
+        histogram.observe(value)
+    assert histogram.buckets == (0.01, 0.1)
+    assert histogram.count == 4
+    assert histogram.sum == 2.065
+    assert histogram.cumulative_counts() == [(0.01, 2), (0.1, 3), (float("inf"), 4)]
+
+
+def test_cache_stats_counters():
+    stats = httpx_cache.CacheStats()
+    assert stats.hit_ratio() == 0.0
+
+    stats.incr("hits", backend="DictCache")
+    stats.incr("hits", 2, backend="RedisCache")
+    stats.incr("stale_hits", backend="RedisCache")
+    stats.incr("misses", backend="RedisCache")
+    assert stats.get("hits") == 3
+    assert stats.get("hits", "RedisCache") == 2
+    assert stats.get("evictions") == 0
+    assert stats.hit_ratio() == 0.8
+    assert stats.hit_ratio("RedisCache") == 0.75
+    # missed a fresh response, served a stale one on error
+    stats.incr("misses", backend="RedisCache")
+    stats.incr("stale_if_error", backend="RedisCache")
+    assert stats.hit_ratio("RedisCache") == 0.8
+
+    stats.reset()
+    assert stats.get("hits") == 0
+
+
+def test_cache_stats_collect():
+    stats = httpx_cache.CacheStats(namespace="test", buckets=(0.01, 0.1))
+    stats.incr("hits", backend="DictCache")
+    stats.observe("get_seconds", 0.05, backend="DictCache")
+
+    assert stats.collect() == [
+        ("test_hits_total", {"backend": "DictCache"}, 1),
+        ("test_get_seconds_bucket", {"backend": "DictCache", "le": "0.01"}, 0),
+        ("test_get_seconds_bucket", {"backend": "DictCache", "le": "0.1"}, 1),
+        ("test_get_seconds_bucket", {"backend": "DictCache", "le": "+Inf"}, 1),
+        ("test_get_seconds_sum", {"backend": "DictCache"}, 0.05),
+        ("test_get_seconds_count", {"backend": "DictCache"}, 1),
+    ]
@@ -1,23 +1,38 @@
+import gzip
+import time
+import typing as tp
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
 
+import anyio
 import httpx
 import mock
 import pytest
 
 import httpx_cache
+from httpx_cache.cache.file import _FileWriter
+from httpx_cache.cache.redis import RedisCache, _RedisWriter
+from httpx_cache.utils import FileByteStream
 
 pytestmark = pytest.mark.anyio
 
 
+# responses without an explicit expiration are never fresh
+FRESH_HEADERS = {"cache-control": "max-age=3600"}
+
+
 def random_response_handler(request: httpx.Request) -> httpx.Response:
     content = f"{request.url}-{uuid.uuid4()}"
-    return httpx.Response(200, content=content.encode())
+    return httpx.Response(200, headers=FRESH_HEADERS, content=content.encode())
 
 
 def stream_response_handler(request: httpx.Request) -> httpx.Response:
     content = f"{request.url}-{uuid.uuid4()}"
     stream = httpx.ByteStream(content.encode())
-    return httpx.Response(200, stream=stream)
+    return httpx.Response(200, headers=FRESH_HEADERS, stream=stream)
 
 
 def test_cache_control_transport_init_defaults():
@@ -40,6 +55,23 @@ def test_cache_control_transport_init_defaults():
     )
     assert transport.controller.always_cache is False
     assert async_transport.controller.always_cache is False
+    assert transport.controller.shared is False
+    assert async_transport.controller.shared is False
+
+
+def test_cache_control_transport_without_expiration(cache: httpx_cache.BaseCache):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=str(uuid.uuid4()).encode())
+
+    with httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    ) as transport:
+        request = httpx.Request("GET", "http://test-without-expiration")
+        response = transport.handle_request(request)
+        # cached but never fresh, fetched again
+        response2 = transport.handle_request(request)
+        assert getattr(response2, "from_cache") is False
+        assert response.read() != response2.read()
 
 
 def test_cache_control_transport_handle_request(cache: httpx_cache.BaseCache):
@@ -423,3 +455,975 @@ async def test_cache_control_transport_handle_async_request_with_response_stream
     assert not hasattr(response2, "_content")
     assert await response2.aread() == response.content
     await transport.aclose()
+
+
+class RevalidationHandler:
+    """Origin that answers '304 Not Modified' to matching conditional requests."""
+
+    etag = '"v1"'
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request)
+        if request.headers.get("if-none-match") == self.etag:
+            return httpx.Response(
+                304,
+                headers={
+                    "date": format_datetime(datetime.now(tz=timezone.utc), usegmt=True),
+                    "etag": self.etag,
+                    "x-revalidated": "true",
+                },
+            )
+        stale_date = datetime.now(tz=timezone.utc) - timedelta(hours=1)
+        return httpx.Response(
+            200,
+            headers={
+                "date": format_datetime(stale_date, usegmt=True),
+                "etag": self.etag,
+                "cache-control": "max-age=60",
+            },
+            content=f"{request.url}-{uuid.uuid4()}".encode(),
+        )
+
+
+def test_cache_control_transport_handle_request_revalidation(
+    cache: httpx_cache.BaseCache,
+):
+    handler = RevalidationHandler()
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+
+    response = transport.handle_request(request)
+    assert getattr(response, "from_cache") is False
+
+    # cached response is stale, it is revalidated with the origin
+    response2 = transport.handle_request(request)
+    assert getattr(response2, "from_cache") is True
+    assert response2.read() == response.read()
+    assert response2.headers["x-revalidated"] == "true"
+    assert handler.calls[1].headers["if-none-match"] == handler.etag
+    assert "if-none-match" not in request.headers
+
+    # refreshed response is fresh again
+    response3 = transport.handle_request(request)
+    assert getattr(response3, "from_cache") is True
+    assert response3.read() == response.content
+    assert len(handler.calls) == 2
+    transport.close()
+
+
+async def test_cache_control_transport_handle_async_request_revalidation(
+    cache: httpx_cache.BaseCache,
+):
+    handler = RevalidationHandler()
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+
+    response = await transport.handle_async_request(request)
+    assert getattr(response, "from_cache") is False
+
+    # cached response is stale, it is revalidated with the origin
+    response2 = await transport.handle_async_request(request)
+    assert getattr(response2, "from_cache") is True
+    assert await response2.aread() == await response.aread()
+    assert response2.headers["x-revalidated"] == "true"
+    assert handler.calls[1].headers["if-none-match"] == handler.etag
+
+    # refreshed response is fresh again
+    response3 = await transport.handle_async_request(request)
+    assert getattr(response3, "from_cache") is True
+    assert await response3.aread() == response.content
+    assert len(handler.calls) == 2
+    await transport.aclose()
+
+
+class GzipRevalidationHandler(RevalidationHandler):
+    """Same as RevalidationHandler, with a gzip encoded content."""
+
+    content = b"Hello, world!" * 100
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        response = super().__call__(request)
+        if response.status_code == 304:
+            return response
+        return httpx.Response(
+            200,
+            headers={
+                "date": response.headers["date"],
+                "etag": self.etag,
+                "cache-control": "max-age=60",
+                "content-encoding": "gzip",
+            },
+            content=gzip.compress(self.content),
+        )
+
+
+def test_cache_control_transport_encoded_content(cache: httpx_cache.BaseCache):
+    handler = GzipRevalidationHandler()
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    with httpx.Client(transport=transport) as client:
+        # stored, revalidated, then served from the cache: decoded once each time
+        for _ in range(3):
+            assert client.get("http://test-request-1").content == handler.content
+    assert len(handler.calls) == 2
+
+
+async def test_async_cache_control_transport_encoded_content(
+    cache: httpx_cache.BaseCache,
+):
+    handler = GzipRevalidationHandler()
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        for _ in range(3):
+            response = await client.get("http://test-request-1")
+            assert response.content == handler.content
+    assert len(handler.calls) == 2
+
+
+def test_cache_control_transport_revalidation_releases_in_flight(
+    cache: httpx_cache.BaseCache,
+):
+    handler = GzipRevalidationHandler()
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    transport.handle_request(request).read()
+    # stale entry revalidated with a 304, its raw content is read and cached
+    response = transport.handle_request(request)
+    assert response.read() == handler.content
+    assert transport._in_flight._flights == {}
+    transport.close()
+
+
+async def test_async_cache_control_transport_revalidation_releases_in_flight(
+    cache: httpx_cache.BaseCache,
+):
+    handler = GzipRevalidationHandler()
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    await (await transport.handle_async_request(request)).aread()
+    response = await transport.handle_async_request(request)
+    assert await response.aread() == handler.content
+    assert transport._in_flight._flights == {}
+    await transport.aclose()
+
+
+def test_cache_control_transport_handle_request_revalidation_modified(
+    cache: httpx_cache.BaseCache,
+):
+    handler = RevalidationHandler()
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+
+    response = transport.handle_request(request)
+    # resource changed on the origin, a full response is sent back
+    handler.etag = '"v2"'
+    response2 = transport.handle_request(request)
+    assert getattr(response2, "from_cache") is False
+    assert response2.read() != response.read()
+    assert handler.calls[1].headers["if-none-match"] == '"v1"'
+    transport.close()
+
+
+async def test_cache_control_transport_handle_async_request_revalidation_modified(
+    cache: httpx_cache.BaseCache,
+):
+    handler = RevalidationHandler()
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+
+    response = await transport.handle_async_request(request)
+    # resource changed on the origin, a full response is sent back
+    handler.etag = '"v2"'
+    response2 = await transport.handle_async_request(request)
+    assert getattr(response2, "from_cache") is False
+    assert await response2.aread() != await response.aread()
+    assert handler.calls[1].headers["if-none-match"] == '"v1"'
+    await transport.aclose()
+
+
+class FailingRevalidationHandler(RevalidationHandler):
+    """Same as RevalidationHandler, but fails the conditional requests."""
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if "if-none-match" in request.headers:
+            raise httpx.ConnectError("Connection refused", request=request)
+        return super().__call__(request)
+
+
+@pytest.mark.parametrize("failing", [False, True], ids=["modified", "error"])
+def test_cache_control_transport_revalidation_closes_stale_response(
+    tmp_path: Path, failing: bool
+):
+    handler = FailingRevalidationHandler() if failing else RevalidationHandler()
+    # the content of the stale response is lazily read from its file
+    transport = httpx_cache.CacheControlTransport(
+        cache=httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=0),
+        transport=httpx.MockTransport(handler),
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    transport.handle_request(request).read()
+    handler.etag = '"v2"'
+
+    stale = []
+    cache_get = transport._cache_get
+
+    def _cache_get(request: httpx.Request) -> tp.Optional[httpx.Response]:
+        stale.append(cache_get(request))
+        return stale[-1]
+
+    with mock.patch.object(transport, "_cache_get", _cache_get):
+        if failing:
+            with pytest.raises(httpx.ConnectError):
+                transport.handle_request(request)
+        else:
+            assert transport.handle_request(request).from_cache is False  # type: ignore
+    (cached,) = stale
+    assert isinstance(cached.stream, FileByteStream) and cached.stream.file.closed
+    transport.close()
+
+
+@pytest.mark.parametrize("failing", [False, True], ids=["modified", "error"])
+async def test_async_cache_control_transport_revalidation_closes_stale_response(
+    tmp_path: Path, failing: bool
+):
+    handler = FailingRevalidationHandler() if failing else RevalidationHandler()
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=0),
+        transport=httpx.MockTransport(handler),
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    await (await transport.handle_async_request(request)).aread()
+    handler.etag = '"v2"'
+
+    stale = []
+    cache_get = transport._cache_get
+
+    async def _cache_get(request: httpx.Request) -> tp.Optional[httpx.Response]:
+        stale.append(await cache_get(request))
+        return stale[-1]
+
+    with mock.patch.object(transport, "_cache_get", _cache_get):
+        if failing:
+            with pytest.raises(httpx.ConnectError):
+                await transport.handle_async_request(request)
+        else:
+            response = await transport.handle_async_request(request)
+            assert response.from_cache is False  # type: ignore
+    (cached,) = stale
+    assert isinstance(cached.stream, FileByteStream) and cached.stream.file.closed
+    await transport.aclose()
+
+
+class StaleHandler:
+    """Origin that sends responses stale by 10 seconds, or fails if 'failing'."""
+
+    def __init__(self, cache_control: str) -> None:
+        self.cache_control = cache_control
+        self.failing: tp.Optional[int] = None
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.failing == 0:
+            raise httpx.ConnectError("Connection refused", request=request)
+        if self.failing is not None:
+            return httpx.Response(self.failing)
+        date = datetime.now(tz=timezone.utc) - timedelta(seconds=70)
+        return httpx.Response(
+            200,
+            headers={
+                "date": format_datetime(date, usegmt=True),
+                "cache-control": self.cache_control,
+            },
+            content=f"{request.url}-{uuid.uuid4()}".encode(),
+        )
+
+
+def test_cache_control_transport_stale_while_revalidate(
+    cache: httpx_cache.BaseCache,
+):
+    handler = StaleHandler("max-age=60, stale-while-revalidate=30")
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    response = transport.handle_request(request)
+
+    # stale response is served, and refreshed in background
+    response2 = transport.handle_request(request)
+    assert getattr(response2, "from_cache") is True
+    assert response2.read() == response.read()
+
+    # wait for background revalidation
+    transport._executor.shutdown(wait=True)
+    assert handler.calls == 2
+    refreshed = transport.cache.get(request)
+    assert refreshed.read() != response.content
+    transport.close()
+
+
+async def test_async_cache_control_transport_stale_while_revalidate(
+    cache: httpx_cache.BaseCache,
+):
+    handler = StaleHandler("max-age=60, stale-while-revalidate=30")
+    async with httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    ) as transport:
+        request = httpx.Request("GET", "http://test-request-1")
+        response = await transport.handle_async_request(request)
+
+        # stale response is served, and refreshed in background
+        response2 = await transport.handle_async_request(request)
+        assert getattr(response2, "from_cache") is True
+        assert await response2.aread() == await response.aread()
+
+        # only one background revalidation is started per key
+        await transport.handle_async_request(request)
+        assert len(transport._refreshing) == 1
+
+    assert handler.calls == 2
+    refreshed = await cache.aget(request)
+    assert await refreshed.aread() != response.content
+
+
+async def test_async_cache_control_transport_stale_while_revalidate_no_task_group(
+    cache: httpx_cache.BaseCache,
+):
+    handler = StaleHandler("max-age=60, stale-while-revalidate=30")
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    response = await transport.handle_async_request(request)
+
+    # transport is not used as a context manager, revalidated in foreground
+    response2 = await transport.handle_async_request(request)
+    assert getattr(response2, "from_cache") is False
+    assert await response2.aread() != await response.aread()
+    await transport.aclose()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio", "trio"])
+async def test_async_cache_control_transport_closed_from_another_task():
+    handler = StaleHandler("max-age=60, stale-while-revalidate=30")
+    transport = httpx_cache.AsyncCacheControlTransport(
+        transport=httpx.MockTransport(handler)
+    )
+    await transport.__aenter__()
+    request = httpx.Request("GET", "http://test-request-1")
+    response = await transport.handle_async_request(request)
+    await response.aread()
+    # stale response is served, and refreshed in background
+    response2 = await transport.handle_async_request(request)
+    assert getattr(response2, "from_cache") is True
+
+    # no cancel scope is held by the transport, it can be exited from any task
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(transport.__aexit__)
+    assert handler.calls == 2
+    assert transport._refreshing == set()
+
+
+@pytest.mark.parametrize("failing", [0, 503])
+def test_cache_control_transport_stale_if_error(
+    failing: int, cache: httpx_cache.BaseCache
+):
+    handler = StaleHandler("max-age=60, stale-if-error=30")
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    response = transport.handle_request(request)
+
+    handler.failing = failing
+    response2 = transport.handle_request(request)
+    assert getattr(response2, "from_cache") is True
+    assert response2.read() == response.read()
+    transport.close()
+
+
+@pytest.mark.parametrize("failing", [0, 503])
+async def test_async_cache_control_transport_stale_if_error(
+    failing: int, cache: httpx_cache.BaseCache
+):
+    handler = StaleHandler("max-age=60, stale-if-error=30")
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    response = await transport.handle_async_request(request)
+
+    handler.failing = failing
+    response2 = await transport.handle_async_request(request)
+    assert getattr(response2, "from_cache") is True
+    assert await response2.aread() == await response.aread()
+    await transport.aclose()
+
+
+def test_cache_control_transport_stale_without_stale_if_error(
+    cache: httpx_cache.BaseCache,
+):
+    handler = StaleHandler("max-age=60")
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    transport.handle_request(request)
+
+    handler.failing = 0
+    with pytest.raises(httpx.ConnectError):
+        transport.handle_request(request)
+    handler.failing = 503
+    assert transport.handle_request(request).status_code == 503
+    transport.close()
+
+
+def test_cache_control_transport_coalesce_concurrent_misses(
+    cache: httpx_cache.BaseCache,
+):
+    calls = []
+
+    def slow_handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        time.sleep(0.1)
+        return random_response_handler(request)
+
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(slow_handler)
+    )
+
+    def _send(_: int) -> httpx.Response:
+        return transport.handle_request(httpx.Request("GET", "http://test-request-1"))
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        responses = list(executor.map(_send, range(10)))
+
+    assert len(calls) == 1
+    assert sorted(getattr(r, "from_cache") for r in responses) == [False] + [True] * 9
+    assert len({r.read() for r in responses}) == 1
+    transport.close()
+
+
+async def test_async_cache_control_transport_coalesce_concurrent_misses(
+    cache: httpx_cache.BaseCache,
+):
+    calls = []
+
+    async def slow_handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await anyio.sleep(0.1)
+        return stream_response_handler(request)
+
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(slow_handler)
+    )
+    responses = []
+
+    async def _send() -> None:
+        request = httpx.Request("GET", "http://test-request-1")
+        response = await transport.handle_async_request(request)
+        # waiters get the response only after leader's stream is consumed/cached
+        await response.aread()
+        responses.append(response)
+
+    async with anyio.create_task_group() as task_group:
+        for _ in range(50):
+            task_group.start_soon(_send)
+
+    assert len(calls) == 1
+    assert sorted(getattr(r, "from_cache") for r in responses) == [False] + [True] * 49
+    assert len({r.content for r in responses}) == 1
+    await transport.aclose()
+
+
+def test_cache_control_transport_coalesce_same_thread(cache: httpx_cache.BaseCache):
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(stream_response_handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    # first streaming response is not consumed yet
+    response = transport.handle_request(request)
+    # same thread does not wait for its own in-flight request
+    response2 = transport.handle_request(request)
+    assert getattr(response2, "from_cache") is False
+    response.close()
+    response2.close()
+    transport.close()
+
+
+async def test_async_cache_control_transport_coalesce_uncacheable(
+    cache: httpx_cache.BaseCache,
+):
+    calls = []
+
+    async def slow_handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await anyio.sleep(0.1)
+        return httpx.Response(200, headers={"cache-control": "no-store"})
+
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(slow_handler)
+    )
+
+    async def _send() -> None:
+        request = httpx.Request("GET", "http://test-request-1")
+        response = await transport.handle_async_request(request)
+        assert getattr(response, "from_cache") is False
+
+    async with anyio.create_task_group() as task_group:
+        for _ in range(5):
+            task_group.start_soon(_send)
+
+    # response is not cacheable, waiters send their own request
+    assert len(calls) == 5
+    await transport.aclose()
+
+
+class SlowRevalidationHandler(RevalidationHandler):
+    """Same as RevalidationHandler, but takes 0.1 seconds to answer."""
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(0.1)
+        return super().__call__(request)
+
+
+def test_cache_control_transport_coalesce_closes_stale_response(tmp_path: Path):
+    handler = SlowRevalidationHandler()
+    # the content of the stale responses is lazily read from their file
+    transport = httpx_cache.CacheControlTransport(
+        cache=httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=0),
+        transport=httpx.MockTransport(handler),
+    )
+    transport.handle_request(httpx.Request("GET", "http://test-request-1")).read()
+
+    stale = []
+    cache_get = transport._cache_get
+
+    def _cache_get(request: httpx.Request) -> tp.Optional[httpx.Response]:
+        cached = cache_get(request)
+        stale.append(cached.stream)  # type: ignore
+        return cached
+
+    def _send(_: int) -> bytes:
+        request = httpx.Request("GET", "http://test-request-1")
+        return transport.handle_request(request).read()
+
+    with mock.patch.object(transport, "_cache_get", _cache_get):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert len(set(executor.map(_send, range(2)))) == 1
+    # one revalidation, the waiter is coalesced onto it
+    assert len(handler.calls) == 2
+    # both stale responses and the one read after the revalidation
+    assert len(stale) == 3
+    for stream in stale:
+        assert isinstance(stream, FileByteStream) and stream.file.closed
+    transport.close()
+
+
+async def test_async_cache_control_transport_coalesce_closes_stale_response(
+    tmp_path: Path,
+):
+    handler = RevalidationHandler()
+
+    async def slow_handler(request: httpx.Request) -> httpx.Response:
+        await anyio.sleep(0.1)
+        return handler(request)
+
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=httpx_cache.FileCache(cache_dir=tmp_path, mmap_threshold=0),
+        transport=httpx.MockTransport(slow_handler),
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    await (await transport.handle_async_request(request)).aread()
+
+    stale = []
+    cache_get = transport._cache_get
+
+    async def _cache_get(request: httpx.Request) -> tp.Optional[httpx.Response]:
+        cached = await cache_get(request)
+        stale.append(cached.stream)  # type: ignore
+        return cached
+
+    async def _send() -> None:
+        request = httpx.Request("GET", "http://test-request-1")
+        await (await transport.handle_async_request(request)).aread()
+
+    with mock.patch.object(transport, "_cache_get", _cache_get):
+        async with anyio.create_task_group() as task_group:
+            for _ in range(2):
+                task_group.start_soon(_send)
+    assert len(handler.calls) == 2
+    # both stale responses and the one read after the revalidation
+    assert len(stale) == 3
+    for stream in stale:
+        assert isinstance(stream, FileByteStream) and stream.file.closed
+    await transport.aclose()
+
+
+def vary_response_handler(request: httpx.Request) -> httpx.Response:
+    accept = request.headers.get("accept", "*/*")
+    content = f"{accept}-{uuid.uuid4()}"
+    return httpx.Response(
+        200, headers={"vary": "Accept", **FRESH_HEADERS}, content=content.encode()
+    )
+
+
+def test_cache_control_transport_vary(cache: httpx_cache.BaseCache):
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(vary_response_handler)
+    )
+
+    def _get(accept: str) -> httpx.Response:
+        request = httpx.Request(
+            "GET", "http://test-request-1", headers={"accept": accept}
+        )
+        response = transport.handle_request(request)
+        response.read()
+        return response
+
+    json_response = _get("application/json")
+    xml_response = _get("application/xml")
+    assert getattr(xml_response, "from_cache") is False
+    assert xml_response.content.startswith(b"application/xml")
+
+    # each variant is served from cache to the matching request
+    cached_json = _get("application/json")
+    cached_xml = _get("application/xml")
+    assert getattr(cached_json, "from_cache") is True
+    assert getattr(cached_xml, "from_cache") is True
+    assert cached_json.content == json_response.content
+    assert cached_xml.content == xml_response.content
+
+    # a new cache instance (e.g. another worker) resolves variants from the marker
+    cache.vary_index.clear()
+    assert (
+        cache.get(
+            httpx.Request(
+                "GET", "http://test-request-1", headers={"accept": "application/xml"}
+            )
+        ).read()
+        == xml_response.content
+    )
+    assert cache.get(httpx.Request("GET", "http://test-request-1")) is None
+    transport.close()
+
+
+async def test_async_cache_control_transport_vary(cache: httpx_cache.BaseCache):
+    transport = httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(vary_response_handler)
+    )
+
+    async def _get(accept: str) -> httpx.Response:
+        request = httpx.Request(
+            "GET", "http://test-request-1", headers={"accept": accept}
+        )
+        response = await transport.handle_async_request(request)
+        await response.aread()
+        return response
+
+    json_response = await _get("application/json")
+    xml_response = await _get("application/xml")
+    assert getattr(xml_response, "from_cache") is False
+
+    cached_json = await _get("application/json")
+    cached_xml = await _get("application/xml")
+    assert getattr(cached_json, "from_cache") is True
+    assert getattr(cached_xml, "from_cache") is True
+    assert cached_json.content == json_response.content
+    assert cached_xml.content == xml_response.content
+
+    cache.vary_index.clear()
+    cached = await cache.aget(
+        httpx.Request(
+            "GET", "http://test-request-1", headers={"accept": "application/xml"}
+        )
+    )
+    assert await cached.aread() == xml_response.content
+
+    # deleting a request only deletes its variant
+    await cache.adelete(
+        httpx.Request(
+            "GET", "http://test-request-1", headers={"accept": "application/xml"}
+        )
+    )
+    assert (await _get("application/json")).content == json_response.content
+    assert getattr(await _get("application/xml"), "from_cache") is False
+    await transport.aclose()
+
+
+def test_cache_control_transport_vary_star(cache: httpx_cache.BaseCache):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"vary": "*"}, content=b"data")
+
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler), always_cache=True
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    transport.handle_request(request)
+    assert getattr(transport.handle_request(request), "from_cache") is False
+    transport.close()
+
+
+def test_cache_set_chunks(cache: httpx_cache.BaseCache):
+    request = httpx.Request("GET", "http://test-set-chunks")
+    response = httpx.Response(200, stream=httpx_cache.utils.ChunkedByteStream([]))
+    cache.set_chunks(request=request, response=response, chunks=[b"Hello, ", b"world!"])
+    cached = cache.get(request)
+    assert cached is not None
+    assert cached.read() == b"Hello, world!"
+
+
+async def test_cache_aset_chunks(cache: httpx_cache.BaseCache):
+    request = httpx.Request("GET", "http://test-aset-chunks")
+    response = httpx.Response(200, stream=httpx_cache.utils.ChunkedByteStream([]))
+    await cache.aset_chunks(
+        request=request, response=response, chunks=[b"Hello, ", b"world!"]
+    )
+    cached = await cache.aget(request)
+    assert cached is not None
+    assert await cached.aread() == b"Hello, world!"
+
+
+def test_cache_control_transport_caches_streamed_chunks(cache: httpx_cache.BaseCache):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers=FRESH_HEADERS,
+            stream=httpx_cache.utils.ChunkedByteStream([b"chunk-1", b"chunk-2"]),
+        )
+
+    with httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    ) as transport:
+        request = httpx.Request("GET", "http://test-streamed-chunks")
+        response = transport.handle_request(request)
+        assert response.read() == b"chunk-1chunk-2"
+        response2 = transport.handle_request(request)
+        assert getattr(response2, "from_cache") is True
+        assert response2.read() == b"chunk-1chunk-2"
+
+
+def chunked_response_handler(request: httpx.Request) -> httpx.Response:
+    chunks = [f"chunk-{i}".encode() for i in range(5)]
+    return httpx.Response(
+        200, headers=FRESH_HEADERS, stream=httpx_cache.utils.ChunkedByteStream(chunks)
+    )
+
+
+def _leftovers(cache: httpx_cache.BaseCache) -> tp.List[tp.Any]:
+    # partially written entries (temporary files/keys) left in the backend
+    if isinstance(cache, httpx_cache.FileCache):
+        return list(cache.cache_dir.glob("*.tmp"))
+    if isinstance(cache, RedisCache):
+        keys = [*cache.redis._data, *cache.aredis._data]
+        return [key for key in keys if ":partial:" in key]
+    return []
+
+
+@mock.patch.object(_FileWriter, "flush_size", 1)
+@mock.patch.object(_RedisWriter, "flush_size", 1)
+def test_cache_control_transport_writes_chunks_as_they_arrive(
+    cache: httpx_cache.BaseCache,
+):
+    with httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(chunked_response_handler)
+    ) as transport:
+        request = httpx.Request("GET", "http://test-writes-chunks")
+        response = transport.handle_request(request)
+        chunks = response.iter_raw()
+        assert next(chunks) == b"chunk-0"
+        if isinstance(response.stream.writer, (_FileWriter, _RedisWriter)):
+            # already written to a temporary file/key, not cached yet
+            assert len(_leftovers(cache)) == 1
+        assert cache.get(request) is None
+
+        assert b"".join(chunks) == b"chunk-1chunk-2chunk-3chunk-4"
+        assert _leftovers(cache) == []
+        cached = cache.get(request)
+        assert cached is not None
+        assert cached.read() == b"chunk-0chunk-1chunk-2chunk-3chunk-4"
+
+
+@mock.patch.object(_FileWriter, "flush_size", 1)
+@mock.patch.object(_RedisWriter, "flush_size", 1)
+def test_cache_control_transport_discards_partial_stream(
+    cache: httpx_cache.BaseCache,
+):
+    with httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(chunked_response_handler)
+    ) as transport:
+        request = httpx.Request("GET", "http://test-partial-stream")
+        response = transport.handle_request(request)
+        chunks = response.iter_raw()
+        assert next(chunks) == b"chunk-0"
+        assert next(chunks) == b"chunk-1"
+        response.close()
+
+        assert _leftovers(cache) == []
+        assert cache.get(request) is None
+        assert getattr(transport.handle_request(request), "from_cache") is False
+
+
+@mock.patch.object(_FileWriter, "flush_size", 1)
+@mock.patch.object(_RedisWriter, "flush_size", 1)
+async def test_cache_control_transport_discards_partial_async_stream(
+    cache: httpx_cache.BaseCache,
+):
+    async with httpx_cache.AsyncCacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(chunked_response_handler)
+    ) as transport:
+        request = httpx.Request("GET", "http://test-partial-stream")
+        response = await transport.handle_async_request(request)
+        chunks = response.aiter_raw()
+        assert await chunks.__anext__() == b"chunk-0"
+        assert await chunks.__anext__() == b"chunk-1"
+        await response.aclose()
+
+        assert _leftovers(cache) == []
+        assert await cache.aget(request) is None
+
+        response = await transport.handle_async_request(request)
+        assert getattr(response, "from_cache") is False
+        assert await response.aread() == b"chunk-0chunk-1chunk-2chunk-3chunk-4"
+        cached = await cache.aget(request)
+        assert cached is not None
+        assert await cached.aread() == b"chunk-0chunk-1chunk-2chunk-3chunk-4"
+
+
+def test_cache_control_transport_stale_replaced_without_delete(
+    cache: httpx_cache.BaseCache,
+):
+    stale_date = format_datetime(datetime.now(tz=timezone.utc) - timedelta(hours=1))
+    # with an etag, stale responses are kept by caches with a ttl (e.g. redis)
+    headers = {"date": stale_date, "etag": '"v1"'}
+    cacheable = True
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        cache_control = "max-age=60" if cacheable else "no-store"
+        return httpx.Response(
+            200,
+            content=uuid.uuid4().hex.encode(),
+            headers={**headers, "cache-control": cache_control},
+        )
+
+    transport = httpx_cache.CacheControlTransport(
+        cache=cache, transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-stale-replaced")
+    transport.handle_request(request).read()
+    with mock.patch.object(cache, "delete", wraps=cache.delete) as delete:
+        # stale response is replaced by the new cacheable one
+        response = transport.handle_request(request)
+        response.read()
+        delete.assert_not_called()
+        cached = cache.get(request)
+        assert cached is not None
+        assert cached.read() == response.content
+
+        # stale response is deleted if the new response is not cacheable
+        cacheable = False
+        transport.handle_request(request).read()
+        delete.assert_called_once_with(request)
+        assert cache.get(request) is None
+
+
+def test_cache_control_transport_metrics():
+    handler = StaleHandler("max-age=60, stale-while-revalidate=30")
+    transport = httpx_cache.CacheControlTransport(
+        cache=httpx_cache.DictCache(max_entries=1),
+        transport=httpx.MockTransport(handler),
+    )
+    assert isinstance(transport.metrics, httpx_cache.CacheStats)
+
+    request = httpx.Request("GET", "http://test-request-1")
+    response = transport.handle_request(request)
+    transport.handle_request(request)
+    transport._executor.shutdown(wait=True)
+    transport.handle_request(httpx.Request("GET", "http://test-request-2"))
+    transport.handle_request(httpx.Request("POST", "http://test-request-1"))
+
+    stats = transport.metrics
+    assert stats.get("misses", "DictCache") == 2
+    assert stats.get("stale_hits", "DictCache") == 1
+    assert stats.get("hits") == 0
+    assert stats.get("uncacheable") == 1
+    assert stats.get("evictions") == 1
+    assert stats.get("stored_bytes") == 3 * len(response.content)
+    # the background revalidation also looks up the cache
+    assert stats.histograms[("get_seconds", "DictCache")].count == 4
+    assert stats.histograms[("set_seconds", "DictCache")].count == 3
+    transport.close()
+
+
+async def test_async_cache_control_transport_metrics():
+    handler = RevalidationHandler()
+    metrics = mock.Mock(spec=httpx_cache.CacheMetrics)
+    transport = httpx_cache.AsyncCacheControlTransport(
+        transport=httpx.MockTransport(handler), metrics=metrics
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    await transport.handle_async_request(request)
+    await transport.handle_async_request(request)
+    await transport.handle_async_request(request)
+
+    counters = [(c.args[0], c.args[1]) for c in metrics.incr.call_args_list]
+    assert ("misses", 1) in counters
+    assert ("revalidations", 1) in counters
+    assert ("hits", 1) in counters
+    assert {c.kwargs["backend"] for c in metrics.incr.call_args_list} == {"DictCache"}
+    histograms = [c.args[0] for c in metrics.observe.call_args_list]
+    assert histograms.count("get_seconds") == 3
+    assert histograms.count("set_seconds") == 2
+    await transport.aclose()
+
+
+@pytest.mark.parametrize("failing", [0, 503])
+def test_cache_control_transport_metrics_stale_if_error(failing: int):
+    handler = StaleHandler("max-age=60, stale-if-error=30")
+    transport = httpx_cache.CacheControlTransport(
+        transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    transport.handle_request(request)
+    handler.failing = failing
+    response = transport.handle_request(request)
+    assert response.from_cache  # type: ignore
+    assert transport.metrics.get("stale_if_error") == 1
+    assert transport.metrics.get("stale_hits") == 0
+    # the stale response served on error is a cache hit
+    assert transport.metrics.hit_ratio() == 0.5
+    transport.close()
+
+
+@pytest.mark.parametrize("failing", [0, 503])
+async def test_async_cache_control_transport_metrics_stale_if_error(failing: int):
+    handler = StaleHandler("max-age=60, stale-if-error=30")
+    transport = httpx_cache.AsyncCacheControlTransport(
+        transport=httpx.MockTransport(handler)
+    )
+    request = httpx.Request("GET", "http://test-request-1")
+    await transport.handle_async_request(request)
+    handler.failing = failing
+    response = await transport.handle_async_request(request)
+    assert response.from_cache  # type: ignore
+    assert transport.metrics.get("stale_if_error") == 1
+    assert transport.metrics.hit_ratio() == 0.5
+    await transport.aclose()
@@ -1,13 +1,24 @@
 import uuid
+from datetime import datetime, timezone
 from pathlib import Path
 
 import httpx
+import mock
 import pytest
 
 import httpx_cache
 from httpx_cache.utils import (
+    CacheMetadata,
+    ChunkedByteStream,
+    FileByteStream,
+    get_cache_control,
     get_cache_filepath,
     get_cache_key,
+    get_cache_metadata,
+    get_response_expires,
+    get_sharded_filepath,
+    get_vary_headers,
+    merge_not_modified_response,
     parse_cache_control_headers,
     parse_headers_date,
 )
@@ -100,3 +111,269 @@ async def test_response_async_stream_wrapper(async_streaming_body):
     )
     content = await response.aread()
     assert content == store[key]
+
+
+def test_merge_not_modified_response():
+    cached = httpx.Response(
+        200,
+        headers=[
+            ("date", "Tue, 15 Nov 1994 12:45:26 GMT"),
+            ("etag", '"abc"'),
+            ("x-custom", "value"),
+        ],
+        content=b"cached-content",
+    )
+    not_modified = httpx.Response(
+        304,
+        headers=[
+            ("date", "Wed, 16 Nov 1994 12:45:26 GMT"),
+            ("content-length", "0"),
+            ("set-cookie", "a=1"),
+            ("set-cookie", "b=2"),
+        ],
+    )
+    merged = merge_not_modified_response(cached=cached, response=not_modified)
+    assert merged is cached
+    assert merged.status_code == 200
+    assert merged.content == b"cached-content"
+    assert merged.headers["date"] == "Wed, 16 Nov 1994 12:45:26 GMT"
+    assert merged.headers["content-length"] == "14"
+    assert merged.headers["x-custom"] == "value"
+    assert merged.headers.get_list("set-cookie") == ["a=1", "b=2"]
+
+
+def test_response_stream_wrapper_on_close(streaming_body):
+    response = httpx.Response(200, content=streaming_body)
+    closed = []
+    response.stream = httpx_cache.ByteStreamWrapper(
+        stream=response.stream,
+        callback=lambda content: None,
+        on_close=lambda: closed.append(True),
+    )
+    response.read()
+    response.close()
+    # hook is only called once
+    assert closed == [True]
+
+
+@pytest.mark.parametrize(
+    "vary,expected",
+    [
+        (None, ()),
+        ("Accept", ("accept",)),
+        ("Accept-Encoding, accept ,Accept", ("accept", "accept-encoding")),
+        ("*", ("*",)),
+    ],
+)
+def test_get_vary_headers(vary, expected):
+    headers = httpx.Headers({"vary": vary} if vary else {})
+    assert get_vary_headers(headers) == expected
+
+
+def test_get_cache_key_with_vary():
+    json_request = httpx.Request(
+        "GET", "http://httpx-cache", headers={"accept": "application/json"}
+    )
+    xml_request = httpx.Request(
+        "GET", "http://httpx-cache", headers={"accept": "application/xml"}
+    )
+    no_accept_request = httpx.Request("GET", "http://httpx-cache")
+    keys = {
+        get_cache_key(request, vary=("accept",))
+        for request in (json_request, xml_request, no_accept_request)
+    }
+    assert len(keys) == 3
+    assert all(key.startswith("http://httpx-cache#vary=") for key in keys)
+    assert get_cache_key(json_request, vary=()) == "http://httpx-cache"
+    # headers not listed in vary are ignored
+    assert get_cache_key(json_request, vary=("accept-encoding",)) == get_cache_key(
+        xml_request, vary=("accept-encoding",)
+    )
+
+
+def test_get_cache_filepath_with_key(httpx_request):
+    cache_dir = Path("./some-relative-dir")
+    assert get_cache_filepath(
+        cache_dir, httpx_request, key="http://httpx-cache"
+    ) == get_cache_filepath(cache_dir, httpx_request)
+    assert get_cache_filepath(
+        cache_dir, httpx_request, key="other-key"
+    ) != get_cache_filepath(cache_dir, httpx_request)
+
+
+def test_chunked_byte_stream():
+    stream = ChunkedByteStream([b"Hello, ", b"world!"])
+    assert list(stream) == [b"Hello, ", b"world!"]
+    assert httpx.Response(200, stream=stream).read() == b"Hello, world!"
+
+
+def test_byte_stream_wrapper_chunked():
+    store = {}
+    stream = httpx_cache.ByteStreamWrapper(
+        stream=ChunkedByteStream([b"a", b"b"]),
+        callback=lambda chunks: store.update(chunks=chunks),
+        chunked=True,
+    )
+    assert list(stream) == [b"a", b"b"]
+    assert store["chunks"] == [b"a", b"b"]
+    assert stream.content == b"ab"
+
+
+def test_file_byte_stream(tmp_path: Path):
+    filepath = tmp_path / "stream"
+    filepath.write_bytes(b"head" + b"x" * 100)
+    stream = FileByteStream(filepath.open("rb"), offset=4, size=100)
+    stream.chunk_size = 30
+    assert [len(chunk) for chunk in stream] == [30, 30, 30, 10]
+    stream.close()
+    assert stream.file.closed
+
+
+async def test_file_byte_stream_async_empty(tmp_path: Path):
+    filepath = tmp_path / "stream"
+    filepath.write_bytes(b"head")
+    stream = FileByteStream(filepath.open("rb"), offset=4, size=0)
+    assert [chunk async for chunk in stream] == []
+    await stream.aclose()
+    assert stream.file.closed
+
+
+def test_get_sharded_filepath():
+    cache_dir = Path("./some-relative-dir")
+    assert get_sharded_filepath(cache_dir, "abcdef") == cache_dir / "abcdef"
+    assert get_sharded_filepath(cache_dir, "abcdef", shards=2) == Path(
+        "some-relative-dir/ab/cd/abcdef"
+    )
+    filepath = get_cache_filepath(cache_dir, httpx.Request("GET", "http://a"), shards=1)
+    assert filepath.parent == cache_dir / filepath.name[:2]
+
+
+def test_get_response_expires():
+    date = "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert get_response_expires(httpx.Headers()) is None
+    assert get_response_expires(
+        httpx.Headers({"date": date, "cache-control": "max-age=60"})
+    ) == datetime(2024, 1, 1, 0, 1, tzinfo=timezone.utc)
+    assert get_response_expires(
+        httpx.Headers({"date": date, "expires": "Mon, 01 Jan 2024 01:00:00 GMT"})
+    ) == datetime(2024, 1, 1, 1, tzinfo=timezone.utc)
+    # without a date, max-age starts now
+    expires = get_response_expires(httpx.Headers({"cache-control": "max-age=60"}))
+    assert expires is not None
+    assert expires > datetime.now(tz=timezone.utc)
+
+
+def test_get_cache_control_memoized():
+    request = httpx.Request(
+        "GET", "http://a", headers={"cache-control": "max-age=0, no-cache"}
+    )
+    with mock.patch(
+        "httpx_cache.utils.parse_cache_control_headers",
+        wraps=parse_cache_control_headers,
+    ) as parse:
+        assert get_cache_control(request) == {"max-age": 0, "no-cache": None}
+        assert get_cache_control(request) == {"max-age": 0, "no-cache": None}
+        assert parse.call_count == 1
+
+        # replaced headers are parsed again
+        request.headers = httpx.Headers({"cache-control": "no-store"})
+        assert get_cache_control(request) == {"no-store": None}
+        assert parse.call_count == 2
+
+
+def test_cache_metadata_from_headers():
+    date = "Mon, 01 Jan 2024 00:00:00 GMT"
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+    metadata = CacheMetadata.from_headers(httpx.Headers(), response_time=timestamp)
+    assert metadata == CacheMetadata(
+        directives={}, date=None, lifetime=None, response_time=timestamp
+    )
+    assert metadata.expires is None
+
+    metadata = CacheMetadata.from_headers(
+        httpx.Headers({"date": date, "cache-control": "max-age=60, public"})
+    )
+    assert metadata.directives == {"max-age": 60, "public": None}
+    assert metadata.date == timestamp
+    assert metadata.expires == timestamp + 60
+
+    metadata = CacheMetadata.from_headers(
+        httpx.Headers({"date": date, "expires": "Mon, 01 Jan 2024 01:00:00 GMT"})
+    )
+    assert metadata.lifetime == 3600
+    assert metadata.has_expires
+
+    # invalid expires, already expired
+    metadata = CacheMetadata.from_headers(httpx.Headers({"date": date, "expires": "0"}))
+    assert metadata.lifetime == 0
+    assert metadata.has_expires
+
+    assert CacheMetadata.from_state(metadata.to_state()) == metadata
+
+
+def test_cache_metadata_age():
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    headers = {"date": "Mon, 01 Jan 2024 00:00:00 GMT", "cache-control": "max-age=60"}
+
+    # received 10s after its date
+    metadata = CacheMetadata.from_headers(
+        httpx.Headers(headers), response_time=date + 10
+    )
+    assert metadata.age == 10
+    assert metadata.get_current_age(now=date + 30) == 30
+    assert metadata.expires == date + 60
+
+    # the 'Age' header is used when it's bigger than the apparent age
+    metadata = CacheMetadata.from_headers(
+        httpx.Headers({**headers, "age": "40"}), response_time=date + 10
+    )
+    assert metadata.age == 40
+    assert metadata.get_current_age(now=date + 30) == 60
+    assert metadata.expires == date + 30
+
+    # without a 'Date', the response is dated when it's received
+    metadata = CacheMetadata.from_headers(
+        httpx.Headers({"cache-control": "max-age=60"}), response_time=date
+    )
+    assert metadata.date is None
+    assert metadata.expires == date + 60
+
+
+@pytest.mark.parametrize(
+    "status_code,cache_control,lifetime",
+    [
+        (200, None, 3600.0),
+        (404, None, 3600.0),
+        (201, None, None),
+        (201, "public", 3600.0),
+        (200, "max-age=5", 5),
+    ],
+)
+def test_cache_metadata_heuristic_lifetime(status_code, cache_control, lifetime):
+    headers = {
+        "date": "Mon, 01 Jan 2024 10:00:00 GMT",
+        "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    if cache_control is not None:
+        headers["cache-control"] = cache_control
+    metadata = CacheMetadata.from_headers(
+        httpx.Headers(headers), status_code=status_code
+    )
+    # 10% of the time since the response was last modified
+    assert metadata.lifetime == lifetime
+    assert metadata.heuristic is (cache_control != "max-age=5" and lifetime is not None)
+
+
+def test_get_cache_metadata_memoized():
+    response = httpx.Response(200, headers={"cache-control": "max-age=60"})
+    metadata = get_cache_metadata(response)
+    assert get_cache_metadata(response) is metadata
+    assert get_cache_control(response) == {"max-age": 60}
+
+    # e.g. refreshed by a '304 Not Modified' response
+    merge_not_modified_response(
+        cached=response,
+        response=httpx.Response(304, headers={"cache-control": "max-age=120"}),
+    )
+    assert get_cache_control(response) == {"max-age": 120}